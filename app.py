@@ -1,47 +1,130 @@
 # app.py
-try:
-    import pkg_resources
-except ImportError:
-    import types as _types, sys as _sys
-    _pkg = _types.ModuleType('pkg_resources')
-    _pkg.get_distribution = lambda name: _types.SimpleNamespace(version='unknown')
-    _pkg.DistributionNotFound = Exception
-    _sys.modules['pkg_resources'] = _pkg
-import os, json, requests, atexit, signal, threading, random, re, time, base64, hmac, hashlib, urllib.parse
-from datetime import datetime, timezone, timedelta
+# python-telegram-bot / requests 는 임포트만 1초 넘게 걸려 필요할 때 불러온다 (startup_bench.py 참고).
+# 임포트 시에는 파일 잠금/상태 읽기도 하지 않고, main() 이 헬스 포트를 연 뒤에 진행한다.
+import os, json, atexit, signal, threading, random, re, time, base64, hmac, hashlib, urllib.parse, heapq, math, csv
+import bisect, socket, sys
+import io, cProfile, pstats, tracemalloc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta, date
 KST = timezone(timedelta(hours=9))
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from dotenv import load_dotenv
-from telegram import ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import Updater, MessageHandler, Filters, CallbackQueryHandler
+_BOOT = time.perf_counter()
 
 # ========= ENV =========
 load_dotenv()
 
 BOT_TOKEN   = os.getenv("BOT_TOKEN", "").strip()
+# Bot API 주소 (비우면 api.telegram.org). 부하/기동 테스트 시 naver_standin.py 의 /bot 으로 바꾼다
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "").strip()
+# 웹훅 수신: 공개 주소(예: https://xxx.onrender.com)가 있으면 PORT 서버의 WEBHOOK_PATH 로 업데이트를 받는다.
+# 비밀 토큰을 비우면 기동마다 새로 만든다. 설정 실패/수신 이상 시 폴링으로 전환.
+TELEGRAM_WEBHOOK_URL    = os.getenv("TELEGRAM_WEBHOOK_URL", "").strip().rstrip("/")
+TELEGRAM_WEBHOOK_PATH   = "/" + os.getenv("TELEGRAM_WEBHOOK_PATH", "telegram").strip().strip("/")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "").strip()
+TELEGRAM_WEBHOOK_CHECK  = max(30, int(os.getenv("TELEGRAM_WEBHOOK_CHECK", "300")))
+# 1 이면 받은 업데이트 원문을 DATA_DIR/webhook_updates.jsonl 에 남김 (webhook_replay.py 로 재생)
+TELEGRAM_WEBHOOK_RECORD = os.getenv("TELEGRAM_WEBHOOK_RECORD", "").strip() in ("1", "true", "yes")
 CHAT_ID     = str(os.getenv("CHAT_ID", "")).strip()
 DEFAULT_THRESHOLD = float(os.getenv("THRESHOLD_PCT", "1.0"))
 PORT        = int(os.getenv("PORT", "0"))
+# job 감시: 연속 몇 번 지연되면 알릴지, 같은 job 알림 최소 간격(초)
+JOB_OVERRUN_ALERT  = max(1, int(os.getenv("JOB_OVERRUN_ALERT", "3")))
+JOB_ALERT_COOLDOWN = float(os.getenv("JOB_ALERT_COOLDOWN", "1800"))
+# 외부 서비스 차단기: 연속 실패 BREAKER_FAILS 회면 열림 → BREAKER_BASE 초부터 두 배씩(최대 BREAKER_MAX) 쉬었다 1건만 시험
+BREAKER_FAILS = max(1, int(os.getenv("BREAKER_FAILS", "5")))
+BREAKER_BASE  = max(1.0, float(os.getenv("BREAKER_BASE", "30")))
+BREAKER_MAX   = max(BREAKER_BASE, float(os.getenv("BREAKER_MAX", "600")))
+# 재시작 스냅샷: 저장 주기(초), 이보다 오래된 스냅샷은 버림(초). 기동 직후 job 첫 실행을 0~STARTUP_JITTER초 흩뜨림
+SNAPSHOT_INTERVAL = max(30.0, float(os.getenv("SNAPSHOT_INTERVAL", "300")))
+SNAPSHOT_MAX_AGE  = float(os.getenv("SNAPSHOT_MAX_AGE", "1800"))
+STARTUP_JITTER    = max(0.0, float(os.getenv("STARTUP_JITTER", "10")))
+# 프로파일: 시작 시 켤 대상(job 이름/on_text, 쉼표 구분), 대상별 실행 횟수, 요약 상위 개수
+PROFILE_TARGETS = [t.strip() for t in os.getenv("PROFILE_TARGETS", "").split(",") if t.strip()]
+PROFILE_RUNS    = max(1, int(os.getenv("PROFILE_RUNS", "20")))
+PROFILE_TOP     = max(5, int(os.getenv("PROFILE_TOP", "30")))
 
 # Persistent state dir (Render: DATA_DIR=/data)
 DATA_DIR    = os.getenv("DATA_DIR", "").strip() or "."
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # Naver Searchad API
-NAVER_BASE_URL      = "https://api.naver.com"
+NAVER_BASE_URL      = os.getenv("NAVER_BASE_URL", "").strip().rstrip("/") or "https://api.naver.com"
 NAVER_API_KEY       = os.getenv("NAVER_API_KEY", "").strip()
 NAVER_API_SECRET    = os.getenv("NAVER_API_SECRET", "").strip()
 NAVER_CUSTOMER_ID   = os.getenv("NAVER_CUSTOMER_ID", "").strip()
 NAVER_CAMPAIGN_ID   = os.getenv("NAVER_CAMPAIGN_ID", "").strip()
 NAVER_ADGROUP_ID    = os.getenv("NAVER_ADGROUP_ID", "").strip()
 NAVER_ADGROUP_NAME  = os.getenv("NAVER_ADGROUP_NAME", "").strip()
+# 광고그룹 본문 캐시 유지 시간(초): 상태 조회/입찰 변경 전 GET 을 줄인다
+NAVER_ADGROUP_TTL   = float(os.getenv("NAVER_ADGROUP_TTL", "60"))
+# 캠페인 → 광고그룹 → 키워드 목록 캐시 유지 시간(초)
+NAVER_TREE_TTL      = float(os.getenv("NAVER_TREE_TTL", "600"))
+# 키워드 입찰 일괄 변경: 요청당 키워드 수, 배치 사이 대기(초)
+NAVER_BULK_BATCH    = max(1, int(os.getenv("NAVER_BULK_BATCH", "100")))
+NAVER_BULK_GAP      = float(os.getenv("NAVER_BULK_GAP", "0.3"))
+# 광고 성과 통계: 조회 주기(초), 보관 기간/처음 받을 과거 기간(일), 정산 대기(시간), 요청당 ID 수
+NAVER_STATS_INTERVAL = max(60, int(os.getenv("NAVER_STATS_INTERVAL", "900")))
+NAVER_STATS_DAYS     = max(1, int(os.getenv("NAVER_STATS_DAYS", "28")))
+NAVER_STATS_BACKFILL = max(0, int(os.getenv("NAVER_STATS_BACKFILL", "7")))
+NAVER_STATS_SETTLE   = float(os.getenv("NAVER_STATS_SETTLE", "3"))
+NAVER_STATS_BATCH    = max(1, int(os.getenv("NAVER_STATS_BATCH", "50")))
+# 입찰가 하한(Searchad 최소 입찰가)과 이진탐색 경계 재확인 횟수
+NAVER_MIN_BID       = int(os.getenv("NAVER_MIN_BID", "70"))
+NAVER_BSEARCH_REPEATS = max(1, int(os.getenv("NAVER_BSEARCH_REPEATS", "3")))
+# 입찰→순위 학습 모델: 관측 파일 상한(줄), 시간대 폭(시간), 반감기/만료(일), 최소 관측 수, 허용 오차(위)
+NAVER_BID_OBS_MAX          = max(100, int(os.getenv("NAVER_BID_OBS_MAX", "20000")))
+NAVER_BID_MODEL_BUCKET     = min(24, max(1, int(os.getenv("NAVER_BID_MODEL_BUCKET", "3"))))
+NAVER_BID_MODEL_HALFLIFE   = float(os.getenv("NAVER_BID_MODEL_HALFLIFE", "14"))
+NAVER_BID_MODEL_STALE      = float(os.getenv("NAVER_BID_MODEL_STALE", "7"))
+NAVER_BID_MODEL_MIN_OBS    = max(2, int(os.getenv("NAVER_BID_MODEL_MIN_OBS", "4")))
+NAVER_BID_MODEL_MAX_SD     = float(os.getenv("NAVER_BID_MODEL_MAX_SD", "0.8"))
 
 # Naver Place (리뷰/노출 감시용)
 NAVER_PLACE_ID      = os.getenv("NAVER_PLACE_ID", "").strip()
-
-DATA_FILE = os.path.join(DATA_DIR, "portfolio.json")
-LOCK_FILE = os.path.join(DATA_DIR, "bot.lock")
-UPBIT     = "https://api.upbit.com/v1"
+# 검색/플레이스 페이지 주소 (부하 테스트 시 naver_standin.py 주소로 바꿔 실행)
+NAVER_SEARCH_BASE   = os.getenv("NAVER_SEARCH_BASE", "").strip().rstrip("/") or "https://search.naver.com"
+NAVER_PLACE_BASE    = os.getenv("NAVER_PLACE_BASE", "").strip().rstrip("/")   # 비우면 실제 m.place/map/pcmap
+
+# 노출감시 심층 검색 (첫 페이지 밖 순위 추적)
+NAVER_RANK_MAX_PAGES = max(1, int(os.getenv("NAVER_RANK_MAX_PAGES", "5")))
+NAVER_RANK_PAGE_SIZE = max(1, int(os.getenv("NAVER_RANK_PAGE_SIZE", "7")))
+NAVER_RANK_WAVE      = max(1, int(os.getenv("NAVER_RANK_WAVE", "2")))
+NAVER_RANK_PAGE_TTL  = float(os.getenv("NAVER_RANK_PAGE_TTL", "60"))
+
+# Naver 페이지 요청 전체 동시 실행 상한 (노출/리뷰 감시, 입찰추정 공용)
+NAVER_MAX_CONCURRENCY = max(1, int(os.getenv("NAVER_MAX_CONCURRENCY", "4")))
+# 리뷰감시 한 주기에 조회할 최대 플레이스 수 (남은 곳은 다음 주기로)
+NAVER_REVIEW_BATCH    = max(1, int(os.getenv("NAVER_REVIEW_BATCH", "8")))
+
+# 리뷰 페이지 경쟁 조회: 상위 소스 먼저 출발, 나머지는 이 간격(초)마다 뒤따라 출발
+NAVER_REVIEW_HEDGE_SEC = float(os.getenv("NAVER_REVIEW_HEDGE_SEC", "1.5"))
+
+# 검색/플레이스 페이지 조회+파싱을 맡을 별도 프로세스 수 (0 이면 예전처럼 봇 프로세스 안에서 처리, 기본은
+# NAVER_MAX_CONCURRENCY 와 같게 해 동시 요청이 워커 대기열에 줄 서지 않게 한다)
+# 작업 하나의 실행 제한 시간(초, 워커 안에서 잼), 이 건수마다 워커를 새로 띄워 메모리 증가를 끊는다
+SCRAPER_WORKERS = max(0, int(os.getenv("SCRAPER_WORKERS", str(NAVER_MAX_CONCURRENCY))))
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "40"))
+SCRAPER_RECYCLE = max(1, int(os.getenv("SCRAPER_RECYCLE", "500")))
+
+# 감시 분산: 여러 노드가 같은 CLUSTER_DB(공유 볼륨의 SQLite 파일)를 쓰면 노출/리뷰 감시를 나눠 맡는다.
+# 비우면 예전처럼 단일 인스턴스. NODE_ID 기본값은 호스트명-pid
+CLUSTER_DB        = os.getenv("CLUSTER_DB", "").strip()
+NODE_ID           = os.getenv("NODE_ID", "").strip() or f"{socket.gethostname()}-{os.getpid()}"
+CLUSTER_HEARTBEAT = max(1.0, float(os.getenv("CLUSTER_HEARTBEAT", "5")))
+CLUSTER_NODE_TTL  = max(3.0, float(os.getenv("CLUSTER_NODE_TTL", "20")))
+CLUSTER_VNODES    = max(1, int(os.getenv("CLUSTER_VNODES", "64")))
+
+# 리더 리스: 리더는 LEASE_RENEW 초마다 DATA_DIR/leader.lease 를 갱신하고, LEASE_TTL 초 안에 갱신이 없으면
+# 대기 인스턴스가 넘겨받는다. 대기 인스턴스는 LEASE_POLL 초마다 리스를 확인하며 상태/가격을 따라 읽는다.
+LEASE_TTL   = max(3.0, float(os.getenv("LEASE_TTL", "15")))
+LEASE_RENEW = min(LEASE_TTL / 3, max(0.5, float(os.getenv("LEASE_RENEW", "3"))))
+LEASE_POLL  = max(0.2, float(os.getenv("LEASE_POLL", "1")))
+
+DATA_FILE  = os.path.join(DATA_DIR, "portfolio.json")
+LEASE_FILE = os.path.join(DATA_DIR, "leader.lease")
+UPBIT     = (os.getenv("UPBIT_BASE_URL", "").strip().rstrip("/") or "https://api.upbit.com") + "/v1"
 
 NAVER_HEADERS = {
     "User-Agent": (
@@ -51,14 +134,583 @@ NAVER_HEADERS = {
     "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
 }
 
+# ========= METRICS =========
+# Prometheus 텍스트 형식으로 내보낼 카운터/히스토그램 (외부 라이브러리 없이 dict 로 관리)
+_METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_METRIC_HELP = {
+    "bot_job_duration_seconds": ("histogram", "job 1회 실행 시간"),
+    "bot_job_skipped_total": ("counter", "이전 실행이 안 끝나 건너뛴 job 실행"),
+    "bot_http_requests_total": ("counter", "외부 HTTP 요청 수 (host, status)"),
+    "bot_http_request_duration_seconds": ("histogram", "외부 HTTP 요청 시간 (host, status)"),
+    "bot_parse_duration_seconds": ("histogram", "페이지 파싱 시간 (kind)"),
+    "bot_cache_requests_total": ("counter", "캐시 조회 (cache, result=hit|miss)"),
+    "bot_scraper_jobs_total": ("counter", "스크래퍼 워커 작업 (kind, result=ok|error|timeout|crash)"),
+    "bot_scraper_restarts_total": ("counter", "스크래퍼 워커 프로세스 재시작 (reason)"),
+    "bot_scraper_wait_seconds": ("histogram", "스크래퍼 작업 제출부터 결과 수신까지 (kind)"),
+    "bot_lease_acquired_total": ("counter", "리더 리스 획득"),
+    "bot_lease_lost_total": ("counter", "갱신 중 다른 인스턴스에게 리더 리스를 잃음"),
+    "bot_state_fenced_total": ("counter", "리스 token 이 바뀌어 거부된 상태 저장"),
+    "bot_breaker_transitions_total": ("counter", "차단기 상태 변경 (upstream, state=open|half_open|closed)"),
+    "bot_breaker_rejected_total": ("counter", "차단기가 열려 바로 실패시킨 요청 (upstream)"),
+    "bot_singleflight_requests_total": ("counter", "중복 요청 합치기 (kind, result=fetch|shared)"),
+    "bot_snapshot_writes_total": ("counter", "재시작 스냅샷 저장 횟수"),
+    "bot_snapshot_write_bytes_total": ("counter", "재시작 스냅샷 저장 바이트"),
+    "bot_snapshot_restored_total": ("counter", "기동 시 스냅샷에서 되살린 항목 수"),
+    "bot_cluster_rebalances_total": ("counter", "클러스터 노드 구성 변경(링 재계산) 횟수"),
+    "bot_webhook_updates_total": ("counter", "웹훅 수신 (result=ok|duplicate|forbidden|bad_request|error)"),
+    "bot_state_writes_total": ("counter", "save_state 파일 쓰기 횟수"),
+    "bot_state_write_bytes_total": ("counter", "save_state 로 쓴 바이트"),
+}
+_metrics = {}           # (name, labels tuple) -> 값 또는 [버킷별 누적..., 합계, 개수]
+_metrics_lock = threading.Lock()
+_metrics_refs = {"updater": None}
+
+def metric_inc(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        _metrics[key] = _metrics.get(key, 0) + value
+
+def metric_observe(name, seconds, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        h = _metrics.get(key)
+        if h is None:
+            h = _metrics[key] = [0] * (len(_METRIC_BUCKETS) + 2)
+        for i, le in enumerate(_METRIC_BUCKETS):
+            if seconds <= le:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+def cache_hit(cache, hit):
+    metric_inc("bot_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+def http_record(url, status, seconds):
+    host = urllib.parse.urlsplit(url).hostname or "?"
+    metric_observe("bot_http_request_duration_seconds", seconds, host=host, status=status)
+    metric_inc("bot_http_requests_total", host=host, status=status)
+
+def http_request(method, url, **kw):
+    """외부 HTTP 요청은 여기를 거쳐 host/status 별 횟수와 시간을 남긴다"""
+    t0 = time.perf_counter()
+    status = "error"
+    try:
+        import requests
+        r = requests.request(method, url, **kw)
+        status = str(r.status_code)
+        return r
+    finally:
+        http_record(url, status, time.perf_counter() - t0)
+
+_startup = {}          # 단계 -> 모듈 임포트 시작부터 걸린 초
+
+def _mark_startup(stage):
+    _startup[stage] = time.perf_counter() - _BOOT
+    print(f"[START] {stage}: {_startup[stage]:.3f}s")
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except:
+        return None
+
+def _metric_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def metrics_text():
+    with _metrics_lock:
+        snap = {k: (list(v) if isinstance(v, list) else v) for k, v in _metrics.items()}
+
+    out = []
+    for name in sorted({k[0] for k in snap}):
+        kind, text = _METRIC_HELP.get(name, ("untyped", name))
+        out.append(f"# HELP {name} {text}")
+        out.append(f"# TYPE {name} {kind}")
+        for (n, labels), v in sorted(snap.items()):
+            if n != name:
+                continue
+            if kind != "histogram":
+                out.append(f"{name}{_metric_labels(labels)} {v}")
+                continue
+            for le, c in zip(_METRIC_BUCKETS, v):
+                out.append(f"{name}_bucket{_metric_labels(labels, ('le', le))} {c}")
+            out.append(f"{name}_bucket{_metric_labels(labels, ('le', '+Inf'))} {v[-1]}")
+            out.append(f"{name}_sum{_metric_labels(labels)} {v[-2]:.6f}")
+            out.append(f"{name}_count{_metric_labels(labels)} {v[-1]}")
+
+    # 받은 텔레그램 업데이트 중 아직 처리 안 된 수 (보낼 알림 대기열은 클러스터 outbox → bot_outbox_depth)
+    up = _metrics_refs.get("updater")
+    if up is not None:
+        try:
+            out.append("# TYPE bot_update_queue_depth gauge")
+            out.append(f"bot_update_queue_depth {up.dispatcher.update_queue.qsize()}")
+        except:
+            pass
+    out.append("# TYPE bot_leader gauge")
+    out.append(f"bot_leader {1 if is_leader() else 0}")
+    if _lease["token"] is not None:
+        out.append("# TYPE bot_lease_token gauge")
+        out.append(f"bot_lease_token {_lease['token']}")
+    out.extend(breaker_metric_lines())
+    out.extend(cluster_metric_lines())
+    if _startup:
+        out.append("# TYPE bot_startup_seconds gauge")
+        for stage, sec in _startup.items():
+            out.append(f'bot_startup_seconds{{stage="{stage}"}} {sec:.3f}')
+    rss = _rss_bytes()
+    if rss is not None:
+        out.append("# TYPE bot_process_resident_memory_bytes gauge")
+        out.append(f"bot_process_resident_memory_bytes {rss}")
+    return "\n".join(out) + "\n"
+
+# ========= UPSTREAM 차단기 =========
+# 외부 서비스(upbit, searchad, naver_search, naver_place)별 closed → open → half_open 상태.
+# 연속 실패가 쌓이면 열어서 요청을 보내지 않고 바로 BreakerOpen 으로 실패시키고(타임아웃 대기 없음),
+# 대기 시간이 지나면 한 건만 시험으로 보내 성공하면 닫고 실패하면 더 오래(지터 포함) 다시 연다.
+# 상태 변화는 _breaker_events 에 쌓아 두었다가 breaker_watch job 이 주인에게 알린다.
+BREAKER_UPSTREAMS = ("upbit", "searchad", "naver_search", "naver_place")
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+_breakers = {}
+_breaker_lock = threading.Lock()
+_breaker_events = []        # (upstream, 이전 state, state, 설명)
+
+class BreakerOpen(RuntimeError):
+    pass
+
+def _breaker(name):
+    b = _breakers.get(name)
+    if b is None:
+        b = _breakers[name] = {
+            "state": "closed", "fails": 0, "opens": 0, "until": 0.0, "probing": False,
+            "since": time.time(), "last_error": None, "rejected": 0,
+        }
+    return b
+
+def _breaker_set(name, b, st, why):
+    # _breaker_lock 안에서 호출
+    prev, b["state"] = b["state"], st
+    b["since"] = time.time()
+    metric_inc("bot_breaker_transitions_total", upstream=name, state=st)
+    _breaker_events.append((name, prev, st, why))
+    print(f"[BREAKER] {name} → {st} ({why})")
+
+def breaker_allow(name):
+    """요청 전에 호출. 열려 있으면 BreakerOpen. 반환: 이번 요청이 half_open 시험 요청인지"""
+    now = time.time()
+    with _breaker_lock:
+        b = _breaker(name)
+        if b["state"] == "closed":
+            return False
+        if b["state"] == "open" and now >= b["until"]:
+            _breaker_set(name, b, "half_open", "시험 요청")
+        # 시험 요청이 결과를 남기지 못하고 끝났으면(스레드 종료 등) 60초 뒤 다시 시험
+        if b["state"] == "half_open" and (not b["probing"] or now - b["since"] > 60):
+            b["since"] = now
+            b["probing"] = True
+            return True
+        b["rejected"] += 1
+        left = max(0.0, b["until"] - now)
+    metric_inc("bot_breaker_rejected_total", upstream=name)
+    raise BreakerOpen(f"{name} 차단 중 ({left:.0f}초 후 재시도)")
+
+def breaker_result(name, ok, error=None):
+    with _breaker_lock:
+        b = _breaker(name)
+        b["probing"] = False
+        if ok:
+            b["fails"] = 0
+            if b["state"] != "closed":
+                b["opens"] = 0
+                _breaker_set(name, b, "closed", "복구")
+            return
+        b["fails"] += 1
+        b["last_error"] = f"{datetime.now(KST).strftime('%m-%d %H:%M')} {error}"[:200]
+        if b["state"] == "half_open" or (b["state"] == "closed" and b["fails"] >= BREAKER_FAILS):
+            wait = min(BREAKER_MAX, BREAKER_BASE * 2 ** b["opens"]) * random.uniform(0.8, 1.2)
+            b["opens"] += 1
+            b["until"] = time.time() + wait
+            _breaker_set(name, b, "open", f"연속 실패 {b['fails']}회, {wait:.0f}초 차단: {str(error)[:120]}")
+
+def breaker_release(name):
+    """결과를 남기지 않고 끝난 요청 (우리 쪽 문제로 실패): 시험 요청 표시만 풀어 다음 요청이 시험하게 한다"""
+    with _breaker_lock:
+        _breaker(name)["probing"] = False
+
+def upstream_failed(status):
+    """차단기에 실패로 셀 응답 코드 (연결 오류, 5xx, 과다 요청/차단)"""
+    return status in ("error", "403", "429") or str(status).startswith("5")
+
+def breaker_watch(context):
+    with _breaker_lock:
+        events = _breaker_events[:]
+        del _breaker_events[:]
+    # 처음 열릴 때와 복구만 한 메시지로 (장애 중 시험 실패로 다시 열리는 건 알리지 않음)
+    lines = []
+    for name, prev, st, why in events:
+        if st == "open" and prev == "closed":
+            lines.append(f"🚫 {name}: 차단 ({why})")
+        elif st == "closed":
+            lines.append(f"✅ {name}: 복구")
+    if lines:
+        send_ctx(context, "⚠️ [외부 서비스 상태]\n" + "\n".join(lines))
+
+def breaker_status_lines():
+    now = time.time()
+    lines = ["🔌 외부 서비스 차단기"]
+    with _breaker_lock:
+        for name in BREAKER_UPSTREAMS:
+            b = _breaker(name)
+            if b["state"] == "closed":
+                txt = "정상" + (f" (연속 실패 {b['fails']}회)" if b["fails"] else "")
+            elif b["state"] == "open":
+                txt = f"차단 중, {max(0.0, b['until'] - now):.0f}초 후 시험 (거절 {b['rejected']}건)"
+            else:
+                txt = "시험 요청 중"
+            lines.append(f"  · {name}: {txt}")
+            if b["state"] != "closed" and b["last_error"]:
+                lines.append(f"    마지막 오류: {b['last_error']}")
+    return lines
+
+def breaker_metric_lines():
+    out = ["# TYPE bot_breaker_state gauge"]
+    with _breaker_lock:
+        for name in BREAKER_UPSTREAMS:
+            out.append(f'bot_breaker_state{{upstream="{name}"}} {_BREAKER_STATES[_breaker(name)["state"]]}')
+    return out
+
+# ========= SINGLE-FLIGHT (중복 요청 합치기) =========
+# 같은 자원(정규화한 key)을 동시에 받으려 하면 먼저 온 호출만 실제로 받고, 나머지는 끝나기를 기다려
+# 같은 결과(또는 같은 예외)를 나눠 쓴다. 예: 노출현황 버튼과 노출감시가 같은 검색어 페이지를 동시에 요청.
+_flights = {}               # key -> {"started", "done", "result", "error"}
+_flights_lock = threading.Lock()
+_flight_stats = {}          # kind(key[0]) -> {"fetch": n, "shared": n}
+
+def single_flight(key, fn, fresh_after=None):
+    """
+    key: (kind, ...) 튜플. fresh_after: 이 시각 이후에 시작한 요청에만 합류
+    (더 먼저 시작한 요청은 기다리지 않고 따로 받는다 — 입찰 변경 직후 페이지 등).
+    """
+    kind = key[0]
+    with _flights_lock:
+        f = _flights.get(key)
+        join = f is not None and (fresh_after is None or f["started"] >= fresh_after)
+        if not join:
+            f = {"started": time.time(), "done": threading.Event(), "result": None, "error": None}
+            _flights[key] = f
+        st = _flight_stats.setdefault(kind, {"fetch": 0, "shared": 0})
+        st["shared" if join else "fetch"] += 1
+    metric_inc("bot_singleflight_requests_total", kind=kind, result="shared" if join else "fetch")
+
+    if join:
+        f["done"].wait()
+        if f["error"] is not None:
+            raise f["error"]
+        return f["result"]
+
+    try:
+        f["result"] = fn()
+        return f["result"]
+    except Exception as e:
+        f["error"] = e
+        raise
+    finally:
+        with _flights_lock:
+            if _flights.get(key) is f:
+                del _flights[key]
+        f["done"].set()
+
+def single_flight_join(kind, covers):
+    """
+    진행 중인 kind 요청 중 covers(key) 가 참인 것(예: 이 마켓이 들어 있는 묶음 시세)에 합류해 그 결과를 돌려준다.
+    해당 요청이 없으면 None. 합류한 요청이 실패하면 그 예외를 그대로 던진다.
+    """
+    with _flights_lock:
+        f = next((v for k, v in _flights.items() if k[0] == kind and covers(k)), None)
+        if f is None:
+            return None
+        _flight_stats.setdefault(kind, {"fetch": 0, "shared": 0})["shared"] += 1
+    metric_inc("bot_singleflight_requests_total", kind=kind, result="shared")
+    f["done"].wait()
+    if f["error"] is not None:
+        raise f["error"]
+    return f["result"]
+
+def single_flight_line():
+    with _flights_lock:
+        items = sorted((k, dict(v)) for k, v in _flight_stats.items())
+    if not items:
+        return "🔗 중복 요청 합치기: 기록 없음"
+    parts = [f"{k} {v['shared']}/{v['fetch'] + v['shared']}건" for k, v in items]
+    return "🔗 중복 요청 합치기 (아낀 요청/전체): " + ", ".join(parts)
+
+# ========= JOB 감시 =========
+# job_queue 콜백은 모두 timed_job 으로 감싸 실행 시간/시작 지연/예외를 job 별로 남긴다.
+# 이전 실행이 아직 끝나지 않았으면 이번 실행은 건너뛰고(다음 주기에 한 번만 실행),
+# 예산(기본: 주기)을 연속으로 넘기면 주인에게 알린다.
+_jobs = {}              # name -> 통계 dict
+_jobs_lock = threading.Lock()
+
+def _job_entry(name, interval, budget):
+    with _jobs_lock:
+        st = _jobs.get(name)
+        if st is None:
+            st = _jobs[name] = {
+                "interval": interval, "budget": budget or interval,
+                "durations": deque(maxlen=200), "lags": deque(maxlen=200),
+                "runs": 0, "errors": 0, "skipped": 0, "overruns": 0, "streak": 0,
+                "running": threading.Lock(), "due": None,
+                "last_error": None, "last_alert": 0.0,
+            }
+        return st
+
+def _job_alert(context, name, st, why):
+    now = time.time()
+    if now - st["last_alert"] < JOB_ALERT_COOLDOWN:
+        return
+    st["last_alert"] = now
+    try:
+        send_ctx(context, f"⚠️ [작업 지연] {name}: {why}\n('작업상태'로 확인)")
+    except:
+        pass
+
+def timed_job(fn, name=None, interval=None, budget=None):
+    """interval: run_repeating 주기(초, 시작 지연 계산용), budget: 1회 허용 시간(초, 기본 interval)"""
+    name = name or fn.__name__
+    st = _job_entry(name, interval, budget)
+
+    def _run(context):
+        start = time.time()
+        if interval:
+            due = st["due"] if st["due"] is not None else start
+            st["lags"].append(max(0.0, start - due))
+            # 다음 예정 시각 (밀린 주기는 건너뛴 것으로 본다)
+            nxt = due + interval
+            while nxt <= start - interval:
+                nxt += interval
+            st["due"] = nxt
+
+        if not st["running"].acquire(blocking=False):
+            st["skipped"] += 1
+            st["streak"] += 1
+            metric_inc("bot_job_skipped_total", job=name)
+            if st["streak"] >= JOB_OVERRUN_ALERT:
+                _job_alert(context, name, st, f"이전 실행이 끝나지 않아 {st['streak']}회 연속 지연/건너뜀")
+            return None
+
+        t0 = time.perf_counter()
+        try:
+            return profile_call(name, fn, context)
+        except Exception as e:
+            st["errors"] += 1
+            st["last_error"] = f"{datetime.now(KST).strftime('%m-%d %H:%M')} {type(e).__name__}: {e}"[:200]
+            print(f"[JOB] {name} 예외:", repr(e))
+            return None
+        finally:
+            dt = time.perf_counter() - t0
+            st["running"].release()
+            st["runs"] += 1
+            st["durations"].append(dt)
+            metric_observe("bot_job_duration_seconds", dt, job=name)
+            if st["budget"] and dt > st["budget"]:
+                st["overruns"] += 1
+                st["streak"] += 1
+                if st["streak"] >= JOB_OVERRUN_ALERT:
+                    _job_alert(context, name, st,
+                               f"{st['streak']}회 연속 예산 {st['budget']:.0f}초 초과 (최근 {dt:.1f}초)")
+            else:
+                st["streak"] = 0
+
+    _run.__name__ = name
+    return _run
+
+def run_every(jq, fn, interval, first=None, budget=None):
+    # max_instances=2: 겹친 실행도 timed_job 까지 들어와야 건너뜀으로 집계된다
+    return jq.run_repeating(
+        timed_job(fn, interval=interval, budget=budget), interval=interval, first=first,
+        job_kwargs={"max_instances": 2},
+    )
+
+def _pct(values, q):
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * (len(s) - 1) + 0.5))] if s else None
+
+def job_status_lines():
+    with _jobs_lock:
+        items = sorted(_jobs.items())
+    lines = []
+    for name, st in items:
+        d = list(st["durations"])
+        if not d and not st["skipped"]:
+            lines.append(f"- {name}: 아직 실행 안 됨")
+            continue
+        lag = _pct(st["lags"], 0.95)
+        parts = [
+            f"{st['runs']}회",
+            f"p50 {_pct(d, 0.5) or 0:.2f}s / p95 {_pct(d, 0.95) or 0:.2f}s / 최대 {max(d) if d else 0:.2f}s",
+        ]
+        if lag is not None:
+            parts.append(f"시작 지연 p95 {lag:.2f}s")
+        if st["skipped"]:
+            parts.append(f"건너뜀 {st['skipped']}")
+        if st["overruns"]:
+            parts.append(f"예산 초과 {st['overruns']}")
+        if st["errors"]:
+            parts.append(f"오류 {st['errors']}")
+        lines.append(f"- {name}: " + ", ".join(parts))
+        if st["last_error"]:
+            lines.append(f"  마지막 오류: {st['last_error']}")
+    return lines
+
+# ========= PROFILING =========
+# 지정한 job/핸들러를 N회 동안 cProfile 로 감싸고, 시작/끝 tracemalloc 스냅샷을 비교해
+# DATA_DIR/profiles/ 에 .prof(pstats) 와 상위 N개 요약 .txt 를 남긴다. 재시작 없이 켜고 끈다.
+# 켜는 방법: 환경변수 PROFILE_TARGETS=check_loop,on_text (PROFILE_RUNS 회) 또는 '프로파일' 명령.
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+
+_profiles = {}          # name -> {"left", "runs", "stats", "snap", "chat_id", "started"}
+_profile_lock = threading.Lock()
+_profile_tm = {"owned": False}
+
+def _profile_snapshot():
+    # 프로파일러 자신이 쓰는 메모리는 빼고 비교
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, pstats.__file__),
+    ])
+
+def profile_start(name, runs=None, chat_id=None):
+    runs = max(1, int(runs or PROFILE_RUNS))
+    with _profile_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _profile_tm["owned"] = True
+        _profiles[name] = {
+            "left": runs, "runs": 0, "seconds": 0.0, "stats": None,
+            "snap": _profile_snapshot(), "chat_id": chat_id, "started": time.time(),
+        }
+
+def profile_stop(name=None):
+    """name=None 이면 전부. 진행 중이던 결과는 그대로 저장한다. 반환: 저장된 요약 파일 목록"""
+    with _profile_lock:
+        names = [name] if name else list(_profiles)
+        sessions = [(n, _profiles.pop(n)) for n in names if n in _profiles]
+    paths = [p for p in (_profile_dump(n, s) for n, s in sessions) if p]
+    # 모든 세션의 메모리 비교를 쓴 뒤에 멈춘다 (먼저 멈추면 뒤 세션은 메모리 항목이 빠짐)
+    _profile_tm_release()
+    return paths
+
+def _profile_tm_release():
+    with _profile_lock:
+        if not _profiles and _profile_tm["owned"]:
+            tracemalloc.stop()
+            _profile_tm["owned"] = False
+
+def _profile_dump(name, s):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now(KST).strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(PROFILE_DIR, f"{name}-{stamp}")
+        out = io.StringIO()
+        out.write(f"# {name}: {s['runs']}회, 합계 {s['seconds']:.3f}초\n\n")
+        if s["stats"] is not None:
+            s["stats"].dump_stats(base + ".prof")
+            s["stats"].stream = out
+            s["stats"].sort_stats("cumulative").print_stats(PROFILE_TOP)
+        if tracemalloc.is_tracing() and s["snap"] is not None:
+            out.write(f"\n# 메모리 증가 상위 {PROFILE_TOP} (tracemalloc, 시작 대비)\n")
+            for d in _profile_snapshot().compare_to(s["snap"], "lineno")[:PROFILE_TOP]:
+                out.write(f"{d}\n")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+    except Exception as e:
+        print("[PROFILE] 저장 실패:", name, e)
+        return None
+    print(f"[PROFILE] {name} 저장: {base}.txt")
+    return base + ".txt"
+
+def profile_call(name, fn, *args):
+    """프로파일 대상이면 cProfile 로 감싸 실행, 아니면 그대로 실행"""
+    if name not in _profiles:
+        return fn(*args)
+    prof = cProfile.Profile()
+    t0 = time.perf_counter()
+    try:
+        return prof.runcall(fn, *args)
+    finally:
+        dt = time.perf_counter() - t0
+        done = None
+        with _profile_lock:
+            s = _profiles.get(name)
+            if s is not None:
+                if s["stats"] is None:
+                    s["stats"] = pstats.Stats(prof)
+                else:
+                    s["stats"].add(prof)
+                s["runs"] += 1
+                s["seconds"] += dt
+                s["left"] -= 1
+                if s["left"] <= 0:
+                    done = _profiles.pop(name)
+        if done is not None:
+            path = _profile_dump(name, done)
+            _profile_tm_release()
+            up = _metrics_refs.get("updater")
+            if path and done["chat_id"] and up is not None:
+                try:
+                    up.bot.send_message(chat_id=done["chat_id"], text=f"🧪 프로파일 완료: {name} {done['runs']}회\n{path}")
+                except:
+                    pass
+
+def profile_status_lines():
+    with _profile_lock:
+        items = [(n, s["runs"], s["left"], s["seconds"]) for n, s in _profiles.items()]
+    return [f"- {n}: {r}회 완료, {left}회 남음 (합계 {sec:.2f}초)" for n, r, left, sec in items]
+
 # ========= KEEPALIVE HTTP =========
 class _Ok(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(n) if n > 0 else b""
+            try:
+                code = webhook_receive(self.path.split("?")[0], self.headers, body)
+            except Exception as e:
+                # 처리하지 못한 업데이트는 500 으로 돌려 텔레그램이 다시 보내게 한다
+                print("[WEBHOOK] 업데이트 처리 실패:", e)
+                metric_inc("bot_webhook_updates_total", result="error")
+                code = 500
+            self.send_response(code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        except:
+            pass
+
     def do_GET(self):
         try:
+            if self.path.split("?")[0] == "/metrics":
+                body = metrics_text().encode("utf-8")
+                ctype = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body = b"OK"
+                ctype = "text/plain; charset=utf-8"
             self.send_response(200)
-            self.send_header("Content-Type","text/plain; charset=utf-8")
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
             self.end_headers()
-            self.wfile.write(b"OK")
+            self.wfile.write(body)
         except:
             pass
 
@@ -70,61 +722,712 @@ def _start_keepalive():
         return
     def _run():
         try:
-            httpd = HTTPServer(("", PORT), _Ok)
+            # 요청마다 스레드: 느린 클라이언트 하나가 헬스 체크를 막지 않도록
+            httpd = ThreadingHTTPServer(("", PORT), _Ok)
+            httpd.daemon_threads = True
             httpd.serve_forever()
         except:
             pass
     threading.Thread(target=_run, daemon=True).start()
 
-# ========= SINGLE INSTANCE LOCK =========
-def _pid_alive(pid:int) -> bool:
+# ========= TELEGRAM WEBHOOK =========
+_webhook = {"mode": "polling", "secret": "", "recent": deque(maxlen=500), "last_update": 0.0}
+_webhook_lock = threading.Lock()
+
+def webhook_receive(path, headers, body):
+    """
+    PORT 서버 POST 처리. 반환: HTTP 상태 코드 (200 이면 dispatcher 큐에 넣음).
+    Update 변환 등 처리 중 예외는 그대로 던진다 (update_id 를 기록하기 전이라 재전송 때 다시 처리).
+    """
+    up = _metrics_refs.get("updater")
+    if path != TELEGRAM_WEBHOOK_PATH or _webhook["mode"] != "webhook" or up is None:
+        return 404
+    got = headers.get("X-Telegram-Bot-Api-Secret-Token") or ""
+    if not hmac.compare_digest(got.encode("utf-8"), _webhook["secret"].encode("utf-8")):
+        metric_inc("bot_webhook_updates_total", result="forbidden")
+        return 403
     try:
-        os.kill(pid, 0)
-        return True
+        data = json.loads(body.decode("utf-8"))
+        update_id = int(data["update_id"])
     except:
+        metric_inc("bot_webhook_updates_total", result="bad_request")
+        return 400
+
+    from telegram import Update
+    update = Update.de_json(data, up.bot)
+
+    with _webhook_lock:
+        # 텔레그램 재전송/재생으로 같은 업데이트가 다시 와도 한 번만 처리 (큐에 넣은 것만 기록)
+        if update_id in _webhook["recent"]:
+            metric_inc("bot_webhook_updates_total", result="duplicate")
+            return 200
+        up.update_queue.put(update)
+        _webhook["recent"].append(update_id)
+        _webhook["last_update"] = time.time()
+
+    if TELEGRAM_WEBHOOK_RECORD:
+        try:
+            with open(os.path.join(DATA_DIR, "webhook_updates.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        except:
+            pass
+
+    metric_inc("bot_webhook_updates_total", result="ok")
+    return 200
+
+def webhook_start(up):
+    """웹훅 등록 후 dispatcher/job_queue 만 띄운다. 실패하면 False (호출 측이 폴링으로)"""
+    if not (TELEGRAM_WEBHOOK_URL and PORT > 0):
+        return False
+    import secrets
+    _webhook["secret"] = TELEGRAM_WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    url = TELEGRAM_WEBHOOK_URL + TELEGRAM_WEBHOOK_PATH
+    try:
+        ok = up.bot.set_webhook(
+            url=url, secret_token=_webhook["secret"], drop_pending_updates=True, max_connections=10,
+        )
+    except Exception as e:
+        print("[WEBHOOK] 등록 실패:", e)
+        ok = False
+    if not ok:
         return False
+    _webhook["mode"] = "webhook"
+    up.job_queue.start()
+    threading.Thread(target=up.dispatcher.start, name="dispatcher", daemon=True).start()
+    # 폴링 없이 띄워도 running 이어야 idle() 의 종료 신호 처리가 up.stop() 후 정상 종료한다
+    # (False 면 os._exit(1) 로 바로 끝나 atexit: 상태 저장/스냅샷/리스 반납이 돌지 않음)
+    up.running = True
+    print(f"[WEBHOOK] 수신 중: {url}")
+    return True
+
+def webhook_fallback(up, why):
+    with _webhook_lock:
+        if _webhook["mode"] != "webhook":
+            return
+        _webhook["mode"] = "polling"
+    print("[WEBHOOK] 폴링으로 전환:", why)
+    try:
+        up.bot.delete_webhook()
+    except Exception as e:
+        print("[WEBHOOK] 해제 실패:", e)
+    # webhook_start 가 running 을 켜 두었으므로 내려야 start_polling 이 폴링 스레드를 띄운다
+    # (이미 도는 dispatcher/job_queue 는 그대로 둔다)
+    up.running = False
+    up.start_polling()
+
+def webhook_watch(context):
+    """웹훅 등록이 풀렸거나 텔레그램 쪽 전달 오류가 쌓이면 폴링으로 전환"""
+    up = _metrics_refs.get("updater")
+    if _webhook["mode"] != "webhook" or up is None:
+        return
+    try:
+        info = up.bot.get_webhook_info()
+    except Exception as e:
+        print("[WEBHOOK] 상태 조회 실패:", e)
+        return
+    why = None
+    if info.url != TELEGRAM_WEBHOOK_URL + TELEGRAM_WEBHOOK_PATH:
+        why = f"등록 주소 변경됨 ({info.url or '없음'})"
+    elif info.last_error_date and info.pending_update_count:
+        # PTB 13.15 문서는 unix 시각(int)이지만 de_json 은 datetime 으로 바꿔 준다 → 둘 다 받는다
+        err = info.last_error_date
+        err_at = err.timestamp() if hasattr(err, "timestamp") else float(err)
+        if time.time() - err_at < TELEGRAM_WEBHOOK_CHECK and err_at > _webhook["last_update"]:
+            why = f"전달 오류 '{info.last_error_message}', 대기 {info.pending_update_count}건"
+    if why:
+        webhook_fallback(up, why)
+        send_ctx(context, f"⚠️ 텔레그램 웹훅 이상 → 폴링으로 전환했습니다.\n({why})")
+
+# ========= CLUSTER (감시 분산) =========
+# - 노드는 CLUSTER_HEARTBEAT 마다 nodes 표에 생존 신호를 남기고, CLUSTER_NODE_TTL 안에 신호가 있는 노드만 살아 있다고 본다.
+# - 감시 id("rank:<검색어>", "review:<플레이스ID>")의 주인은 살아 있는 노드로 만든 일관 해시 링에서 정한다.
+#   노드가 들어오거나 빠지면 그 노드 몫만 옮겨 가고, 진행 상태(마지막 순위/리뷰 수/확인 시각)는 watches 표로 넘겨받는다.
+# - 리더 리스(LEADER LEASE)를 쥔 노드가 리더: 텔레그램 수신/명령, 코인 알림, 입찰 작업, portfolio.json 쓰기를 맡는다.
+#   다른 노드의 알림은 outbox 표에 쌓였다가 리더가 보낸다. 리스가 비면 팔로워는 같은 pid 로 다시 실행해 리스를 다툰다.
+_CLUSTER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (node_id TEXT PRIMARY KEY, started REAL, heartbeat REAL, info TEXT);
+CREATE TABLE IF NOT EXISTS watches (watch_id TEXT PRIMARY KEY, spec TEXT, progress TEXT, updated REAL);
+CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL, node_id TEXT, text TEXT, sent REAL);
+"""
+_PROGRESS_KEYS = {"rank": ("last_rank", "last_check"), "review": ("last_count", "last_check")}
+
+_cluster = {"role": None, "leader": None, "nodes": [], "ring": [], "ring_keys": [], "sent": 0, "queued": 0}
+_cluster_local = threading.local()
+_cluster_lock = threading.Lock()
+
+def _cluster_db():
+    # 스레드마다 연결 하나 (job 은 여러 스레드에서 돈다). 공유 볼륨에서도 쓸 수 있게 WAL 은 쓰지 않는다
+    conn = getattr(_cluster_local, "conn", None)
+    if conn is None:
+        import sqlite3
+        conn = sqlite3.connect(CLUSTER_DB, timeout=15, isolation_level=None)
+        conn.executescript(_CLUSTER_SCHEMA)
+        _cluster_local.conn = conn
+    return conn
+
+def _ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+def cluster_ring(nodes):
+    """노드마다 CLUSTER_VNODES 개 지점을 찍은 링. 반환 (ring, keys)"""
+    ring = sorted((_ring_hash(f"{n}#{i}"), n) for n in nodes for i in range(CLUSTER_VNODES))
+    return ring, [h for h, _ in ring]
+
+def ring_owner(watch_id, ring=None, keys=None):
+    ring = _cluster["ring"] if ring is None else ring
+    if not ring:
+        return None
+    keys = keys or [h for h, _ in ring]
+    return ring[bisect.bisect_left(keys, _ring_hash(watch_id)) % len(ring)][1]
+
+def watch_owned(watch_id):
+    if not CLUSTER_DB:
+        return True
+    return ring_owner(watch_id, _cluster["ring"], _cluster["ring_keys"]) == NODE_ID
+
+def _watch_specs():
+    nav = state.get("naver") or {}
+    specs = {}
+    rw = nav.get("rank_watch") or {}
+    kw = (rw.get("keyword") or "").strip()
+    if rw.get("enabled") and kw:
+        specs["rank:" + kw] = {k: rw.get(k) for k in ("keyword", "marker", "interval", "enabled")}
+    rv = nav.get("review_watch") or {}
+    if rv.get("enabled"):
+        for pid, p in (rv.get("places") or {}).items():
+            specs["review:" + pid] = {"interval": int(p.get("interval", 180))}
+    return specs
+
+def _watch_target(watch_id):
+    """감시 id 의 진행 상태가 들어 있는 state 안의 dict (없으면 None)"""
+    nav = state.setdefault("naver", {})
+    kind, _, key = watch_id.partition(":")
+    if kind == "rank":
+        cfg = nav.get("rank_watch") or {}
+        return cfg if (cfg.get("keyword") or "").strip() == key else None
+    if kind == "review":
+        return ((nav.get("review_watch") or {}).get("places") or {}).get(key)
+    return None
+
+def _merge_progress(watch_id, prog):
+    """확인 시각이 더 최근인 쪽을 남긴다. 바뀌었으면 True"""
+    target = _watch_target(watch_id)
+    if target is None or not prog:
+        return False
+    if float(prog.get("last_check") or 0) <= float(target.get("last_check") or 0):
+        return False
+    for k in _PROGRESS_KEYS[watch_id.partition(":")[0]]:
+        target[k] = prog.get(k)
+    return True
+
+def cluster_push(progress):
+    """감시 작업이 끝난 뒤 맡은 감시의 진행 상태를 공유 저장소에 기록. progress: {watch_id: dict}"""
+    if not (CLUSTER_DB and progress):
+        return
+    now = time.time()
+    rows = [(json.dumps(dict(p, node=NODE_ID), ensure_ascii=False), now, wid) for wid, p in progress.items()]
+    try:
+        _cluster_db().executemany("UPDATE watches SET progress=?, updated=? WHERE watch_id=?", rows)
+    except Exception as e:
+        print("[CLUSTER] 진행 상태 기록 실패:", e)
+
+def cluster_outbox_put(text):
+    try:
+        _cluster_db().execute(
+            "INSERT INTO outbox(created, node_id, text) VALUES(?,?,?)", (time.time(), NODE_ID, text))
+        _cluster["queued"] += 1
+    except Exception as e:
+        print("[CLUSTER] 알림 대기열 기록 실패:", e)
+
+def _cluster_publish(db, now):
+    """(리더) state 의 감시 목록을 watches 표에 올리고, 다른 노드가 맡은 감시의 진행 상태를 state 로 가져온다"""
+    specs = _watch_specs()
+    rows = []
+    for wid, spec in specs.items():
+        target = _watch_target(wid) or {}
+        prog = {k: target.get(k) for k in _PROGRESS_KEYS[wid.partition(":")[0]]}
+        rows.append((wid, json.dumps(spec, ensure_ascii=False), json.dumps(prog, ensure_ascii=False), now))
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        # 설정이 바뀐 감시(예: 노출감시 재설정)는 리더 쪽 진행 상태로 다시 시작
+        db.executemany(
+            "INSERT INTO watches(watch_id, spec, progress, updated) VALUES(?,?,?,?) "
+            "ON CONFLICT(watch_id) DO UPDATE SET spec=excluded.spec, "
+            "progress=CASE WHEN watches.spec=excluded.spec THEN watches.progress ELSE excluded.progress END",
+            rows,
+        )
+        stale = [(wid,) for (wid,) in db.execute("SELECT watch_id FROM watches") if wid not in specs]
+        db.executemany("DELETE FROM watches WHERE watch_id=?", stale)
+        db.execute("COMMIT")
+    except:
+        db.execute("ROLLBACK")
+        raise
+
+    changed = False
+    for wid, prog in db.execute("SELECT watch_id, progress FROM watches"):
+        if not watch_owned(wid):
+            changed = _merge_progress(wid, json.loads(prog or "{}")) or changed
+    if changed:
+        mark_state_dirty()
+
+def _cluster_mirror(db):
+    """(팔로워) watches 표를 그대로 state 의 노출/리뷰 감시 설정으로 옮긴다. 맡은 감시는 더 최근 진행 상태를 유지"""
+    nav = state.setdefault("naver", {})
+    rank = nav.setdefault("rank_watch", {})
+    rv = nav.setdefault("review_watch", {})
+    places = rv.setdefault("places", {})
+    before = set(places)
+    seen_rank = False
+    seen = set()
+    for wid, spec, prog in db.execute("SELECT watch_id, spec, progress FROM watches"):
+        spec, prog = json.loads(spec or "{}"), json.loads(prog or "{}")
+        kind, _, key = wid.partition(":")
+        if kind == "rank":
+            seen_rank = True
+            if (rank.get("keyword") or "").strip() != key:
+                rank.clear()
+                rank.update({"last_rank": None, "last_check": 0.0})
+            rank.update(spec)
+        elif kind == "review":
+            seen.add(key)
+            if key not in places:
+                places[key] = {"last_count": None, "last_check": 0.0}
+            places[key].update(spec)
+        else:
+            continue
+        _merge_progress(wid, prog)
+    if not seen_rank:
+        rank["enabled"] = False
+    added = seen - before
+    for pid in [pid for pid in places if pid not in seen]:
+        places.pop(pid, None)
+    rv["enabled"] = bool(seen)
+    return bool(added)
+
+def _cluster_drain(context):
+    """(리더) 다른 노드가 쌓은 알림 전송. 전송 실패 시 다음 주기에 다시"""
+    if context is None or not CHAT_ID:
+        return
+    db = _cluster_db()
+    rows = db.execute("SELECT id, text FROM outbox WHERE sent IS NULL ORDER BY id LIMIT 20").fetchall()
+    cid = int(CHAT_ID) if CHAT_ID.lstrip("-").isdigit() else CHAT_ID
+    for oid, text in rows:
+        try:
+            context.bot.send_message(chat_id=cid, text=text, reply_markup=MAIN_KB(cid))
+        except Exception as e:
+            print("[CLUSTER] 대기 알림 전송 실패:", e)
+            break
+        db.execute("UPDATE outbox SET sent=? WHERE id=?", (time.time(), oid))
+        _cluster["sent"] += 1
+    db.execute("DELETE FROM outbox WHERE sent IS NOT NULL AND sent < ?", (time.time() - 86400,))
 
-def _release_lock():
+def cluster_leave():
+    """정상 종료 시 노드 기록을 지워 TTL 을 기다리지 않고 바로 재분배되게 한다 (재실행 시에는 호출 안 됨)"""
     try:
-        if os.path.exists(LOCK_FILE):
-            os.remove(LOCK_FILE)
+        _cluster_db().execute("DELETE FROM nodes WHERE node_id=?", (NODE_ID,))
     except:
         pass
 
-def _acquire_lock():
-    if os.path.exists(LOCK_FILE):
+def cluster_tick(context=None):
+    """생존 신호 + 링/리더 갱신 + (리더) 감시 목록 게시·알림 전송 / (팔로워) 감시 목록 반영"""
+    db = _cluster_db()
+    now = time.time()
+    info = json.dumps({"pid": os.getpid(), "port": PORT}, ensure_ascii=False)
+    db.execute(
+        "INSERT INTO nodes(node_id, started, heartbeat, info) VALUES(?,?,?,?) "
+        "ON CONFLICT(node_id) DO UPDATE SET heartbeat=excluded.heartbeat, info=excluded.info",
+        (NODE_ID, now, now, info),
+    )
+    db.execute("DELETE FROM nodes WHERE heartbeat < ?", (now - CLUSTER_NODE_TTL * 30,))
+    nodes = [r[0] for r in db.execute(
+        "SELECT node_id FROM nodes WHERE heartbeat >= ? ORDER BY started, node_id", (now - CLUSTER_NODE_TTL,))]
+    cur = lease_peek()
+    leader = cur.get("holder") if float(cur.get("expires") or 0) > now else None
+    role = "leader" if is_leader() else "follower"
+
+    with _cluster_lock:
+        ring_changed = nodes != _cluster["nodes"]
+        if ring_changed:
+            ring, keys = cluster_ring(nodes)
+            _cluster.update(nodes=nodes, ring=ring, ring_keys=keys)
+        _cluster.update(role=role, leader=leader)
+    if ring_changed:
+        print(f"[CLUSTER] 노드 {len(nodes)}개: {', '.join(nodes)} (리더 {leader})")
+        metric_inc("bot_cluster_rebalances_total")
+    if role == "follower" and leader is None:
+        # 리더 리스가 비었다 → 다시 실행해 리더 자리를 다툰다 (진 노드는 다시 팔로워로 뜬다)
+        reexec("리더 리스 만료")
+
+    if role == "leader":
+        _cluster_publish(db, now)
+        _cluster_drain(context)
+        added = False
+    else:
+        added = _cluster_mirror(db)
+    if ring_changed or added:
+        review_reschedule()
+    return role
+
+def cluster_status_lines():
+    if not CLUSTER_DB:
+        return []
+    owned = {}
+    for wid in _watch_specs():
+        owner = ring_owner(wid)
+        owned[owner] = owned.get(owner, 0) + 1
+    lines = [f"🕸 클러스터: 노드 {len(_cluster['nodes'])}개, 리더 {_cluster['leader'] or '없음'} (이 노드 {NODE_ID})"]
+    for n in _cluster["nodes"]:
+        lines.append(f"- {n}: 감시 {owned.get(n, 0)}개")
+    if is_leader():
         try:
-            with open(LOCK_FILE, "r") as f:
-                old = int((f.read() or "0").strip())
-            if old and _pid_alive(old):
-                print(f"[LOCK] Another bot instance is running (pid={old}). Exit.")
-                raise SystemExit(0)
+            pending = _cluster_db().execute("SELECT COUNT(*) FROM outbox WHERE sent IS NULL").fetchone()[0]
         except:
-            pass
-    with open(LOCK_FILE, "w") as f:
-        f.write(str(os.getpid()))
-    atexit.register(_release_lock)
+            pending = "?"
+        lines.append(f"- 다른 노드 알림: 전송 {_cluster['sent']}건, 대기 {pending}건")
+    return lines
+
+def cluster_metric_lines():
+    if not CLUSTER_DB:
+        return []
+    owned = sum(1 for wid in _watch_specs() if watch_owned(wid))
+    out = [
+        "# TYPE bot_cluster_nodes gauge", f"bot_cluster_nodes {len(_cluster['nodes'])}",
+        "# TYPE bot_cluster_leader gauge", f"bot_cluster_leader {1 if is_leader() else 0}",
+        "# TYPE bot_cluster_owned_watches gauge", f"bot_cluster_owned_watches {owned}",
+    ]
+    # 리더가 아직 보내지 않은 다른 노드 알림 수 (공유 표라 어느 노드에서 봐도 같은 값)
+    try:
+        pending = _cluster_db().execute("SELECT COUNT(*) FROM outbox WHERE sent IS NULL").fetchone()[0]
+        out += ["# TYPE bot_outbox_depth gauge", f"bot_outbox_depth {pending}"]
+    except:
+        pass
+    return out
+
+# ========= LEADER LEASE =========
+# pid 파일 잠금 대신 DATA_DIR 의 리스 파일로 리더 한 곳만 텔레그램/알림/상태 쓰기를 맡는다.
+# - 리스: {"holder", "token", "expires"}. 비었거나 만료됐을 때만 가져가며 그때마다 token 을 1 올린다.
+# - 펜싱: 상태 파일은 리스 잠금 안에서 내 token 이 아직 현재 token 일 때만 쓴다. 갱신이 밀려 만료 시각을
+#   넘긴 리더는 (다시 갱신할 때까지) 스스로 알림/저장을 멈추고, 다른 인스턴스가 가져갔으면 대기로 다시 실행한다.
+# - 대기 인스턴스는 텔레그램 준비와 상태/가격 읽기를 끝내 둔 채 리스만 확인하다가 만료 즉시 넘겨받는다.
+try:
+    import fcntl
+except ImportError:     # Windows 개발 환경: 잠금 없이 (배포 환경은 Linux)
+    fcntl = None
+
+_lease = {"token": None, "expires": 0.0, "holder": None, "since": None}
+
+def _lease_io(step):
+    """리스 잠금을 잡고 step(현재 리스 dict) 결과를 반환"""
+    fd = os.open(LEASE_FILE + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        return step(lease_peek())
+    finally:
+        os.close(fd)    # 닫으면 flock 도 풀린다
+
+def lease_peek():
+    # os.replace 로만 바꾸므로 잠금 없이 읽어도 반쯤 쓴 파일은 보이지 않는다
+    try:
+        with open(LEASE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except:
+        return {}
+
+def _lease_write(lease):
+    tmp = LEASE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(lease, f)
+    os.replace(tmp, LEASE_FILE)
+
+def _lease_mine(cur):
+    return cur.get("holder") == NODE_ID and _lease["token"] is not None and cur.get("token") == _lease["token"]
+
+def lease_try_acquire():
+    """리스가 내 것이면 갱신, 비었거나 만료됐으면 가져온다. 반환: 리더 여부"""
+    def step(cur):
+        now = time.time()
+        mine = _lease_mine(cur)
+        if not (mine or float(cur.get("expires") or 0) <= now):
+            return cur
+        new = {
+            "holder": NODE_ID, "token": cur.get("token") if mine else int(cur.get("token") or 0) + 1,
+            "expires": now + LEASE_TTL, "renewed": now, "host": socket.gethostname(), "pid": os.getpid(),
+        }
+        _lease_write(new)
+        return new
+
+    cur = _lease_io(step)
+    if cur.get("holder") == NODE_ID and (_lease["token"] is None or cur.get("token") == _lease["token"]):
+        if _lease["token"] is None:
+            _lease["since"] = time.time()
+            metric_inc("bot_lease_acquired_total")
+            print(f"[LEASE] 리더 리스 획득 (token {cur['token']})")
+        _lease.update(token=cur["token"], expires=float(cur["expires"]), holder=NODE_ID)
+        return True
+    _lease["holder"] = cur.get("holder")
+    return False
+
+def is_leader():
+    # 로컬에서 아는 만료 시각 기준: 갱신이 밀리면 파일을 다시 보지 않아도 바로 리더 동작을 멈춘다
+    return _lease["token"] is not None and _lease["expires"] > time.time()
+
+def lease_fenced(fn):
+    """리스 잠금 안에서 내 token 이 아직 현재 token 이면 fn() 실행. 반환: 실행 여부"""
+    def step(cur):
+        if not _lease_mine(cur):
+            return False
+        fn()
+        return True
+    return _lease_io(step)
+
+def lease_release():
+    # 정상 종료: 만료 시각만 지워 대기 인스턴스가 TTL 을 기다리지 않고 바로 넘겨받게 한다
+    if _lease["token"] is None:
+        return
+    flush_state()   # 반납하면 더는 쓸 수 없으므로 먼저 저장
+    snapshot_save()
+    def step(cur):
+        if _lease_mine(cur):
+            _lease_write(dict(cur, expires=0.0))
+    try:
+        _lease_io(step)
+        print("[LEASE] 리더 리스 반납")
+    except:
+        pass
+    _lease.update(token=None, expires=0.0)
+
+def reexec(why):
+    """역할을 바꿀 때: 같은 pid 로 처음부터 다시 실행 (atexit 는 돌지 않는다)"""
+    print(f"[LEASE] {why} → 다시 실행")
+    try:
+        scraper_stop()
+    except:
+        pass
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+def _lease_keeper():
+    """(리더) 리스 갱신 스레드. job_queue 가 밀려도 갱신은 제때 되도록 따로 돈다"""
+    while True:
+        time.sleep(LEASE_RENEW)
+        try:
+            held = lease_try_acquire()
+        except Exception as e:
+            print("[LEASE] 갱신 실패:", e)
+            continue    # 만료 시각이 지나면 is_leader() 가 False 가 되어 알림/저장이 멈춘다
+        if not held:
+            metric_inc("bot_lease_lost_total")
+            _lease.update(token=None, expires=0.0)
+            reexec(f"리더 리스를 {_lease['holder']} 에게 넘김")
+
+def lease_start_keeper():
+    atexit.register(lease_release)
+    threading.Thread(target=_lease_keeper, name="lease-keeper", daemon=True).start()
+
+def _standby_warm(seen_mtime):
+    """(대기) 리더가 쓴 상태 파일이 바뀌면 다시 읽고, 감시 코인 가격을 한 번에 받아 둔다"""
+    try:
+        mtime = os.path.getmtime(DATA_FILE)
+    except OSError:
+        mtime = None
+    if mtime != seen_mtime:
+        try:
+            fresh = load_state()
+            state.clear()
+            state.update(fresh)
+        except Exception as e:
+            print("[LEASE] 대기 중 상태 읽기 실패:", e)
+    markets = list((state.get("coins") or {}).keys())
+    if markets:
+        try:
+            get_tickers(markets)
+        except Exception as e:
+            print("[LEASE] 대기 중 가격 조회 실패:", e)
+    return mtime
+
+def lease_standby():
+    """리더 리스를 얻을 때까지 대기 (warm standby). 반환 시 이 인스턴스가 리더"""
+    cur = lease_peek()
+    print(f"[LEASE] 대기 인스턴스 {NODE_ID}: 리더 {cur.get('holder')} "
+          f"(리스 {max(0.0, float(cur.get('expires') or 0) - time.time()):.0f}초 남음)")
+    _mark_startup("standby")
+    mtime = None
+    last_warm = 0.0
+    while not lease_try_acquire():
+        if time.time() - last_warm >= 3:
+            mtime = _standby_warm(mtime)
+            last_warm = time.time()
+        time.sleep(LEASE_POLL)
+    _standby_warm(None)     # 넘겨받은 시점의 최신 상태 (이제 이전 리더는 쓸 수 없다)
+    print(f"[LEASE] 대기 → 리더 전환 ({time.time() - float(cur.get('expires') or 0):+.1f}s, 리스 만료 기준)")
+
+def lease_status_line():
+    cur = lease_peek()
+    left = float(cur.get("expires") or 0) - time.time()
+    if is_leader():
+        up_for = time.time() - (_lease["since"] or time.time())
+        left = _lease["expires"] - time.time()
+        return f"👑 리더 리스: 이 인스턴스 (token {_lease['token']}, {up_for / 60:.0f}분째, 만료까지 {left:.0f}초)"
+    return f"👑 리더 리스: {cur.get('holder') or '없음'} (이 인스턴스는 대기, 만료까지 {max(0.0, left):.0f}초)"
 
 def _setup_signals():
+    # 종료 신호 → atexit(리스 반납/상태 저장) 실행
     for sig in (signal.SIGINT, signal.SIGTERM):
         try:
-            signal.signal(sig, lambda *_: (_release_lock(), exit(0)))
+            signal.signal(sig, lambda *_: exit(0))
         except:
             pass
 
-_acquire_lock()
-_setup_signals()
+# ========= WARM RESTART 스냅샷 =========
+# portfolio.json 에 없는 실행 중 캐시(가격표, 광고그룹/Searchad 목록, 분석한 검색 페이지, job 실행 기록,
+# 처리한 웹훅 update_id)를 주기적으로와 종료 시에 DATA_DIR/runtime_snapshot.json 에 남기고 기동 때 되살린다.
+# 각 항목은 받은 시각을 그대로 가지고 돌아오므로 기존 TTL(NAVER_ADGROUP_TTL 등) 판단이 그대로 적용된다.
+SNAPSHOT_FILE = os.path.join(DATA_DIR, "runtime_snapshot.json")
+_SNAPSHOT_VERSION = 1
+_snapshot = {"saved": 0.0, "bytes": 0, "restored": 0, "restored_age": None}
+
+def _snapshot_collect():
+    with _adgroup_lock:
+        adgroups = {k: dict(v) for k, v in _adgroup_cache.items()}
+    with _searchad_tree_lock:
+        tree = dict(_searchad_tree)
+    with _rank_pages_lock:
+        pages = [[k[0], k[1], v[0], v[1]["list"], v[1]["ad_fallback"]] for k, v in _rank_pages.items()]
+    with _jobs_lock:
+        jobs = {
+            name: {k: (list(st[k]) if k in ("durations", "lags") else st[k])
+                   for k in ("durations", "lags", "runs", "errors", "skipped", "overruns", "last_error")}
+            for name, st in _jobs.items()
+        }
+    return {
+        "v": _SNAPSHOT_VERSION, "at": time.time(), "node": NODE_ID,
+        "prices": dict(_price_cache),
+        "adgroups": adgroups,
+        "searchad_tree": tree,
+        "rank_pages": pages,
+        "jobs": jobs,
+        "webhook_ids": list(_webhook["recent"]),
+    }
+
+def snapshot_save(context=None):
+    """리더만 쓴다 (대기/팔로워의 캐시는 리더 것보다 오래됐을 수 있음)"""
+    if not is_leader():
+        return
+    try:
+        data = json.dumps(_snapshot_collect(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    except Exception as e:
+        print("[SNAPSHOT] 수집 실패:", e)
+        return
+    tmp = SNAPSHOT_FILE + ".tmp"
+
+    def write():
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, SNAPSHOT_FILE)
+
+    if lease_fenced(write):
+        _snapshot.update(saved=time.time(), bytes=len(data))
+        metric_inc("bot_snapshot_writes_total")
+        metric_inc("bot_snapshot_write_bytes_total", len(data))
+
+def snapshot_restore():
+    """기동 시 1회. 이미 있는 항목(대기 중 받아 둔 가격 등)은 더 최근 것만 남긴다. 반환: 되살린 항목 수"""
+    try:
+        with open(SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except Exception as e:
+        print("[SNAPSHOT] 읽기 실패:", e)
+        return 0
+    age = time.time() - float(snap.get("at") or 0)
+    if snap.get("v") != _SNAPSHOT_VERSION or age > SNAPSHOT_MAX_AGE:
+        print(f"[SNAPSHOT] 오래된 스냅샷 무시 ({age / 60:.0f}분 전)")
+        return 0
+
+    n = 0
+    for m, (at, price) in (snap.get("prices") or {}).items():
+        if m not in _price_cache or _price_cache[m][0] < at:
+            _price_cache[m] = (at, price)
+            n += 1
+    with _adgroup_lock:
+        for k, v in (snap.get("adgroups") or {}).items():
+            if k not in _adgroup_cache or _adgroup_cache[k]["at"] < v["at"]:
+                _adgroup_cache[k] = v
+                n += 1
+    tree = snap.get("searchad_tree") or {}
+    with _searchad_tree_lock:
+        if float(tree.get("at") or 0) > _searchad_tree["at"]:
+            _searchad_tree.update(tree)
+            n += 1
+    with _rank_pages_lock:
+        for kw, page, at, parsed, *fallback in snap.get("rank_pages") or []:
+            if time.time() - at < NAVER_RANK_PAGE_TTL:
+                entry = {"list": parsed, "ad_fallback": fallback[0] if fallback else {}}
+                _rank_pages.setdefault((kw, page), (at, entry))
+                n += 1
+    for name, saved in (snap.get("jobs") or {}).items():
+        st = _job_entry(name, None, None)
+        with _jobs_lock:
+            for k in ("durations", "lags"):
+                old = list(st[k])
+                st[k].clear()
+                st[k].extend(list(saved.get(k) or []) + old)
+            for k in ("runs", "errors", "skipped", "overruns"):
+                st[k] += int(saved.get(k) or 0)
+            st["last_error"] = st["last_error"] or saved.get("last_error")
+        n += 1
+    _webhook["recent"].extend(i for i in snap.get("webhook_ids") or [] if i not in _webhook["recent"])
+    _snapshot.update(restored=n, restored_age=age)
+    print(f"[SNAPSHOT] {n}개 항목 복원 ({age:.0f}초 전, {snap.get('node')})")
+    metric_inc("bot_snapshot_restored_total", n)
+    return n
+
+def snapshot_status_line():
+    restored = (f"기동 시 {_snapshot['restored']}개 복원 ({_snapshot['restored_age']:.0f}초 전 것)"
+                if _snapshot["restored_age"] is not None else "기동 시 복원 없음")
+    if not _snapshot["saved"]:
+        return f"💾 재시작 스냅샷: 아직 저장 안 함, {restored}"
+    ago = time.time() - _snapshot["saved"]
+    return f"💾 재시작 스냅샷: {ago / 60:.0f}분 전 저장 ({_snapshot['bytes'] / 1024:.1f} KiB), {restored}"
+
+def startup_first(sec, jitter=None):
+    """job 첫 실행 시각: 기본값 + 0~jitter 초 (재배포 직후 모든 job 이 같은 순간 API 를 치지 않도록)"""
+    jitter = STARTUP_JITTER if jitter is None else jitter
+    return sec + random.uniform(0, jitter)
+
+def stagger_overdue_watches():
+    """
+    오래 멈춰 있던 뒤 기동하면 리뷰감시 대상이 모두 밀린 상태라 첫 주기에 몰린다.
+    밀린 곳은 각자 주기 안에서 골고루 흩어 다시 잡는다 (마지막 리뷰 수 기준은 그대로).
+    """
+    now = time.time()
+    n = 0
+    for p in review_watch_places().values():
+        interval = int(p.get("interval", 180))
+        if _review_due(p) < now:
+            p["last_check"] = now - interval + random.uniform(0, min(interval, 60 + STARTUP_JITTER))
+            n += 1
+    if n:
+        review_reschedule()
+        print(f"[SNAPSHOT] 밀린 리뷰감시 {n}곳 분산")
+    return n
 
 # ========= STATE LOAD/SAVE =========
 def _default_state():
+    places = {}
+    if NAVER_PLACE_ID:
+        places[NAVER_PLACE_ID] = {"interval": 180, "last_count": None, "last_check": 0.0}
     return {
         "coins": {},
+        "all_rules": [],                 # 모든 코인에 적용하는 구간 알림 규칙 (코인별은 coins[m]["rules"])
         "default_threshold_pct": DEFAULT_THRESHOLD,
         "pending": {},
         "naver": {
             "auto_enabled": False,
             "schedules": [],
             "last_applied": "",
+            "last_applied_keys": {},     # 대상별 마지막 적용 키 (중복 적용 방지)
             "last_known_bid": None,
             "adgroup_id": None,
             "abtest": None,
@@ -138,10 +1441,11 @@ def _default_state():
             },
             "review_watch": {
                 "enabled": False,
-                "interval": 180,
-                "last_count": None,
-                "last_check": 0.0,
+                "interval": 180,        # 새 플레이스 기본 간격
+                "places": places,       # place_id -> {"interval", "last_count", "last_check"}
             },
+            "review_sources": {},        # 리뷰 URL별 성공률/지연 통계
+            "stats": {"final_day": None, "last_pull": 0.0},   # 광고 통계: 확정된 마지막 날짜
         },
         "modes": {},
     }
@@ -156,15 +1460,18 @@ def load_state():
         return _default_state()
 
     d.setdefault("coins", {})
+    d.setdefault("all_rules", [])
     d.setdefault("default_threshold_pct", DEFAULT_THRESHOLD)
     d.setdefault("pending", {})
     nav = d.setdefault("naver", {})
     nav.setdefault("auto_enabled", False)
     nav.setdefault("schedules", [])
     nav.setdefault("last_applied", "")
+    nav.setdefault("last_applied_keys", {})
     nav.setdefault("last_known_bid", None)
     nav.setdefault("adgroup_id", None)
     nav.setdefault("abtest", None)
+    nav.setdefault("stats", {"final_day": None, "last_pull": 0.0})
 
     rw = nav.setdefault("rank_watch", {})
     rw.setdefault("enabled", False)
@@ -177,8 +1484,30 @@ def load_state():
     rv = nav.setdefault("review_watch", {})
     rv.setdefault("enabled", False)
     rv.setdefault("interval", 180)
-    rv.setdefault("last_count", None)
-    rv.setdefault("last_check", 0.0)
+    # 단일 NAVER_PLACE_ID 시절 값 → places 로 1회 이전
+    migrate = "places" not in rv
+    places = rv.setdefault("places", {})
+    legacy_count = rv.pop("last_count", None)
+    legacy_check = rv.pop("last_check", 0.0)
+    for k in ("last_total", "last_visitor", "last_blog"):
+        rv.pop(k, None)
+    if migrate and NAVER_PLACE_ID:
+        places[NAVER_PLACE_ID] = {
+            "interval": int(rv.get("interval", 180)),
+            "last_count": legacy_count,
+            "last_check": float(legacy_check or 0.0),
+        }
+    for p in places.values():
+        p.setdefault("interval", int(rv.get("interval", 180)))
+        p.setdefault("last_count", None)
+        p.setdefault("last_check", 0.0)
+
+    nav.setdefault("review_sources", {})
+    # 이전 버전이 조회 시작 시각을 파싱 타이머로 덮어써 지연이 ~1.7e9초로 저장된 통계 복구
+    for st in nav["review_sources"].values():
+        lat = st.get("latency")
+        if lat is not None and not 0 <= float(lat) < 3600:
+            st["latency"] = None
 
     d.setdefault("modes", {})
 
@@ -198,27 +1527,83 @@ def load_state():
                     pass
                 info[k] = None
 
-    if changed:
-        tmp = DATA_FILE + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(d, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, DATA_FILE)
+    if changed and is_leader():
+        def write():
+            tmp = DATA_FILE + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(d, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, DATA_FILE)
+        lease_fenced(write)
 
     return d
 
+_state_dirty = threading.Event()
+
 def save_state():
+    if not _state_loaded.is_set():
+        init_state()    # 읽기 전에 빈 상태로 파일을 덮어쓰지 않도록
+    _state_dirty.clear()
+    if not is_leader():
+        return          # 대기/팔로워는 쓰지 않는다 (팔로워 진행 상태는 cluster_push 로)
     tmp = DATA_FILE + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, DATA_FILE)
+    data = json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")
 
-state = load_state()
+    def write():
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, DATA_FILE)
 
-if "default_threshold_pct" not in state:
-    state["default_threshold_pct"] = float(DEFAULT_THRESHOLD)
-    save_state()
+    if not lease_fenced(write):
+        metric_inc("bot_state_fenced_total")
+        print("[LEASE] 리더 리스가 바뀌어 상태 저장 거부")
+        return
+    metric_inc("bot_state_writes_total")
+    metric_inc("bot_state_write_bytes_total", len(data))
+
+def mark_state_dirty():
+    # 조회 결과처럼 자주 바뀌는 값은 바로 쓰지 않고 flush_state 주기에 모아서 저장
+    _state_dirty.set()
+
+def flush_state(context=None):
+    if _state_dirty.is_set():
+        try:
+            save_state()
+        except Exception as e:
+            print("[STATE] 저장 실패:", e)
+
+# 임포트 시에는 빈 dict. main() 의 init_state() 가 같은 객체를 채운다 (다른 모듈이 잡은 참조 유지)
+state = {}
+_state_loaded = threading.Event()
+_state_init_lock = threading.Lock()
+
+def init_state():
+    """portfolio.json 읽기/마이그레이션 (처음 한 번만)"""
+    if _state_loaded.is_set():
+        return state
+    with _state_init_lock:
+        if not _state_loaded.is_set():
+            state.clear()
+            state.update(load_state())
+            _state_loaded.set()
+            if "default_threshold_pct" not in state:
+                state["default_threshold_pct"] = float(DEFAULT_THRESHOLD)
+                save_state()
+    return state
 
 # ========= MODE / KEYBOARD =========
+# 키보드 객체는 만들 때 telegram 을 불러온다 (임포트 후에는 sys.modules 캐시)
+def ReplyKeyboardMarkup(*args, **kwargs):
+    from telegram import ReplyKeyboardMarkup as _Markup
+    return _Markup(*args, **kwargs)
+
+def InlineKeyboardMarkup(*args, **kwargs):
+    from telegram import InlineKeyboardMarkup as _Markup
+    return _Markup(*args, **kwargs)
+
+def InlineKeyboardButton(*args, **kwargs):
+    from telegram import InlineKeyboardButton as _Button
+    return _Button(*args, **kwargs)
+
 def get_mode(cid):
     return state.setdefault("modes", {}).get(str(cid), "coin")
 
@@ -234,7 +1619,7 @@ def MAIN_KB(cid=None):
                 ["광고상태", "노출현황", "리뷰현황"],
                 ["광고시간", "광고설정", "입찰추정"],
                 ["광고자동", "노출감시", "리뷰감시"],
-                ["도움말", "메뉴"],
+                ["입찰예측", "도움말", "메뉴"],
             ],
             resize_keyboard=True,
         )
@@ -257,16 +1642,19 @@ def mode_inline_kb():
         ]]
     )
 
-COIN_MODE_KB = ReplyKeyboardMarkup(
-    [["추가", "삭제"], ["취소"]],
-    resize_keyboard=True,
-    one_time_keyboard=True,
-)
-CANCEL_KB = ReplyKeyboardMarkup(
-    [["취소"]],
-    resize_keyboard=True,
-    one_time_keyboard=True,
-)
+def COIN_MODE_KB():
+    return ReplyKeyboardMarkup(
+        [["추가", "삭제"], ["취소"]],
+        resize_keyboard=True,
+        one_time_keyboard=True,
+    )
+
+def CANCEL_KB():
+    return ReplyKeyboardMarkup(
+        [["취소"]],
+        resize_keyboard=True,
+        one_time_keyboard=True,
+    )
 
 def coin_kb(include_cancel=True):
     syms = [m.split("-")[1] for m in state["coins"].keys()] or ["BTC", "ETH", "SOL"]
@@ -290,14 +1678,94 @@ def fmt(n):
     except:
         return str(n)
 
+_price_cache = {}   # market -> (받은 시각, trade_price)
+
+def _upbit_ticker(markets):
+    markets = ",".join(sorted(set(m.strip().upper() for m in markets.split(",") if m.strip())))
+
+    def get():
+        # 404(상장 폐지/잘못된 마켓) 같은 4xx 는 요청 문제라 차단기 실패로 세지 않는다
+        breaker_allow("upbit")
+        try:
+            r = http_request("GET", f"{UPBIT}/ticker", params={"markets": markets}, timeout=5)
+        except Exception as e:
+            breaker_result("upbit", False, f"{type(e).__name__}: {e}")
+            raise
+        failed = upstream_failed(str(r.status_code))
+        breaker_result("upbit", not failed, f"HTTP {r.status_code}" if failed else None)
+        r.raise_for_status()
+        return r.json()
+
+    # 가격/보기 같은 한 마켓 조회는 그 마켓이 든 묶음 요청(check_loop 등)이 진행 중이면 거기에 합류한다.
+    # 묶음이 실패하면(다른 잘못된 마켓 때문일 수 있음) 차단기 거절이 아닌 이상 따로 받는다.
+    wanted = set(markets.split(","))
+    try:
+        rows = single_flight_join("upbit_ticker", lambda k: wanted <= set(k[1].split(",")))
+    except BreakerOpen:
+        raise
+    except:
+        rows = None
+    if rows is not None:
+        return [t for t in rows if t["market"] in wanted]
+    return single_flight(("upbit_ticker", markets), get)
+
 def get_ticker(market):
-    r = requests.get(f"{UPBIT}/ticker", params={"markets": market}, timeout=5)
-    r.raise_for_status()
-    return r.json()[0]
+    t = _upbit_ticker(market)[0]
+    _price_cache[market] = (time.time(), float(t["trade_price"]))
+    return t
 
-def get_price(market):
+def get_tickers(markets):
+    """여러 마켓을 요청 한 번으로. 반환 {market: ticker}"""
+    rows = _upbit_ticker(",".join(markets))
+    now = time.time()
+    out = {}
+    for t in rows:
+        out[t["market"]] = t
+        _price_cache[t["market"]] = (now, float(t["trade_price"]))
+    return out
+
+def get_price(market, max_age=None):
+    """max_age 초 이내에 받은 가격이 있으면 그대로 (대기 인스턴스가 채워 둔 값 포함)"""
+    if max_age:
+        hit = _price_cache.get(market)
+        if hit and time.time() - hit[0] <= max_age:
+            return hit[1]
     return float(get_ticker(market)["trade_price"])
 
+def get_prices(markets, max_age=None):
+    """
+    여러 마켓 현재가 {market: price}. max_age 초 이내 캐시는 그대로 쓰고 나머지는 요청 한 번으로.
+    묶음 요청이 실패하면(잘못 등록된 코인 하나로 전체가 거절되는 경우 등) 마켓별로 다시 받는다.
+    Upbit 차단기가 열려 있으면 BreakerOpen.
+    """
+    now = time.time()
+    out = {}
+    missing = []
+    for m in markets:
+        hit = _price_cache.get(m) if max_age else None
+        if hit and now - hit[0] <= max_age:
+            out[m] = hit[1]
+        else:
+            missing.append(m)
+    if not missing:
+        return out
+    try:
+        for m, t in get_tickers(missing).items():
+            out[m] = float(t["trade_price"])
+        return out
+    except BreakerOpen:
+        raise
+    except:
+        pass
+    for m in missing:
+        try:
+            out[m] = float(get_ticker(m)["trade_price"])
+        except BreakerOpen:
+            raise
+        except:
+            pass
+    return out
+
 def norm_threshold(th):
     if th is None:
         return float(state.get("default_threshold_pct", DEFAULT_THRESHOLD))
@@ -324,6 +1792,11 @@ def reply(update, text, kb=None):
 def send_ctx(ctx, text):
     if not CHAT_ID:
         return
+    if not is_leader():
+        # 팔로워 노드는 텔레그램에 직접 보내지 않고 리더에게 넘긴다 (대기 인스턴스/리스 만료 리더는 보내지 않음)
+        if CLUSTER_DB:
+            cluster_outbox_put(text)
+        return
     try:
         cid = int(CHAT_ID)
     except:
@@ -484,22 +1957,37 @@ HELP = (
     "\n"
     "📊 코인 기능\n"
     "• 보기 / 상태 / 코인 / 가격 / 평단 / 수량 / 임계값 / 지정가\n"
+    "• 알림규칙 : 'SOL -3% 10분', 'XRP 신고가 1시간', '전체 +5% 30분' 같은 기간 내 변동 알림\n"
     "\n"
     "📢 네이버 광고 기능\n"
     "• 광고상태 : 현재 설정/감시 요약\n"
     "• 광고설정 X : 입찰가를 X원으로 즉시 변경\n"
-    "• 광고시간 : 'HH:MM/입찰가' 형식 시간표 설정\n"
+    "• 광고시간 : '[평일|주말|월수금|기간] HH:MM/입찰가[@대상]' 시간표 설정 (대상: g:광고그룹, k:키워드)\n"
+    "• 광고목록 : 캠페인/광고그룹/키워드 입찰 현황\n"
+    "• 광고통계 : 오늘/어제 비용, 시간대별 클릭당 비용(CPC)\n"
+    "• 키워드입찰 : '키워드/입찰가 ...' 여러 키워드 입찰 일괄 변경\n"
     "• 광고자동 : 시간표 자동 적용 켜기/끄기\n"
-    "• 입찰추정 : 1순위 추정 입찰가 자동 탐색\n"
+    "• 입찰추정 : 1순위 추정 입찰가 자동 탐색 (이진탐색/단계상승)\n"
+    "• 입찰예측 [검색어] [N위] [HH:MM] : 지난 관측으로 학습한 예상 입찰가 (불확실하면 입찰추정으로 연결)\n"
     "• 노출감시 : 플레이스 순위 변동 실시간 감시 (광고/기본 순위 함께 표시)\n"
-    "• 노출현황 : 현재 플레이스 순위를 즉시 1회 조회 (광고/기본 순위 함께 표시)\n"
-    "• 리뷰감시 : NAVER_PLACE_ID 기준 신규 리뷰 감시\n"
+    "• 노출현황 : 현재 플레이스 순위를 즉시 1회 조회 (광고/기본 순위 함께 표시, 첫 페이지 밖은 다음 페이지까지 확인)\n"
+    "• 리뷰감시 [분] : 등록된 플레이스 신규 리뷰 감시 (추가/삭제/목록 <플레이스ID>)\n"
     "• 리뷰현황 : 현재 리뷰 개수를 즉시 1회 조회\n"
     "\n"
     "🏨 호텔 : 랜덤 후기 3줄 생성\n"
+    "⏱ 작업상태 : 주기 작업별 실행 시간(p50/p95)·지연·오류, 텔레그램 수신 방식(웹훅/폴링)\n"
+    "🧪 프로파일 <작업|on_text|전체> [횟수] : 지정 횟수 동안 프로파일 후 DATA_DIR/profiles 에 저장 (주인 전용)\n"
     "🔧 메뉴 : '네이버 광고 / 코인 가격알림' 모드 전환"
 )
 
+ALERT_RULE_HELP = (
+    "사용법: 알림규칙 <코인|전체> <규칙>\n"
+    "• -3% 10분 : 10분 안의 고점 대비 3% 하락 (+5% 는 저점 대비 상승, 3% 는 양방향)\n"
+    "• 신고가 1시간 / 신저가 1시간 : 지난 1시간 최고가 돌파 / 최저가 이탈\n"
+    "• 평균 +2% 30분 : 30분 평균가 대비 2% 위\n"
+    "알림규칙 목록 / 알림규칙 삭제 <번호|전체>"
+)
+
 # ========= PENDING =========
 def set_pending(cid, action, step="symbol", data=None):
     p = state["pending"].setdefault(str(cid), {})
@@ -528,6 +2016,7 @@ def ensure_coin(m):
     )
     c.setdefault("triggers", [])
     c.setdefault("prev_price", None)
+    c.setdefault("rules", [])
     return c
 
 def act_add(update, symbol):
@@ -622,6 +2111,216 @@ def trigger_clear(symbol):
     save_state()
     return n
 
+# ========= 구간 알림 규칙 (시간 창) =========
+# 규칙: {"kind": "move"|"high"|"low"|"avg", "dir": "up"|"down"|"both", "pct": float, "window": 초}
+#   move : 창 안의 저점 대비 +pct% (up) / 고점 대비 -pct% (down)    예) SOL -3% 10분
+#   high : 창 안의 최고가를 넘음 (신고가)  low : 최저가를 깨뜨림     예) XRP 신고가 1시간
+#   avg  : 창 평균 대비 ±pct%                                          예) BTC 평균 +2% 1시간
+# (마켓, 창 길이)마다 시세를 한 번만 담고, 최고/최저는 단조 덱으로, 평균은 누적합으로 유지해
+# 틱마다 규칙 하나에 O(1)(분할 상환)로 판정한다. 과거 기록을 다시 훑지 않는다.
+RULE_WINDOW_MIN = 60
+RULE_WINDOW_MAX = 24 * 3600
+_RULE_KINDS = {"신고가": "high", "신저가": "low"}
+_RULE_DUR_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(초|분|시간|s|m|h)\s*$", re.I)
+_RULE_PCT_RE = re.compile(r"^([+\-±]?)(\d+(?:\.\d+)?)%$")
+_RULE_UNITS = {"초": 1, "s": 1, "분": 60, "m": 60, "시간": 3600, "h": 3600}
+
+_price_windows = {}     # (market, window) -> {"span", "q", "maxq", "minq", "sum"}
+_rule_quiet = {}        # (market, 규칙 key) -> 이 시각(monotonic)까지 같은 규칙 알림 안 함
+
+def parse_alert_rule(text):
+    """'-3% 10분' / '신고가 1시간' / '평균 +2% 30분' → 규칙 dict. 형식 오류는 ValueError"""
+    text = text.replace("−", "-").replace("내", " ").strip()
+    md = _RULE_DUR_RE.search(text)
+    if not md:
+        raise ValueError("기간은 '10분', '1시간' 처럼 입력하세요.")
+    window = int(float(md.group(1)) * _RULE_UNITS[md.group(2).lower()])
+    if not RULE_WINDOW_MIN <= window <= RULE_WINDOW_MAX:
+        raise ValueError("기간은 1분 ~ 24시간 사이로 입력하세요.")
+    body = text[:md.start()].replace("평균", "평균 ").split()
+    if not body:
+        raise ValueError("형식: <변동%|신고가|신저가|평균 ±%> <기간>")
+
+    if len(body) == 1 and body[0] in _RULE_KINDS:
+        kind = _RULE_KINDS[body[0]]
+        return {"kind": kind, "dir": "up" if kind == "high" else "down", "pct": 0.0, "window": window}
+
+    kind = "move"
+    if body[0] == "평균":
+        kind = "avg"
+        body = body[1:]
+    mp = _RULE_PCT_RE.match("".join(body))
+    if not mp:
+        raise ValueError("변동은 '+5%', '-3%', '3%'(양방향) 처럼 입력하세요.")
+    pct = float(mp.group(2))
+    if pct <= 0:
+        raise ValueError("변동 %는 0보다 커야 합니다.")
+    direction = {"+": "up", "-": "down"}.get(mp.group(1), "both")
+    return {"kind": kind, "dir": direction, "pct": pct, "window": window}
+
+def _alert_rule_key(rule):
+    return (rule["kind"], rule["dir"], float(rule["pct"]), int(rule["window"]))
+
+def _window_text(sec):
+    if sec % 3600 == 0:
+        return f"{sec // 3600}시간"
+    if sec % 60 == 0:
+        return f"{sec // 60}분"
+    return f"{sec}초"
+
+def alert_rule_text(rule):
+    w = _window_text(int(rule["window"]))
+    sign = {"up": "+", "down": "-", "both": "±"}[rule["dir"]]
+    if rule["kind"] == "high":
+        return f"{w} 신고가"
+    if rule["kind"] == "low":
+        return f"{w} 신저가"
+    if rule["kind"] == "avg":
+        return f"{w} 평균 대비 {sign}{rule['pct']:g}%"
+    return f"{w} 내 {sign}{rule['pct']:g}%"
+
+def alert_rule_items():
+    """번호를 매길 전체 목록 [(market 또는 '*', index, rule)] (전체 규칙 먼저, 코인은 이름순)"""
+    items = [("*", i, r) for i, r in enumerate(state.get("all_rules") or [])]
+    for m in sorted(state["coins"]):
+        items += [(m, i, r) for i, r in enumerate(state["coins"][m].get("rules") or [])]
+    return items
+
+def alert_rule_add(symbol, text):
+    rule = parse_alert_rule(text)
+    if symbol in ("전체", "*", "ALL"):
+        rules = state.setdefault("all_rules", [])
+        where = "전체 코인"
+    else:
+        m = krw_symbol(symbol)
+        rules = ensure_coin(m)["rules"]
+        where = m.split("-")[1]
+    if any(_alert_rule_key(r) == _alert_rule_key(rule) for r in rules):
+        raise ValueError("같은 규칙이 이미 있습니다.")
+    rules.append(rule)
+    save_state()
+    return f"{where}: {alert_rule_text(rule)}"
+
+def alert_rule_delete(numbers):
+    """numbers: 1부터 시작하는 목록 번호 집합. 반환: 지운 개수"""
+    picked = [(m, i) for n, (m, i, _) in enumerate(alert_rule_items(), start=1) if n in numbers]
+    # 같은 목록 안에서는 뒤 번호부터 지워야 앞 번호가 밀리지 않는다
+    for m, i in sorted(picked, key=lambda x: -x[1]):
+        rules = state["all_rules"] if m == "*" else state["coins"][m]["rules"]
+        rules.pop(i)
+    if picked:
+        save_state()
+    return len(picked)
+
+def alert_rule_lines():
+    items = alert_rule_items()
+    if not items:
+        return ["구간 알림 규칙: 없음"]
+    lines = ["⏱ 구간 알림 규칙"]
+    for n, (m, _, r) in enumerate(items, start=1):
+        where = "전체" if m == "*" else m.split("-")[1]
+        lines.append(f"{n}. {where}: {alert_rule_text(r)}")
+    return lines
+
+def _win_new(span):
+    return {"span": span, "q": deque(), "maxq": deque(), "minq": deque(), "sum": 0.0}
+
+def _win_expire(w, now):
+    cut = now - w["span"]
+    q = w["q"]
+    while q and q[0][0] < cut:
+        w["sum"] -= q.popleft()[1]
+    if not q:
+        w["sum"] = 0.0      # 부동소수 누적 오차 초기화
+    for mq in (w["maxq"], w["minq"]):
+        while mq and mq[0][0] < cut:
+            mq.popleft()
+
+def _win_push(w, ts, price):
+    w["q"].append((ts, price))
+    w["sum"] += price
+    mx, mn = w["maxq"], w["minq"]
+    while mx and mx[-1][1] <= price:
+        mx.pop()
+    mx.append((ts, price))
+    while mn and mn[-1][1] >= price:
+        mn.pop()
+    mn.append((ts, price))
+
+def _rule_hit(rule, w, cur, now):
+    """창(이번 가격을 넣기 전)과 현재가로 판정. 반환: 알림 설명 문자열 또는 None"""
+    q = w["q"]
+    if not q:
+        return None
+    hi, lo = w["maxq"][0][1], w["minq"][0][1]
+    # 신고가/신저가/평균은 창을 거의 다 채운 뒤부터 (기동 직후 첫 가격이 모두 신고가가 되지 않도록)
+    full = now - q[0][0] >= w["span"] * 0.9
+    kind, d, pct = rule["kind"], rule["dir"], float(rule["pct"])
+
+    if kind == "high":
+        return f"신고가 (이전 최고 {fmt(hi)})" if full and cur > hi else None
+    if kind == "low":
+        return f"신저가 (이전 최저 {fmt(lo)})" if full and cur < lo else None
+    if kind == "avg":
+        if not full:
+            return None
+        mean = w["sum"] / len(q)
+        chg = (cur / mean - 1) * 100 if mean > 0 else 0.0
+        if (d != "down" and chg >= pct) or (d != "up" and chg <= -pct):
+            return f"평균 {fmt(mean)} 대비 {chg:+.2f}%"
+        return None
+    up = (cur / lo - 1) * 100 if lo > 0 else 0.0
+    down = (cur / hi - 1) * 100 if hi > 0 else 0.0
+    if d != "down" and up >= pct:
+        return f"저점 {fmt(lo)} 대비 {up:+.2f}%"
+    if d != "up" and down <= -pct:
+        return f"고점 {fmt(hi)} 대비 {down:+.2f}%"
+    return None
+
+def window_rules_tick(prices, now=None):
+    """
+    틱마다 {market: 현재가} 로 규칙 판정 후 창에 넣는다. 반환: 알림 문구 목록.
+    한 번 울린 규칙은 그 창 길이만큼 같은 코인에서 다시 울리지 않는다.
+    """
+    now = time.monotonic() if now is None else now
+    common = state.get("all_rules") or []
+    alerts = []
+    used = set()
+    for m, cur in prices.items():
+        info = state["coins"].get(m)
+        if info is None or not cur:
+            continue
+        rules = {}
+        for r in list(common) + list(info.get("rules") or []):
+            rules.setdefault(_alert_rule_key(r), r)       # 전체/코인 규칙이 같으면 한 번만
+        spans = {int(r["window"]) for r in rules.values()}
+        for span in spans:
+            w = _price_windows.get((m, span))
+            if w is None:
+                w = _price_windows[(m, span)] = _win_new(span)
+            _win_expire(w, now)
+            used.add((m, span))
+        for key, r in rules.items():
+            if _rule_quiet.get((m, key), 0.0) > now:
+                continue
+            why = _rule_hit(r, _price_windows[(m, int(r["window"]))], cur, now)
+            if why:
+                _rule_quiet[(m, key)] = now + int(r["window"])
+                # pretty_sym 은 시세를 다시 받으므로 이번 틱 가격으로 직접 표시
+                e = status_emoji(info, cur)
+                alerts.append(f"{e} {m.split('-')[1]} {e}: {alert_rule_text(r)} → 현재 {fmt(cur)}원, {why}")
+        for span in spans:
+            _win_push(_price_windows[(m, span)], now, cur)
+    # 규칙/코인이 지워진 창은 버린다 (이번 틱에 가격을 못 받은 코인의 창은 그대로 둔다)
+    for k in [k for k in _price_windows if k not in used]:
+        info = state["coins"].get(k[0])
+        if k[0] in prices or info is None or \
+                k[1] not in {int(r["window"]) for r in list(common) + list(info.get("rules") or [])}:
+            _price_windows.pop(k, None)
+    for k in [k for k, until in _rule_quiet.items() if until <= now]:
+        _rule_quiet.pop(k, None)
+    return alerts
+
 # ========= NAVER API HELPERS =========
 def naver_enabled():
     return bool(
@@ -651,19 +2350,29 @@ def _naver_request(method, uri, params=None, body=None):
         "X-Signature": sig,
     }
     url = NAVER_BASE_URL + uri
-    if method == "GET":
-        return requests.get(url, headers=headers, params=params, timeout=5)
-    elif method == "PUT":
-        return requests.put(url, headers=headers, params=params, json=body, timeout=5)
-    else:
+    if method not in ("GET", "PUT"):
         raise ValueError("Unsupported method")
+    # 4xx(잘못된 입찰가 등)는 요청 문제라 차단기 실패로 세지 않는다
+    breaker_allow("searchad")
+    try:
+        if method == "GET":
+            r = http_request("GET", url, headers=headers, params=params, timeout=5)
+        else:
+            r = http_request("PUT", url, headers=headers, params=params, json=body, timeout=5)
+    except Exception as e:
+        breaker_result("searchad", False, f"{type(e).__name__}: {e}")
+        raise
+    failed = upstream_failed(str(r.status_code))
+    breaker_result("searchad", not failed, f"HTTP {r.status_code}" if failed else None)
+    return r
 
 def _naver_get_adgroup_id():
     nav = state.setdefault("naver", {})
 
     if NAVER_ADGROUP_ID:
-        nav["adgroup_id"] = NAVER_ADGROUP_ID
-        save_state()
+        if nav.get("adgroup_id") != NAVER_ADGROUP_ID:
+            nav["adgroup_id"] = NAVER_ADGROUP_ID
+            save_state()
         return NAVER_ADGROUP_ID
 
     if nav.get("adgroup_id"):
@@ -700,66 +2409,803 @@ def _naver_get_adgroup_id():
     print("[NAVER] 대상 광고그룹 이름 없음:", NAVER_ADGROUP_NAME)
     return None
 
-def naver_get_bid():
-    adgroup_id = _naver_get_adgroup_id()
-    if not adgroup_id:
-        return None
+# ========= Searchad 광고그룹 캐시 =========
+# adgroup_id -> {"body": 광고그룹 JSON, "at": 조회/갱신 시각}
+# PUT 응답으로 갱신하고, 오류/충돌 시에는 버려서 다음 호출이 새로 GET 하게 한다.
+_adgroup_cache = {}
+_adgroup_lock = threading.Lock()
+
+def _adgroup_store(adgroup_id, body):
+    with _adgroup_lock:
+        _adgroup_cache[adgroup_id] = {"body": dict(body), "at": time.time()}
+
+def adgroup_invalidate(adgroup_id=None):
+    with _adgroup_lock:
+        if adgroup_id is None:
+            _adgroup_cache.clear()
+        else:
+            _adgroup_cache.pop(adgroup_id, None)
+
+def naver_get_adgroup(adgroup_id, max_age=None):
+    """
+    광고그룹 본문을 캐시(max_age초 이내) 또는 GET 으로 가져온다.
+    반환: (body, age초) / 실패 시 (None, None)
+    """
+    max_age = NAVER_ADGROUP_TTL if max_age is None else max_age
+    with _adgroup_lock:
+        hit = _adgroup_cache.get(adgroup_id)
+    if hit:
+        age = time.time() - hit["at"]
+        if age <= max_age:
+            cache_hit("adgroup", True)
+            return dict(hit["body"]), age
+    cache_hit("adgroup", False)
+
     r = _naver_request("GET", f"/ncc/adgroups/{adgroup_id}")
     if r.status_code != 200:
         print("[NAVER] adgroup 조회 실패:", r.status_code, r.text)
-        return None
-    data = r.json()
-    bid = data.get("bidAmt")
-    nav = state.setdefault("naver", {})
-    nav["last_known_bid"] = bid
-    save_state()
-    return bid
+        adgroup_invalidate(adgroup_id)
+        return None, None
+    body = r.json()
+    _adgroup_store(adgroup_id, body)
+    return dict(body), 0.0
 
-def naver_set_bid(new_bid: int):
+def naver_get_bid_info(max_age=None):
+    """반환: (bid, age초) / 실패 시 (None, None)"""
     adgroup_id = _naver_get_adgroup_id()
     if not adgroup_id:
-        return False, "대상 광고그룹(ID)을 찾지 못했습니다. .env 설정을 확인하세요."
+        return None, None
+    body, age = naver_get_adgroup(adgroup_id, max_age=max_age)
+    if body is None:
+        return None, None
+    bid = body.get("bidAmt")
+    nav = state.setdefault("naver", {})
+    if nav.get("last_known_bid") != bid:
+        nav["last_known_bid"] = bid
+        mark_state_dirty()
+    return bid, age
 
-    r = _naver_request("GET", f"/ncc/adgroups/{adgroup_id}")
-    if r.status_code != 200:
-        return False, f"현재 설정 조회 실패 (code {r.status_code})"
+def naver_get_bid(max_age=None):
+    return naver_get_bid_info(max_age=max_age)[0]
 
-    body = r.json()
-    old_bid = body.get("bidAmt")
+def naver_set_bid(new_bid: int, adgroup_id=None):
+    adgroup_id = adgroup_id or _naver_get_adgroup_id()
+    if not adgroup_id:
+        return False, "대상 광고그룹(ID)을 찾지 못했습니다. .env 설정을 확인하세요."
 
     try:
         new_bid = int(new_bid)
     except:
         return False, "입찰가는 숫자만 가능합니다."
 
+    body, age = naver_get_adgroup(adgroup_id)
+    if body is None:
+        return False, "현재 설정 조회 실패"
+
+    # 캐시상 이미 같은 값이면 외부 변경 가능성이 있으니 한 번은 새로 확인
+    if body.get("bidAmt") == new_bid and age > 0:
+        body, age = naver_get_adgroup(adgroup_id, max_age=0)
+        if body is None:
+            return False, "현재 설정 조회 실패"
+
+    old_bid = body.get("bidAmt")
+    nav = state.setdefault("naver", {})
+
     if old_bid == new_bid:
-        nav = state.setdefault("naver", {})
         nav["last_known_bid"] = old_bid
-        save_state()
+        mark_state_dirty()
         return False, f"이미 {new_bid}원으로 설정되어 있습니다."
 
-    body["bidAmt"] = new_bid
-
-    r2 = _naver_request("PUT", f"/ncc/adgroups/{adgroup_id}", body=body)
-    if r2.status_code != 200:
+    for attempt in range(2):
+        body["bidAmt"] = new_bid
+        r2 = _naver_request("PUT", f"/ncc/adgroups/{adgroup_id}", body=body)
+        if r2.status_code == 200:
+            break
+        adgroup_invalidate(adgroup_id)
+        # 충돌(다른 곳에서 먼저 수정)이면 최신 본문으로 한 번 재시도
+        if r2.status_code == 409 and attempt == 0:
+            body, _ = naver_get_adgroup(adgroup_id, max_age=0)
+            if body is not None:
+                old_bid = body.get("bidAmt")
+                continue
         return False, f"변경 실패 (code {r2.status_code})"
 
     res = r2.json()
+    _adgroup_store(adgroup_id, res)
     applied = res.get("bidAmt")
-    nav = state.setdefault("naver", {})
     nav["last_known_bid"] = applied
     save_state()
 
     if applied == new_bid:
         return True, f"입찰가가 {old_bid} → {applied}원으로 변경되었습니다."
     else:
+        adgroup_invalidate(adgroup_id)
         return False, "API 응답이 예상과 다릅니다."
 
+# ========= Searchad 계층 (캠페인 → 광고그룹 → 키워드) =========
+# 입찰 대상(target) 문자열:
+#   None                      → 기본 광고그룹 (NAVER_ADGROUP_ID / NAVER_ADGROUP_NAME)
+#   "adgroup:<id>"            → 해당 광고그룹 bidAmt
+#   "keyword:<id>[,<id>...]"  → 해당 키워드들의 개별 bidAmt
+# 사용자 입력은 'g:<광고그룹 이름|ID>' / 'k:<키워드|ID>' 로 받아 resolve_target 으로 정규화한다.
+_searchad_tree = {"at": 0.0, "campaigns": {}, "adgroups": {}, "keywords": {}}
+_searchad_tree_lock = threading.Lock()
+
+_SEARCHAD_RETRY_CODES = (429, 500, 502, 503, 504)
+
+def _searchad_get_json(uri, params=None):
+    r = _naver_request("GET", uri, params=params)
+    if r.status_code != 200:
+        raise RuntimeError(f"{uri} 조회 실패 (code {r.status_code})")
+    return r.json()
+
+def _searchad_put(uri, params=None, body=None, tries=3):
+    """429/5xx 는 지수 백오프로 재시도. 반환: (json, status_code) / 실패 시 (None, code)"""
+    delay = 1.0
+    code = None
+    for attempt in range(tries):
+        try:
+            r = _naver_request("PUT", uri, params=params, body=body)
+        except BreakerOpen as e:
+            print("[NAVER] PUT 생략:", uri, e)
+            return None, None
+        except Exception as e:
+            print("[NAVER] PUT 실패:", uri, e)
+            code = None
+        else:
+            code = r.status_code
+            if code == 200:
+                return r.json(), code
+            if code not in _SEARCHAD_RETRY_CODES:
+                return None, code
+        if attempt + 1 < tries:
+            time.sleep(delay + random.random() * 0.5)
+            delay *= 2
+    return None, code
+
+def searchad_tree(max_age=None):
+    """캠페인/광고그룹/키워드 목록 (캐시 max_age초, 기본 NAVER_TREE_TTL)"""
+    max_age = NAVER_TREE_TTL if max_age is None else max_age
+    with _searchad_tree_lock:
+        if _searchad_tree["at"] and time.time() - _searchad_tree["at"] <= max_age:
+            cache_hit("searchad_tree", True)
+            return _searchad_tree
+        cache_hit("searchad_tree", False)
+
+        campaigns = {}
+        for c in _searchad_get_json("/ncc/campaigns"):
+            cid = c.get("nccCampaignId")
+            if not cid or (NAVER_CAMPAIGN_ID and cid != NAVER_CAMPAIGN_ID):
+                continue
+            campaigns[cid] = {"name": c.get("name", "")}
+
+        adgroups = {}
+        keywords = {}
+        for cid in campaigns:
+            for g in _searchad_get_json("/ncc/adgroups", params={"nccCampaignId": cid}):
+                gid = g.get("nccAdgroupId")
+                if not gid:
+                    continue
+                adgroups[gid] = {"name": g.get("name", ""), "campaign": cid, "bidAmt": g.get("bidAmt")}
+                for k in _searchad_get_json("/ncc/keywords", params={"nccAdgroupId": gid}):
+                    kid = k.get("nccKeywordId")
+                    if not kid:
+                        continue
+                    keywords[kid] = {
+                        "keyword": k.get("keyword", ""),
+                        "adgroup": gid,
+                        "bidAmt": k.get("bidAmt"),
+                        "useGroupBidAmt": bool(k.get("useGroupBidAmt")),
+                    }
+
+        _searchad_tree.update(
+            {"at": time.time(), "campaigns": campaigns, "adgroups": adgroups, "keywords": keywords}
+        )
+        return _searchad_tree
+
+def resolve_target(ref):
+    """
+    'g:<광고그룹 이름|ID>' / 'k:<키워드|ID>' (접두어 없으면 키워드) → 대상 문자열.
+    빈 값이면 None(기본 광고그룹). 찾지 못하면 ValueError.
+    """
+    ref = (ref or "").strip()
+    if not ref or ref in ("기본", "default"):
+        return None
+    if ref.startswith(("adgroup:", "keyword:")):
+        return ref
+
+    kind, sep, name = ref.partition(":")
+    if not sep:
+        kind, name = "k", ref
+    name = name.strip()
+    tree = searchad_tree()
+
+    if kind in ("g", "그룹"):
+        for gid, g in tree["adgroups"].items():
+            if gid == name or g["name"] == name:
+                return "adgroup:" + gid
+        raise ValueError(f"광고그룹 '{name}'을(를) 찾지 못했습니다.")
+
+    if kind in ("k", "키워드"):
+        ids = [
+            kid for kid, k in tree["keywords"].items()
+            if kid == name or _normalize(k["keyword"]) == _normalize(name)
+        ]
+        if not ids:
+            raise ValueError(f"키워드 '{name}'을(를) 찾지 못했습니다.")
+        return "keyword:" + ",".join(ids)
+
+    raise ValueError(f"대상 형식 오류: '{ref}' (예: g:광고그룹명, k:키워드)")
+
+def target_label(target):
+    if not target:
+        return "기본 광고그룹"
+    kind, _, ids = target.partition(":")
+    tree = _searchad_tree
+    if kind == "adgroup":
+        g = tree["adgroups"].get(ids)
+        return f"광고그룹 {g['name'] if g else ids}"
+    names = []
+    for kid in [i for i in ids.split(",") if i]:
+        k = tree["keywords"].get(kid)
+        names.append(k["keyword"] if k else kid)
+    if len(names) > 3:
+        return f"키워드 {', '.join(names[:3])} 외 {len(names) - 3}개"
+    return f"키워드 {', '.join(names)}"
+
+def _record_keyword_bids(items):
+    kws = _searchad_tree["keywords"]
+    for it in items or []:
+        k = kws.get(it.get("nccKeywordId"))
+        if k is not None:
+            k["bidAmt"] = it.get("bidAmt")
+            k["useGroupBidAmt"] = bool(it.get("useGroupBidAmt"))
+
+def naver_set_keyword_bids(changes):
+    """
+    {keyword_id: bid} 를 NAVER_BULK_BATCH개씩 묶어 PUT /ncc/keywords?fields=bidAmt.
+    배치가 재시도 후에도 실패하면 개별 PUT 으로 나눠 실패한 키워드만 골라낸다.
+    반환: (성공 id 목록, {실패 id: 사유})
+    """
+    kws = searchad_tree()["keywords"]
+    items = []
+    failed = {}
+    for kid, bid in changes.items():
+        k = kws.get(kid)
+        if not k:
+            failed[kid] = "키워드 없음"
+            continue
+        items.append({
+            "nccKeywordId": kid,
+            "nccAdgroupId": k["adgroup"],
+            "bidAmt": int(bid),
+            "useGroupBidAmt": False,
+        })
+
+    done = []
+    for i in range(0, len(items), NAVER_BULK_BATCH):
+        if i:
+            time.sleep(NAVER_BULK_GAP)
+        batch = items[i:i + NAVER_BULK_BATCH]
+        res, code = _searchad_put("/ncc/keywords", params={"fields": "bidAmt"}, body=batch)
+        if res is not None:
+            _record_keyword_bids(res)
+            done.extend(it["nccKeywordId"] for it in batch)
+            continue
+
+        print(f"[NAVER] 키워드 일괄 변경 실패 (code {code}) → 개별 재시도 {len(batch)}건")
+        for it in batch:
+            kid = it["nccKeywordId"]
+            one, c = _searchad_put(f"/ncc/keywords/{kid}", params={"fields": "bidAmt"}, body=it)
+            if one is None:
+                failed[kid] = f"code {c}"
+            else:
+                _record_keyword_bids([one])
+                done.append(kid)
+            time.sleep(NAVER_BULK_GAP)
+
+    return done, failed
+
+def naver_set_target_bid(target, bid):
+    """대상별 입찰 변경. 반환: (success, msg)"""
+    if not target:
+        return naver_set_bid(bid)
+    kind, _, ids = target.partition(":")
+    if kind == "adgroup":
+        return naver_set_bid(bid, adgroup_id=ids)
+    if kind == "keyword":
+        try:
+            bid = int(bid)
+        except:
+            return False, "입찰가는 숫자만 가능합니다."
+        kw_ids = [i for i in ids.split(",") if i]
+        try:
+            done, failed = naver_set_keyword_bids({kid: bid for kid in kw_ids})
+        except Exception as e:
+            return False, f"키워드 조회 실패: {e}"
+        label = target_label(target)
+        if failed:
+            return False, f"{label}: {len(done)}개 변경, {len(failed)}개 실패 ({', '.join(f'{k} {v}' for k, v in failed.items())})"
+        return True, f"{label} 입찰가가 {bid}원으로 변경되었습니다."
+    return False, f"알 수 없는 대상: {target}"
+
+def naver_get_target_bid(target):
+    if not target:
+        return naver_get_bid()
+    kind, _, ids = target.partition(":")
+    if kind == "adgroup":
+        body, _ = naver_get_adgroup(ids)
+        return body.get("bidAmt") if body else None
+    if kind == "keyword":
+        k = searchad_tree()["keywords"].get(ids.split(",")[0])
+        return k.get("bidAmt") if k else None
+    return None
+
+def naver_effective_bid(keyword):
+    """
+    검색어에 실제로 걸린 입찰가: 같은 이름의 Searchad 키워드가 키워드 입찰가를 쓰면 그 값(키워드입찰/@k: 예약),
+    그룹입찰을 쓰거나 등록된 키워드가 없으면 광고그룹 입찰가. 기본 광고그룹의 키워드를 우선 본다.
+    같은 검색어 키워드가 여럿이고 입찰가가 서로 다르면 어느 쪽이 노출됐는지 몰라 None.
+    """
+    tree = searchad_tree()
+    gid = _naver_get_adgroup_id()
+    kws = [k for k in tree["keywords"].values() if _normalize(k["keyword"]) == _normalize(keyword)]
+    kws = [k for k in kws if k["adgroup"] == gid] or kws
+    if not kws:
+        return naver_get_bid()
+    bids = set()
+    for k in kws:
+        if not k["useGroupBidAmt"]:
+            bids.add(k["bidAmt"])
+        elif k["adgroup"] == gid:
+            bids.add(naver_get_bid())
+        else:
+            bids.add(naver_get_target_bid("adgroup:" + k["adgroup"]))
+    return bids.pop() if len(bids) == 1 else None
+
+def searchad_tree_lines(limit=40):
+    tree = searchad_tree()
+    lines = []
+    for cid, c in tree["campaigns"].items():
+        lines.append(f"📁 {c['name']} ({cid})")
+        for gid, g in tree["adgroups"].items():
+            if g["campaign"] != cid:
+                continue
+            kws = [k for k in tree["keywords"].values() if k["adgroup"] == gid]
+            lines.append(f"  · {g['name']} ({gid}) 그룹입찰 {g.get('bidAmt')}원, 키워드 {len(kws)}개")
+            for k in kws[:limit]:
+                bid = "그룹입찰" if k["useGroupBidAmt"] else f"{k['bidAmt']}원"
+                lines.append(f"     - {k['keyword']}: {bid}")
+            if len(kws) > limit:
+                lines.append(f"     … 외 {len(kws) - limit}개")
+    return lines
+
+# ========= NAVER 광고 성과 통계 (Searchad /stats) =========
+# 광고그룹/키워드의 시간대별(hh24) 노출/클릭/비용을 받아 DATA_DIR/searchad_stats.csv 에 쌓는다.
+# /stats 는 날짜 단위로만 조회되므로 확정되지 않은 날(오늘, 정산 전 어제)만 다시 받고,
+# 값이 바뀐 (날짜, 시, ID) 줄만 파일 끝에 덧붙인다 (읽을 때 마지막 줄이 우선).
+# 광고상태용 집계(시간대별 CPC, 일별 비용)는 줄이 바뀔 때 차이만큼 더하고 빼서 유지한다.
+_STATS_FILE = os.path.join(DATA_DIR, "searchad_stats.csv")
+_STATS_FIELDS = ["impCnt", "clkCnt", "salesAmt"]
+
+_stats_rows = {}            # (day, hour, id) -> (imp, clk, cost)
+_stats_agg = {
+    "hour": [[0, 0] for _ in range(24)],    # 시 -> [클릭, 비용] (광고그룹 합계, 보관 기간 전체)
+    "day_hour": {},                         # (day, hour) -> [노출, 클릭, 비용] (광고그룹 합계)
+}
+_stats_lock = threading.Lock()
+_stats_state = {"loaded": False, "lines": 0}
+
+def _stats_apply(key, new):
+    """(_stats_lock 안에서 호출) 줄 하나를 바꾸고 집계를 차이만큼 갱신. 바뀌었으면 True"""
+    old = _stats_rows.get(key)
+    if old == new:
+        return False
+    if new is None:
+        _stats_rows.pop(key, None)
+    else:
+        _stats_rows[key] = new
+    day, hour, sid = key
+    if not sid.startswith("grp-"):
+        return True  # 키워드 줄은 광고그룹 합계에 이미 포함
+    o = old or (0, 0, 0)
+    n = new or (0, 0, 0)
+    h = _stats_agg["hour"][hour]
+    h[0] += n[1] - o[1]
+    h[1] += n[2] - o[2]
+    dh = _stats_agg["day_hour"].setdefault((day, hour), [0, 0, 0])
+    for i in range(3):
+        dh[i] += n[i] - o[i]
+    if not any(dh):
+        _stats_agg["day_hour"].pop((day, hour), None)
+    return True
+
+def _stats_expire():
+    """(_stats_lock 안에서 호출) 보관 기간이 지난 날짜 제거"""
+    cutoff = (datetime.now(KST).date() - timedelta(days=NAVER_STATS_DAYS)).isoformat()
+    for key in [k for k in _stats_rows if k[0] < cutoff]:
+        _stats_apply(key, None)
+
+def _stats_load():
+    if _stats_state["loaded"]:
+        return
+    _stats_state["loaded"] = True
+    if not os.path.exists(_STATS_FILE):
+        return
+    lines = 0
+    try:
+        with open(_STATS_FILE, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    key = (row[0], int(row[1]), row[2])
+                    val = (int(row[3]), int(row[4]), int(row[5]))
+                except:
+                    continue
+                _stats_apply(key, val)
+                lines += 1
+    except Exception as e:
+        print("[NAVER] 광고 통계 파일 읽기 실패:", e)
+    _stats_state["lines"] = lines
+    _stats_expire()
+
+def _stats_write(changed):
+    """(_stats_lock 안에서 호출) 바뀐 줄 덧붙이기. 중복 줄이 많아지면 현재 값만으로 다시 쓴다"""
+    try:
+        if _stats_state["lines"] + len(changed) > 2 * len(_stats_rows) + 1000:
+            tmp = _STATS_FILE + ".tmp"
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                for (day, hour, sid), v in sorted(_stats_rows.items()):
+                    w.writerow([day, hour, sid, *v])
+            os.replace(tmp, _STATS_FILE)
+            _stats_state["lines"] = len(_stats_rows)
+            return
+        with open(_STATS_FILE, "a", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            for (day, hour, sid), v in changed:
+                w.writerow([day, hour, sid, *v])
+        _stats_state["lines"] += len(changed)
+    except Exception as e:
+        print("[NAVER] 광고 통계 저장 실패:", e)
+
+def _stats_hour_rows(resp):
+    """/stats 응답 → (id, hour, imp, clk, cost). 행에 hh24 가 있거나 breakdowns 안에 있는 두 형태 모두 처리"""
+    for row in (resp or {}).get("data") or []:
+        sid = row.get("id")
+        if not sid:
+            continue
+        subs = row.get("breakdowns") or [row]
+        for b in subs:
+            hour = b.get("hh24", b.get("breakdown"))
+            try:
+                hour = int(hour)
+            except:
+                continue
+            if not 0 <= hour < 24:
+                continue
+            yield sid, hour, int(b.get("impCnt") or 0), int(b.get("clkCnt") or 0), int(b.get("salesAmt") or 0)
+
+def searchad_stats_pull():
+    """확정 안 된 날짜만 조회해 저장. 반환: 바뀐 줄 수"""
+    nav = state.setdefault("naver", {})
+    st = nav.setdefault("stats", {"final_day": None, "last_pull": 0.0})
+    tree = searchad_tree()
+    ids = list(tree["adgroups"]) + list(tree["keywords"])
+    if not ids:
+        return 0
+
+    now = datetime.now(KST)
+    today = now.date()
+    first = today - timedelta(days=NAVER_STATS_BACKFILL)
+    if st.get("final_day"):
+        try:
+            first = max(first, date.fromisoformat(st["final_day"]) + timedelta(days=1))
+        except:
+            pass
+
+    changed = []
+    day = first
+    final_day = st.get("final_day")
+    while day <= today:
+        rows = {}
+        for i in range(0, len(ids), NAVER_STATS_BATCH):
+            resp = _searchad_get_json("/stats", params={
+                "ids": ",".join(ids[i:i + NAVER_STATS_BATCH]),
+                "fields": json.dumps(_STATS_FIELDS),
+                "timeRange": json.dumps({"since": day.isoformat(), "until": day.isoformat()}),
+                "breakdown": "hh24",
+            })
+            for sid, hour, imp, clk, cost in _stats_hour_rows(resp):
+                rows[(day.isoformat(), hour, sid)] = (imp, clk, cost)
+
+        with _stats_lock:
+            _stats_load()
+            day_changed = [(k, v) for k, v in rows.items() if _stats_apply(k, v)]
+            if day_changed:
+                _stats_write(day_changed)
+        changed += day_changed
+
+        # 날이 바뀌고 정산 대기 시간이 지난 날은 확정 → 다음부터 다시 받지 않는다
+        settled = datetime(day.year, day.month, day.day, tzinfo=KST) + timedelta(days=1, hours=NAVER_STATS_SETTLE)
+        if now >= settled and (final_day is None or day.isoformat() > final_day):
+            final_day = day.isoformat()
+        day += timedelta(days=1)
+
+    with _stats_lock:
+        _stats_expire()
+    st["final_day"] = final_day
+    st["last_pull"] = time.time()
+    mark_state_dirty()
+    return len(changed)
+
+def searchad_stats_job(context):
+    if not naver_enabled():
+        return
+    try:
+        n = searchad_stats_pull()
+        if n:
+            print(f"[NAVER] 광고 통계 {n}줄 갱신")
+    except Exception as e:
+        print("[NAVER] 광고 통계 조회 실패:", e)
+
+def searchad_stats_lines(full=False):
+    """저장된 집계만으로 만든 요약 (API 호출 없음)"""
+    with _stats_lock:
+        _stats_load()
+        hours = [list(h) for h in _stats_agg["hour"]]
+        day_hour = dict((k, list(v)) for k, v in _stats_agg["day_hour"].items())
+    if not day_hour:
+        return []
+
+    now = datetime.now(KST)
+    today = now.date().isoformat()
+    yday = (now.date() - timedelta(days=1)).isoformat()
+
+    def spend(day, upto=24):
+        return sum(v[2] for (d, h), v in day_hour.items() if d == day and h < upto)
+
+    def clicks(day):
+        return sum(v[1] for (d, h), v in day_hour.items() if d == day)
+
+    t, y_same, y_all = spend(today), spend(yday, now.hour + 1), spend(yday)
+    diff = ""
+    if y_same:
+        diff = f" ({(t - y_same) / y_same * 100:+.0f}%)"
+    lines = [
+        f"- 오늘 비용: {t:,}원 / 클릭 {clicks(today)}회 "
+        f"(어제 같은 시각 {y_same:,}원{diff}, 어제 전체 {y_all:,}원)"
+    ]
+
+    cpc = {h: c[1] / c[0] for h, c in enumerate(hours) if c[0] > 0}
+    if cpc:
+        cur = cpc.get(now.hour)
+        lo = min(cpc, key=cpc.get)
+        hi = max(cpc, key=cpc.get)
+        lines.append(
+            f"- 시간대 CPC({NAVER_STATS_DAYS}일): 지금 {f'{cur:,.0f}원' if cur is not None else '-'}, "
+            f"최저 {lo:02d}시 {cpc[lo]:,.0f}원, 최고 {hi:02d}시 {cpc[hi]:,.0f}원"
+        )
+        if full:
+            for h0 in range(0, 24, 4):
+                lines.append("  " + " · ".join(
+                    f"{h:02d}시 {cpc[h]:,.0f}" if h in cpc else f"{h:02d}시 -" for h in range(h0, h0 + 4)
+                ))
+
+    st = state.setdefault("naver", {}).get("stats") or {}
+    if st.get("last_pull"):
+        lines.append(f"- 통계 갱신: {int((time.time() - st['last_pull']) // 60)}분 전")
+    return lines
+
 # ========= NAVER 검색 URL =========
-def _naver_search_url(keyword: str) -> str:
+def _naver_search_url(keyword: str, page: int = 1) -> str:
     q = urllib.parse.quote(keyword)
     # 최신 place 검색 탭 기준
-    return f"https://search.naver.com/search.naver?where=place&sm=tab_nx.place&query={q}"
+    url = f"{NAVER_SEARCH_BASE}/search.naver?where=place&sm=tab_nx.place&query={q}"
+    if page > 1:
+        start = (page - 1) * NAVER_RANK_PAGE_SIZE + 1
+        url += f"&start={start}&display={NAVER_RANK_PAGE_SIZE}"
+    return url
+
+# 워커를 쓰면 워커 수보다 많이 들여보내지 않는다 (남는 작업은 대기열에서 제한 시간만 깎아 먹음)
+_naver_budget = threading.BoundedSemaphore(
+    min(NAVER_MAX_CONCURRENCY, SCRAPER_WORKERS) if SCRAPER_WORKERS > 0 else NAVER_MAX_CONCURRENCY
+)
+
+# ========= SCRAPER 워커 프로세스 =========
+# 수 MB 페이지 파싱은 순수 파이썬이라 GIL 을 오래 잡는다. 조회+파싱을 spawn 워커 프로세스에서 하고
+# 작은 결과(순위 목록/리뷰 수)만 돌려받아, 봇 프로세스의 가격 확인/명령 처리가 밀리지 않게 한다.
+# 작업 제한 시간은 워커 안에서 실행 시간만 잰다(SIGALRM). 워커가 죽거나(BrokenProcessPool) 알람으로도 못 멈출 만큼
+# 오래 멈추면 풀을 통째로 새로 띄우고 한 번 다시 시도한다. 워커 쪽 문제는 Naver 차단기 실패로 세지 않는다.
+_scraper = {"pool": None, "jobs": 0, "restarts": 0, "last_restart": None}
+_scraper_lock = threading.Lock()
+# 알람이 안 먹을 때(C 코드 안에서 멈춤) 봇 쪽에서 기다리는 여유 (워커 기동 시간 포함)
+_SCRAPER_GRACE = 15.0
+
+class ScraperError(RuntimeError):
+    """워커 프로세스 쪽 실패 (멈춤/비정상 종료) — 페이지를 못 받은 게 아니라 우리 쪽 문제"""
+
+class _ScrapeTimeout(Exception):
+    pass
+
+def _scrape_alarm(signum, frame):
+    raise _ScrapeTimeout(f"작업 시간 초과 ({SCRAPER_TIMEOUT:.0f}s)")
+
+def _scrape_parse(kind, html, markers=()):
+    if kind == "search":
+        return analyze_search_page(html, markers)
+    if kind == "place":
+        return _parse_review_count_from_html(html)
+    raise ValueError(f"알 수 없는 작업: {kind}")
+
+def _scrape_job(kind, url, timeout, limit=None, markers=()):
+    """
+    (워커 프로세스) 페이지를 받아 파싱까지 끝내고 결과와 소요 시간만 돌려준다.
+    예외 객체는 프로세스 경계를 못 넘을 수 있어 문자열로 담는다.
+    limit: 실행 제한 시간(초). 워커의 메인 스레드에서만 알람을 건다.
+    markers: 검색 페이지에서 광고 순위 예비 판정을 미리 해 둘 업체명
+    """
+    out = {"status": "error", "fetch": 0.0, "parse": None, "result": None, "error": None, "timeout": False}
+    alarm = bool(limit) and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    if alarm:
+        signal.signal(signal.SIGALRM, _scrape_alarm)
+        signal.setitimer(signal.ITIMER_REAL, limit)
+    t0 = time.perf_counter()
+    try:
+        import requests
+        r = requests.get(url, headers=NAVER_HEADERS, timeout=timeout)
+        out["status"] = str(r.status_code)
+        out["fetch"] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        out["result"] = _scrape_parse(kind, r.text, markers)
+        out["parse"] = time.perf_counter() - t0
+    except Exception as e:
+        if not out["fetch"]:
+            out["fetch"] = time.perf_counter() - t0
+        out["error"] = f"{type(e).__name__}: {e}"
+        if isinstance(e, _ScrapeTimeout):
+            out["timeout"] = True
+            out["error"] = str(e)
+            if out["status"] == "error":
+                out["status"] = "timeout"
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return out
+
+def _scraper_pids(pool):
+    return sorted((getattr(pool, "_processes", None) or {}).keys())
+
+def _scraper_restart(pool, reason):
+    """pool 이 아직 현재 풀이면 버리고 다음 작업에서 새로 띄운다 (동시에 여러 작업이 실패해도 한 번만)"""
+    with _scraper_lock:
+        if _scraper["pool"] is not pool:
+            return
+        _scraper["pool"] = None
+        _scraper["restarts"] += 1
+        _scraper["last_restart"] = (time.time(), reason)
+    metric_inc("bot_scraper_restarts_total", reason=reason)
+    print(f"[SCRAPER] 워커 재시작 ({reason})")
+    # 멈춘 워커가 있으면 shutdown 만으로는 끝나지 않아 직접 종료
+    for proc in list((getattr(pool, "_processes", None) or {}).values()):
+        try:
+            proc.terminate()
+        except:
+            pass
+    try:
+        pool.shutdown(wait=False, cancel_futures=True)
+    except:
+        pass
+
+def _scraper_pool():
+    with _scraper_lock:
+        pool = _scraper["pool"]
+        if pool is not None and _scraper["jobs"] >= SCRAPER_RECYCLE:
+            # 진행 중인 작업은 마저 끝나고 새 작업만 새 풀로 간다
+            pool.shutdown(wait=False)
+            pool = None
+        if pool is None:
+            import multiprocessing
+            pool = ProcessPoolExecutor(
+                max_workers=SCRAPER_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+            )
+            _scraper["pool"] = pool
+            _scraper["jobs"] = 0
+        _scraper["jobs"] += 1
+        return pool
+
+def scraper_start():
+    """기동 직후 워커를 미리 띄워 첫 감시 주기가 프로세스 기동을 기다리지 않게 한다"""
+    if SCRAPER_WORKERS <= 0:
+        return
+    pool = _scraper_pool()
+    try:
+        for fut in [pool.submit(os.getpid) for _ in range(SCRAPER_WORKERS)]:
+            fut.result(timeout=SCRAPER_TIMEOUT)
+        print(f"[SCRAPER] 워커 준비 (pid {', '.join(map(str, _scraper_pids(pool)))})")
+    except Exception as e:
+        print("[SCRAPER] 워커 기동 실패:", e)
+        _scraper_restart(pool, "start")
+
+def scraper_stop():
+    with _scraper_lock:
+        pool, _scraper["pool"] = _scraper["pool"], None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _scraper_submit(kind, url, timeout, markers=()):
+    from concurrent.futures import TimeoutError as FutureTimeout
+    from concurrent.futures.process import BrokenProcessPool
+    for attempt in (1, 2):
+        pool = _scraper_pool()
+        try:
+            fut = pool.submit(_scrape_job, kind, url, timeout, SCRAPER_TIMEOUT, markers)
+            return fut.result(timeout=SCRAPER_TIMEOUT + _SCRAPER_GRACE)
+        except FutureTimeout:
+            # 워커 안 알람으로도 안 끝남 → 멈춘 워커째 교체
+            metric_inc("bot_scraper_jobs_total", kind=kind, result="timeout")
+            _scraper_restart(pool, "timeout")
+            raise ScraperError(f"스크래퍼 응답 없음 ({SCRAPER_TIMEOUT + _SCRAPER_GRACE:.0f}s)")
+        except (BrokenProcessPool, RuntimeError) as e:
+            # RuntimeError: 재활용으로 막 shutdown 된 풀에 제출한 경우
+            metric_inc("bot_scraper_jobs_total", kind=kind, result="crash")
+            if isinstance(e, BrokenProcessPool):
+                _scraper_restart(pool, "crash")
+            if attempt == 2:
+                raise ScraperError(f"스크래퍼 워커 오류: {e}")
+
+def scrape(kind, url, timeout=10, markers=()):
+    """
+    검색/플레이스 페이지 조회+파싱. kind: "search" (페이지 분석 결과) | "place" (리뷰 수)
+    markers: 검색 페이지에 광고 목록이 없을 때 data-cr-rank 로 광고 순위를 미리 구해 둘 업체명
+    (결과 "ad_fallback" {업체명: 순위}, 원문은 돌려받지 않는다).
+    동시 요청 수는 _naver_budget 으로 제한. 요청/파싱 실패는 예외로 전달.
+    naver_search / naver_place 차단기가 열려 있으면 요청 없이 BreakerOpen.
+    워커 쪽 실패(실행 시간 초과, 멈춤, 비정상 종료)는 차단기 실패로 세지 않는다.
+    """
+    upstream = "naver_search" if kind == "search" else "naver_place"
+    breaker_allow(upstream)
+    try:
+        with _naver_budget:
+            t0 = time.perf_counter()
+            if SCRAPER_WORKERS > 0:
+                out = _scraper_submit(kind, url, timeout, markers)
+                metric_observe("bot_scraper_wait_seconds", time.perf_counter() - t0, kind=kind)
+            else:
+                out = _scrape_job(kind, url, timeout, markers=markers)
+    except ScraperError:
+        breaker_release(upstream)
+        raise
+    except Exception as e:
+        breaker_result(upstream, False, str(e))
+        raise
+    if out["timeout"]:
+        breaker_release(upstream)
+    else:
+        # 파싱 실패는 페이지 문제라 세지 않고, 연결 오류/5xx/차단 응답만 실패로 센다
+        failed = upstream_failed(out["status"])
+        breaker_result(upstream, not failed, (out["error"] or f"HTTP {out['status']}") if failed else None)
+    http_record(url, out["status"], out["fetch"])
+    if out["parse"] is not None:
+        metric_observe("bot_parse_duration_seconds", out["parse"], kind=kind)
+    if out["error"]:
+        if SCRAPER_WORKERS > 0:
+            metric_inc("bot_scraper_jobs_total", kind=kind, result="timeout" if out["timeout"] else "error")
+        raise (ScraperError if out["timeout"] else RuntimeError)(out["error"])
+    if SCRAPER_WORKERS > 0:
+        metric_inc("bot_scraper_jobs_total", kind=kind, result="ok")
+    return out["result"]
+
+def scraper_status_line():
+    if SCRAPER_WORKERS <= 0:
+        return "🧰 페이지 파싱: 봇 프로세스 내 (SCRAPER_WORKERS=0)"
+    pids = _scraper_pids(_scraper["pool"])
+    line = f"🧰 페이지 파싱 워커: 최대 {SCRAPER_WORKERS}개, {len(pids)}개 실행 중"
+    if pids:
+        line += f" (pid {', '.join(map(str, pids))})"
+    if _scraper["restarts"]:
+        at, why = _scraper["last_restart"]
+        line += f", 재시작 {_scraper['restarts']}회 (최근 {datetime.fromtimestamp(at, KST).strftime('%m-%d %H:%M')} {why})"
+    return line
 
 # ========= APOLLO STATE 파서 & 순위 계산 =========
 def _extract_js_object(s: str, start_idx: int):
@@ -849,70 +3295,212 @@ def _get_name_id(apollo, ref):
         bid = str(bid).strip()
     return name, bid
 
-def detect_place_ranks(html: str, marker: str):
+def _list_items(apollo, items):
+    out = []
+    for it in items or []:
+        ref = it.get("__ref") if isinstance(it, dict) else None
+        if not ref:
+            continue
+        name, bid = _get_name_id(apollo, ref)
+        if not name:
+            continue
+        out.append((name, bid))
+    return out
+
+def parse_place_list(html: str):
     """
-    광고/기본 둘 다 계산:
-    - 광고 순위: adBusinesses(...) 순서
-    - 기본 순위: attractions(...).businesses(...).items 순서
-    반환: {"ad": ad_rank or None, "organic": organic_rank or None} 또는 None
+    검색 결과 페이지에서 광고/기본 목록을 노출 순서대로 추출.
+    - 광고: adBusinesses(...) 순서
+    - 기본: attractions(...).businesses(...).items 순서
+    반환: {"ads": [(name, id)], "organic": [(name, id)]} 또는 None
     """
-    if not marker:
-        return None
-
     apollo = _extract_apollo_state(html)
     if not apollo:
         return None
 
     root = apollo.get("ROOT_QUERY", {})
 
-    # 광고 순위
-    ad_rank = None
+    ads = []
     ad_key = next((k for k in root.keys() if k.startswith("adBusinesses(")), None)
     if ad_key:
         try:
-            ad_items = root[ad_key].get("items", [])
-            idx = 0
-            for it in ad_items:
-                ref = it.get("__ref")
-                if not ref:
-                    continue
-                name, _ = _get_name_id(apollo, ref)
-                if not name:
-                    continue
-                idx += 1
-                if ad_rank is None and _match_name(name, marker):
-                    ad_rank = idx
+            ads = _list_items(apollo, root[ad_key].get("items", []))
         except Exception as e:
             print("[NAVER] adBusinesses 파싱 실패:", e)
 
-    # 기본 순위
-    org_rank = None
+    organic = []
     att_key = next((k for k in root.keys() if k.startswith("attractions(")), None)
     if att_key:
         att = root.get(att_key, {})
         biz_key = next((k for k in att.keys() if k.startswith("businesses(")), None)
         if biz_key:
             biz = att.get(biz_key, {})
-            items = biz.get("items", [])
-            idx = 0
-            for it in items:
-                ref = it.get("__ref")
-                if not ref:
-                    continue
-                name, _ = _get_name_id(apollo, ref)
-                if not name:
-                    continue
-                idx += 1
-                if org_rank is None and _match_name(name, marker):
-                    org_rank = idx
+            organic = _list_items(apollo, biz.get("items", []))
+
+    return {"ads": ads, "organic": organic}
+
+def _rank_of(items, marker):
+    for i, (name, _) in enumerate(items, start=1):
+        if _match_name(name, marker):
+            return i
+    return None
+
+def detect_place_ranks(html: str, marker: str):
+    """
+    광고/기본 둘 다 계산 (단일 페이지):
+    - 광고 순위: adBusinesses(...) 순서
+    - 기본 순위: attractions(...).businesses(...).items 순서
+    반환: {"ad": ad_rank or None, "organic": organic_rank or None} 또는 None
+    """
+    if not marker:
+        return None
+
+    page = parse_place_list(html)
+    if not page:
+        return None
+
+    ad_rank = _rank_of(page["ads"], marker)
+    org_rank = _rank_of(page["organic"], marker)
 
     if ad_rank is None and org_rank is None:
         return None
 
     return {"ad": ad_rank, "organic": org_rank}
 
-def _fmt_rank(v):
-    return f"{v}위" if isinstance(v, int) and v > 0 else "정보 없음"
+# ========= 검색 페이지 분석 (입찰추정/노출감시/노출현황 공용 캐시) =========
+# (검색어, 페이지) 당 한 번 받아 한 번만 분석하고, 유효 시간 안에서는 모든 기능이 같은 결과를 쓴다.
+_rank_pages = {}    # (keyword, page) -> (fetched_at, analyze_search_page 결과)
+_rank_pages_lock = threading.Lock()
+
+def analyze_search_page(html: str, markers=()):
+    """
+    반환: {"list": parse_place_list 결과 or None, "ad_fallback": {업체명: 순위 or None}}
+    광고 목록(adBusinesses)이 없는 페이지는 markers 의 data-cr-rank 예비 판정만 미리 구해 두고
+    원문은 남기지 않는다 (몇 MB 짜리 페이지가 캐시 유효 시간 내내 메모리에 남지 않게).
+    """
+    parsed = parse_place_list(html)
+    if parsed and parsed["ads"]:
+        return {"list": parsed, "ad_fallback": {}}
+    return {"list": parsed, "ad_fallback": {m: detect_ad_position(html, m) for m in markers if m}}
+
+def page_ad_position(page, marker: str):
+    """광고 순위: Apollo 광고 순서 우선, 광고 목록이 없으면 미리 구해 둔 detect_ad_position 결과로 대신"""
+    if not (page and marker):
+        return None
+    if page["list"] and page["list"]["ads"]:
+        return _rank_of(page["list"]["ads"], marker)
+    return page["ad_fallback"].get(marker)
+
+def _page_has_ad_position(page, marker):
+    """page_ad_position(page, marker) 를 원문 없이 답할 수 있는지"""
+    if not marker or (page["list"] and page["list"]["ads"]):
+        return True
+    return marker in page["ad_fallback"]
+
+def fetch_search_page(keyword: str, page: int = 1, max_age: float = None, marker: str = None):
+    """
+    max_age: 이 초 이내에 받은 분석 결과만 재사용 (기본 NAVER_RANK_PAGE_TTL).
+    입찰추정은 입찰 변경 이후에 받은 페이지만 쓰도록 짧게 넘긴다.
+    marker: page_ad_position 으로 광고 순위를 볼 업체명. 광고 목록 없는 페이지의 예비 판정을
+    이 업체명으로 받을 때 같이 구해 두고, 캐시에 그 판정이 없으면 새로 받는다.
+    요청 실패는 예외로 전달.
+    """
+    keyword = " ".join(keyword.split())
+    key = (keyword, page)
+    ttl = NAVER_RANK_PAGE_TTL if max_age is None else min(max_age, NAVER_RANK_PAGE_TTL)
+    now = time.time()
+    with _rank_pages_lock:
+        hit = _rank_pages.get(key)
+    if hit and now - hit[0] < ttl and _page_has_ad_position(hit[1], marker):
+        cache_hit("search_page", True)
+        return hit[1]
+    cache_hit("search_page", False)
+
+    def fetch():
+        analyzed = scrape("search", _naver_search_url(keyword, page), markers=(marker,) if marker else ())
+        now = time.time()
+        with _rank_pages_lock:
+            for k in [k for k, v in _rank_pages.items() if now - v[0] >= NAVER_RANK_PAGE_TTL]:
+                _rank_pages.pop(k, None)
+            _rank_pages[key] = (now, analyzed)
+        return analyzed
+
+    # 이미 받는 중인 같은 페이지가 ttl 안에 시작했으면 그 결과를 같이 쓴다
+    return single_flight(("search_page", keyword, page, marker or ""), fetch, fresh_after=now - ttl)
+
+def detect_place_ranks_deep(keyword: str, marker: str, max_pages: int = None, max_age: float = None):
+    """
+    첫 페이지에 없으면 다음 페이지를 NAVER_RANK_WAVE개씩 병렬로 조회하고,
+    기본 순위를 찾는 즉시 중단. 광고/기본 순위는 같은 (캐시된) 페이지 묶음에서 계산.
+    광고 순위는 입찰추정과 같은 page_ad_position 으로 첫 페이지에서 구한다.
+    반환: {"ad", "organic", "pages", "scanned"} 또는 None (첫 페이지 파싱 실패)
+    첫 페이지 요청 실패는 예외로 전달.
+    """
+    if not (keyword and marker):
+        return None
+    max_pages = max(1, int(max_pages or NAVER_RANK_MAX_PAGES))
+
+    def _get(p):
+        try:
+            # 광고 순위는 첫 페이지에서만 본다
+            return fetch_search_page(keyword, p, max_age=max_age, marker=marker if p == 1 else None)
+        except Exception as e:
+            if p == 1:
+                raise
+            print(f"[NAVER] 노출 {p}페이지 조회 실패:", e)
+            return None
+
+    ad_rank = None
+    organic = []
+    seen = set()
+    pages = 0
+    page = 1
+    done = False
+
+    with ThreadPoolExecutor(max_workers=NAVER_RANK_WAVE) as ex:
+        while page <= max_pages and not done:
+            wave = list(range(page, min(page + NAVER_RANK_WAVE, max_pages + 1)))
+            results = list(ex.map(_get, wave))
+            for p, entry in zip(wave, results):
+                parsed = entry["list"] if entry else None
+                if p == 1:
+                    if parsed is None:
+                        return None
+                    ad_rank = page_ad_position(entry, marker)
+                if not parsed or not parsed["organic"]:
+                    done = True
+                    break
+                before = len(organic)
+                for name, bid in parsed["organic"]:
+                    # 페이지 경계가 겹쳐도 같은 매장은 한 번만 센다
+                    uid = bid or name
+                    if uid in seen:
+                        continue
+                    seen.add(uid)
+                    organic.append((name, bid))
+                if len(organic) == before:
+                    # 새 항목이 없으면 더 넘겨도 같은 목록 → 중단
+                    done = True
+                    break
+                pages = p
+                if _rank_of(organic, marker) is not None:
+                    done = True
+                    break
+            page = wave[-1] + 1
+
+    return {
+        "ad": ad_rank,
+        "organic": _rank_of(organic, marker),
+        "pages": pages,
+        "scanned": len(organic),
+    }
+
+def _fmt_rank(v, scanned=None):
+    if isinstance(v, int) and v > 0:
+        return f"{v}위"
+    if scanned:
+        return f"{scanned}위권 밖"
+    return "정보 없음"
 
 # ========= NAVER STATUS / SCHEDULE =========
 def send_naver_status(update):
@@ -927,14 +3515,18 @@ def send_naver_status(update):
     if schedules:
         lines.append("- 시간표:")
         for s in schedules:
-            lines.append(f"  · {s['time']} → {s['bid']}원")
+            tgt = f" ({target_label(s.get('target'))})" if s.get("target") else ""
+            lines.append(f"  · [{_rule_days_text(s)}] {s['time']} → {s['bid']}원{tgt}")
+        nxt = schedule_next_text()
+        if nxt and nav.get("auto_enabled"):
+            lines.append(f"- 다음 자동 변경: {nxt}")
     else:
         lines.append("- 시간표: 없음 (광고시간 명령으로 설정)")
 
-    current = None
+    current, age = None, None
     try:
         if naver_enabled():
-            current = naver_get_bid()
+            current, age = naver_get_bid_info()
     except:
         pass
     if current is not None:
@@ -942,7 +3534,8 @@ def send_naver_status(update):
             current_int = int(current)
         except:
             current_int = current
-        lines.append(f"- 현재 입찰가: {current_int}원")
+        when = "방금 조회" if not age or age < 1 else f"{int(age)}초 전 조회"
+        lines.append(f"- 현재 입찰가: {current_int}원 ({when})")
     else:
         if naver_enabled():
             lines.append("- 현재 입찰가: 조회 실패")
@@ -954,11 +3547,26 @@ def send_naver_status(update):
 
     ab = nav.get("abtest") or {}
     if ab.get("status") == "running":
+        extra = ""
+        if ab.get("mode") == "bsearch":
+            lo, hi = ab.get("lo"), ab.get("hi")
+            extra = f", 이진탐색 범위 {lo if lo is not None else '?'}~{hi if hi is not None else '?'}원"
         lines.append(
             f"- 입찰추정: 진행 중 (키워드 '{ab.get('keyword','')}', "
-            f"현재 {ab.get('current_bid')}원, 간격 {ab.get('interval')}초)"
+            f"현재 {ab.get('current_bid')}원, 간격 {ab.get('interval')}초{extra})"
         )
 
+    lines += searchad_stats_lines()
+
+    with _breaker_lock:
+        down = [n for n in BREAKER_UPSTREAMS if _breaker(n)["state"] != "closed"]
+    if down:
+        lines.append(f"- 차단 중인 외부 서비스: {', '.join(down)} ('작업상태'로 확인)")
+
+    model = bid_model_summary()
+    if model:
+        lines.append(f"- 입찰예측 모델: {model}")
+
     if rw.get("enabled"):
         lines.append(
             f"- 노출감시: ON (키워드 '{rw.get('keyword','')}', "
@@ -967,51 +3575,249 @@ def send_naver_status(update):
     else:
         lines.append("- 노출감시: OFF")
 
-    if rv.get("enabled"):
-        iv = int(rv.get("interval",180))
-        lines.append(
-            f"- 리뷰감시: ON (간격 {iv//60}분, 마지막 리뷰수 {rv.get('last_count')})"
-        )
+    places = rv.get("places") or {}
+    if rv.get("enabled") and places:
+        lines.append(f"- 리뷰감시: ON ({len(places)}곳)")
+        for pid, p in places.items():
+            iv = int(p.get("interval", 180))
+            lines.append(f"  · {pid}: 간격 {iv//60}분, 마지막 리뷰수 {p.get('last_count')}")
     else:
         lines.append("- 리뷰감시: OFF")
 
     reply(update, "\n".join(lines))
 
-def naver_schedule_loop(context):
-    if not naver_enabled():
+# ========= 입찰 시간표 스케줄러 =========
+# 규칙: {"time": "HH:MM", "bid": int, "target"?, "days"?: [0..6](월=0), "from"?, "to"?: "YYYY-MM-DD"}
+# 규칙마다 다음 실행 시각을 계산해 최소 힙에 넣고, 가장 이른 시각에 맞춰 run_once 로 깨어난다.
+# 작업이 늦게 돌아도 '시각이 지난 규칙'을 적용하므로 분 단위 일치 비교로 하루를 놓치지 않는다.
+_WEEKDAYS = "월화수목금토일"
+_sched_heap = []            # (fire_ts, seq, rule_idx)
+_sched_lock = threading.Lock()
+_sched_state = {"jq": None, "job": None, "seq": 0}
+# 재시작 시 놓친 규칙을 찾을 때 거슬러 올라가는 일수
+SCHEDULE_LOOKBACK_DAYS = 8
+
+def _rule_days_text(rule):
+    days = rule.get("days")
+    if days is None:
+        d = "매일"
+    elif sorted(days) == [0, 1, 2, 3, 4]:
+        d = "평일"
+    elif sorted(days) == [5, 6]:
+        d = "주말"
+    else:
+        d = "".join(_WEEKDAYS[i] for i in sorted(days))
+    if rule.get("from") or rule.get("to"):
+        d += f" {rule.get('from') or ''}~{rule.get('to') or ''}"
+    return d
+
+def _rule_fires_on(rule, d: date) -> bool:
+    days = rule.get("days")
+    if days is not None and d.weekday() not in days:
+        return False
+    ds = d.isoformat()
+    if rule.get("from") and ds < rule["from"]:
+        return False
+    if rule.get("to") and ds > rule["to"]:
+        return False
+    return True
+
+def _rule_at(rule, d: date) -> datetime:
+    hh, mm = [int(x) for x in rule["time"].split(":")]
+    return datetime(d.year, d.month, d.day, hh, mm, tzinfo=KST)
+
+def rule_next_fire(rule, after: datetime):
+    """after 이후(초과) 첫 실행 시각, 없으면 None"""
+    d = after.date()
+    for _ in range(370):
+        if _rule_fires_on(rule, d):
+            at = _rule_at(rule, d)
+            if at > after:
+                return at
+        d += timedelta(days=1)
+    return None
+
+def rule_prev_fire(rule, at: datetime):
+    """at 이전(이하) 마지막 실행 시각 (SCHEDULE_LOOKBACK_DAYS 이내), 없으면 None"""
+    d = at.date()
+    for _ in range(SCHEDULE_LOOKBACK_DAYS):
+        if _rule_fires_on(rule, d):
+            t = _rule_at(rule, d)
+            if t <= at:
+                return t
+        d -= timedelta(days=1)
+    return None
+
+def parse_schedule_rules(text):
+    """
+    '평일 08:00/300 18:00/500 주말 10:00/200@k:키워드 2026-12-01~2026-12-31 매일 09:00/700'
+    요일(매일/평일/주말/월수금…)·기간(YYYY-MM-DD~YYYY-MM-DD, 상시) 토큰은 뒤따르는 규칙에 적용된다.
+    대상(@...)은 resolve 하지 않은 원문으로 남긴다. 형식 오류는 ValueError.
+    """
+    rules = []
+    days = None
+    rng = (None, None)
+    for part in text.replace("\n", " ").split():
+        if part == "매일":
+            days = None
+            continue
+        if part == "평일":
+            days = [0, 1, 2, 3, 4]
+            continue
+        if part == "주말":
+            days = [5, 6]
+            continue
+        if part == "상시":
+            rng = (None, None)
+            continue
+        if all(ch in _WEEKDAYS for ch in part):
+            days = sorted({_WEEKDAYS.index(ch) for ch in part})
+            continue
+        if "~" in part and "/" not in part:
+            a, b = part.split("~", 1)
+            for x in (a, b):
+                if x:
+                    datetime.strptime(x, "%Y-%m-%d")
+            rng = (a or None, b or None)
+            continue
+
+        t_str, rest = part.split("/", 1)
+        bid_str, _, ref = rest.partition("@")
+        t_str = t_str.strip()
+        datetime.strptime(t_str, "%H:%M")
+        rule = {"time": t_str, "bid": int(bid_str.replace(",", "").strip())}
+        if ref.strip():
+            rule["target"] = ref.strip()
+        if days is not None:
+            rule["days"] = list(days)
+        if rng[0]:
+            rule["from"] = rng[0]
+        if rng[1]:
+            rule["to"] = rng[1]
+        rules.append(rule)
+    if not rules:
+        raise ValueError("규칙 없음")
+    return rules
+
+def _rule_key(rule, at: datetime):
+    return f"{at.strftime('%Y-%m-%d %H:%M')} {rule.get('bid')} {rule.get('target') or ''}".strip()
+
+def schedule_rebuild(job_queue=None):
+    """시간표가 바뀌거나 시작할 때 힙을 다시 만들고 다음 실행을 예약"""
+    if job_queue is not None:
+        _sched_state["jq"] = job_queue
+    rules = state.setdefault("naver", {}).get("schedules") or []
+    now = datetime.now(KST)
+    with _sched_lock:
+        _sched_heap.clear()
+        for i, rule in enumerate(rules):
+            try:
+                at = rule_next_fire(rule, now)
+            except Exception as e:
+                print("[NAVER] 시간표 규칙 오류:", rule, e)
+                continue
+            if at is not None:
+                _sched_state["seq"] += 1
+                _sched_heap.append((at.timestamp(), _sched_state["seq"], i))
+        heapq.heapify(_sched_heap)
+    _schedule_arm()
+
+def _schedule_arm():
+    jq = _sched_state.get("jq")
+    if jq is None:
         return
+    old = _sched_state.get("job")
+    if old is not None:
+        try:
+            old.schedule_removal()
+        except:
+            pass
+        _sched_state["job"] = None
+    with _sched_lock:
+        if not _sched_heap:
+            return
+        delay = _sched_heap[0][0] - time.time()
+    # 아주 먼 규칙이라도 한 시간마다는 다시 확인 (시계 보정/설정 변경 대비)
+    delay = min(max(delay, 0.0), 3600.0)
+    _sched_state["job"] = jq.run_once(timed_job(naver_schedule_fire), when=delay)
 
+def _apply_schedule_rules(context, picked):
+    """picked: [(at, rule)] — 대상별로 가장 최근 규칙만 적용"""
     nav = state.setdefault("naver", {})
-    if not nav.get("auto_enabled"):
-        return
+    keys = nav.setdefault("last_applied_keys", {})
+    latest = {}
+    for at, rule in picked:
+        tgt = rule.get("target") or ""
+        if tgt not in latest or at >= latest[tgt][0]:
+            latest[tgt] = (at, rule)
+
+    for tgt, (at, rule) in sorted(latest.items(), key=lambda x: x[1][0]):
+        key = _rule_key(rule, at)
+        if keys.get(tgt) == key:
+            continue
+        success, msg = naver_set_target_bid(rule.get("target"), int(rule["bid"]))
+        keys[tgt] = key
+        nav["last_applied"] = key
+        save_state()
+        late = (datetime.now(KST) - at).total_seconds()
+        note = f"\n(예정 {at.strftime('%m-%d %H:%M')}, {int(late)}초 늦게 적용)" if late >= 60 else ""
+        try:
+            if success:
+                send_ctx(context, f"✅ [네이버 광고 자동 변경]\n{msg}{note}")
+            else:
+                send_ctx(context, f"⚠️ [네이버 광고 자동 변경 실패]\n{msg}{note}")
+        except:
+            pass
 
-    schedules = nav.get("schedules") or []
-    if not schedules:
-        return
+def naver_schedule_fire(context):
+    try:
+        rules = state.setdefault("naver", {}).get("schedules") or []
+        now = datetime.now(KST)
+        due = []
+        with _sched_lock:
+            while _sched_heap and _sched_heap[0][0] <= now.timestamp():
+                ts, _, i = heapq.heappop(_sched_heap)
+                if i >= len(rules):
+                    continue
+                rule = rules[i]
+                due.append((datetime.fromtimestamp(ts, KST), rule))
+                nxt = rule_next_fire(rule, now)
+                if nxt is not None:
+                    _sched_state["seq"] += 1
+                    heapq.heappush(_sched_heap, (nxt.timestamp(), _sched_state["seq"], i))
 
-    now = datetime.now(KST)
-    current_hm = now.strftime("%H:%M")
-    today = now.strftime("%Y-%m-%d")
+        nav = state.setdefault("naver", {})
+        if due and naver_enabled() and nav.get("auto_enabled"):
+            _apply_schedule_rules(context, due)
+    finally:
+        _schedule_arm()
 
-    for s in schedules:
-        t = s.get("time")
-        bid = s.get("bid")
-        if not t:
-            continue
-        if current_hm == t:
-            key = f"{today} {t} {bid}"
-            if nav.get("last_applied") == key:
-                continue
-            success, msg = naver_set_bid(int(bid))
-            nav["last_applied"] = key
-            save_state()
-            try:
-                if success:
-                    send_ctx(context, f"✅ [네이버 광고 자동 변경]\n{msg}")
-                else:
-                    send_ctx(context, f"⚠️ [네이버 광고 자동 변경 실패]\n{msg}")
-            except:
-                pass
+def naver_schedule_catchup(context):
+    """시작 시 1회: 놓친 규칙 중 대상별 가장 최근 것을 한 번 적용"""
+    nav = state.setdefault("naver", {})
+    if not (naver_enabled() and nav.get("auto_enabled")):
+        return
+    now = datetime.now(KST)
+    picked = []
+    for rule in nav.get("schedules") or []:
+        try:
+            at = rule_prev_fire(rule, now)
+        except Exception:
+            at = None
+        if at is not None:
+            picked.append((at, rule))
+    if picked:
+        _apply_schedule_rules(context, picked)
+
+def schedule_next_text():
+    rules = state.setdefault("naver", {}).get("schedules") or []
+    with _sched_lock:
+        head = _sched_heap[0] if _sched_heap else None
+    if not head or head[2] >= len(rules):
+        return None
+    rule = rules[head[2]]
+    at = datetime.fromtimestamp(head[0], KST)
+    return f"{at.strftime('%m-%d %H:%M')} → {rule['bid']}원"
 
 # ========= NAVER 입찰추정 (기존 로직) =========
 def detect_ad_position(html: str, marker: str):
@@ -1032,12 +3838,21 @@ def detect_ad_position(html: str, marker: str):
         return last_rank
     return 1
 
-def start_naver_abtest(cid, keyword, marker, start_bid, max_bid, step, interval):
+def start_naver_abtest(cid, keyword, marker, start_bid, max_bid, step, interval, target=None,
+                       mode="linear", repeats=None):
+    """
+    mode:
+    - "linear"  : step 원씩 올리며 1순위가 될 때까지 확인
+    - "bsearch" : 배수로 늘리거나 줄여 1순위 경계를 감싼 뒤(lo=미달, hi=1순위) 이진탐색,
+                  간격이 step 이하가 되면 종료. 경계 근처는 repeats 번 확인해 다수결.
+    """
     nav = state.setdefault("naver", {})
     nav["abtest"] = {
         "chat_id": cid,
+        "target": target,
         "keyword": keyword,
         "marker": marker,
+        "mode": mode,
         "current_bid": int(start_bid),
         "max_bid": int(max_bid),
         "step": int(step),
@@ -1045,9 +3860,102 @@ def start_naver_abtest(cid, keyword, marker, start_bid, max_bid, step, interval)
         "last_check": 0,
         "phase": "set",
         "status": "running",
+        "lo": None,
+        "hi": None,
+        "votes": [],
+        "repeats": int(repeats or NAVER_BSEARCH_REPEATS),
+        "probes": 0,
     }
     save_state()
 
+def _round_bid(v, unit):
+    unit = max(1, int(unit))
+    return max(NAVER_MIN_BID, int(v) // unit * unit)
+
+def _abtest_send(context, cid, text):
+    try:
+        context.bot.send_message(chat_id=cid, text=text, reply_markup=MAIN_KB(cid))
+    except:
+        pass
+
+def _abtest_bsearch_step(context, ab, cid, cur_bid, pos, now):
+    """이진탐색 모드의 확인 1회 처리 (phase check 에서 호출)"""
+    unit = max(1, int(ab.get("step", 10)))
+    max_bid = int(ab.get("max_bid", 0)) or cur_bid
+    lo, hi = ab.get("lo"), ab.get("hi")
+    keyword = ab.get("keyword", "")
+
+    votes = ab.setdefault("votes", [])
+    votes.append(1 if pos == 1 else 0)
+    near = lo is not None and hi is not None and hi - lo <= 8 * unit
+    need = int(ab.get("repeats", NAVER_BSEARCH_REPEATS)) if near else 1
+    if len(votes) < need and sum(votes) * 2 <= need and (len(votes) - sum(votes)) * 2 <= need:
+        # 다수결이 아직 안 정해짐 → 같은 입찰가로 한 번 더 확인
+        ab["last_check"] = now
+        save_state()
+        _abtest_send(context, cid, f"🔁 [입찰추정] {cur_bid}원 경계 재확인 ({len(votes)}/{need})")
+        return
+
+    hit = sum(votes) * 2 > len(votes)
+    ab["votes"] = []
+    ab["probes"] = int(ab.get("probes", 0)) + 1
+    if hit:
+        hi = cur_bid if hi is None else min(hi, cur_bid)
+    else:
+        lo = cur_bid if lo is None else max(lo, cur_bid)
+    ab["lo"], ab["hi"] = lo, hi
+
+    def finish(text):
+        ab["status"] = "done"
+        save_state()
+        _abtest_send(context, cid, text)
+
+    if hi is None:
+        # 아직 1순위 미도달 → 2배씩 확장
+        if cur_bid >= max_bid:
+            finish(
+                f"⚠️ [입찰추정 종료]\n"
+                f"최대 입찰가 {max_bid}원까지 올렸지만 1순위로 추정되지 않았습니다.\n"
+                f"(입찰 변경 {ab['probes']}회)"
+            )
+            return
+        nxt = min(max_bid, _round_bid(cur_bid * 2, unit))
+    elif lo is None:
+        # 시작가부터 1순위 → 절반씩 낮춰 하한 찾기
+        if cur_bid <= NAVER_MIN_BID:
+            lo = NAVER_MIN_BID - unit
+            ab["lo"] = lo
+            nxt = None
+        else:
+            nxt = _round_bid(cur_bid // 2, unit)
+    else:
+        nxt = None
+
+    if nxt is None:
+        if hi - lo <= unit:
+            finish(
+                f"✅ [입찰추정 완료]\n"
+                f"키워드 '{keyword}' 1순위 추정 입찰가: {hi}원\n"
+                f"(이진탐색, 입찰 변경 {ab['probes']}회, 오차 {unit}원 이내)\n"
+                f"(검색 페이지 구조/개인화에 따라 실제와 다를 수 있습니다.)"
+            )
+            return
+        nxt = lo + (hi - lo) // 2 // unit * unit
+        if nxt <= lo:
+            nxt = lo + unit
+        if nxt >= hi:
+            nxt = hi
+
+    ab["current_bid"] = nxt
+    ab["phase"] = "set"
+    ab["last_check"] = now
+    save_state()
+    rng = f"{lo if lo is not None else '?'}~{hi if hi is not None else '?'}원"
+    _abtest_send(
+        context, cid,
+        f"ℹ️ [입찰추정] {cur_bid}원: {'1순위' if hit else '1순위 아님'} → {nxt}원 확인 (범위 {rng})"
+    )
+
 def naver_abtest_loop(context):
     nav = state.setdefault("naver", {})
     ab = nav.get("abtest")
@@ -1070,7 +3978,7 @@ def naver_abtest_loop(context):
         return
 
     if phase == "set":
-        success, msg = naver_set_bid(cur_bid)
+        success, msg = naver_set_target_bid(ab.get("target"), cur_bid)
         if not success:
             ab["status"] = "stopped"
             save_state()
@@ -1102,15 +4010,23 @@ def naver_abtest_loop(context):
         if now - last < interval:
             return
 
-        html = ""
+        page = None
         try:
-            url = _naver_search_url(keyword)
-            r = requests.get(url, headers=NAVER_HEADERS, timeout=5)
-            html = r.text
+            # 입찰 변경 이후에 받은 페이지만 사용 (노출감시가 방금 받은 페이지면 그대로 재사용)
+            page = fetch_search_page(keyword, 1, max_age=now - last, marker=marker)
         except Exception as e:
             print("[NAVER] 검색 결과 조회 실패:", e)
+        if page is None:
+            # 못 받은 페이지는 '1순위 아님'이 아니다 → 입찰가/범위는 그대로 두고 다음 주기에 다시 확인
+            # (last_check 를 유지해야 입찰 변경 이후 페이지만 쓰는 조건도 그대로 남는다)
+            return
+
+        pos = page_ad_position(page, marker)
+        record_bid_obs(keyword, cur_bid, pos, now)
 
-        pos = detect_ad_position(html, marker) if html else None
+        if ab.get("mode") == "bsearch":
+            _abtest_bsearch_step(context, ab, cid, cur_bid, pos, now)
+            return
 
         if pos == 1:
             ab["status"] = "done"
@@ -1160,6 +4076,192 @@ def naver_abtest_loop(context):
         except:
             pass
 
+# ========= NAVER 입찰→순위 학습 모델 =========
+# 입찰추정/노출감시에서 확인한 (시각, 검색어, 입찰가, 광고순위)를 CSV 한 줄씩 쌓고,
+# 검색어 × 시간대별로 순위 ≈ a + b·ln(입찰가) 를 지수 감쇠 가중 최소제곱으로 맞춘다.
+# 합계(가중치, Σx, Σy, Σxx, Σxy, Σyy)만 들고 있어 새 관측은 O(1)로 반영된다.
+_BID_OBS_FILE = os.path.join(DATA_DIR, "bid_obs.csv")
+_BID_MISS_POS = 6           # 광고 영역에 안 보임 → 6위로 취급 (보이는 순위도 6위로 자름)
+
+_bid_model = {}             # (검색어, 시간대 or None) -> [w, sx, sy, sxx, sxy, syy, last_ts, min_bid, max_bid]
+_bid_model_lock = threading.Lock()
+_bid_model_state = {"loaded": False, "rows": 0}
+
+def _bid_bucket(ts):
+    return datetime.fromtimestamp(ts, KST).hour // NAVER_BID_MODEL_BUCKET
+
+def _bid_bucket_text(bucket):
+    h = bucket * NAVER_BID_MODEL_BUCKET
+    return f"{h:02d}~{min(24, h + NAVER_BID_MODEL_BUCKET):02d}시"
+
+def _bid_model_add(keyword, bid, pos, ts):
+    """관측 1건 반영 (_bid_model_lock 안에서 호출)"""
+    x = math.log(bid)
+    y = float(min(pos or _BID_MISS_POS, _BID_MISS_POS))
+    for key in ((keyword, _bid_bucket(ts)), (keyword, None)):
+        s = _bid_model.get(key)
+        if s is None:
+            s = _bid_model[key] = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, ts, bid, bid]
+        # 합계는 항상 마지막 관측 시각 기준 가중치로 유지 (이전 시각 관측은 그만큼 깎아서 더함)
+        f = 0.5 ** (abs(ts - s[6]) / (NAVER_BID_MODEL_HALFLIFE * 86400))
+        w = 1.0
+        if ts > s[6]:
+            for i in range(6):
+                s[i] *= f
+            s[6] = ts
+        else:
+            w = f
+        s[0] += w
+        s[1] += w * x
+        s[2] += w * y
+        s[3] += w * x * x
+        s[4] += w * x * y
+        s[5] += w * y * y
+        s[7] = min(s[7], bid)
+        s[8] = max(s[8], bid)
+
+def _bid_model_load():
+    """처음 쓸 때 CSV를 한 번 읽어 모델을 만든다 (_bid_model_lock 안에서 호출)"""
+    if _bid_model_state["loaded"]:
+        return
+    _bid_model_state["loaded"] = True
+    if not os.path.exists(_BID_OBS_FILE):
+        return
+    rows = 0
+    try:
+        with open(_BID_OBS_FILE, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    ts, keyword, bid, pos = int(row[0]), row[1], int(row[2]), row[3]
+                except:
+                    continue
+                _bid_model_add(keyword, bid, int(pos) if pos else None, ts)
+                rows += 1
+    except Exception as e:
+        print("[NAVER] 입찰 관측 파일 읽기 실패:", e)
+    _bid_model_state["rows"] = rows
+
+def _bid_obs_compact():
+    """관측 파일이 상한의 1.5배를 넘으면 최근 상한만큼만 남긴다 (_bid_model_lock 안에서 호출)"""
+    try:
+        with open(_BID_OBS_FILE, "r", encoding="utf-8", newline="") as f:
+            lines = f.readlines()[-NAVER_BID_OBS_MAX:]
+        tmp = _BID_OBS_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            f.writelines(lines)
+        os.replace(tmp, _BID_OBS_FILE)
+        _bid_model_state["rows"] = len(lines)
+    except Exception as e:
+        print("[NAVER] 입찰 관측 파일 정리 실패:", e)
+
+def record_bid_obs(keyword, bid, pos, ts=None):
+    """pos=None 은 광고 영역에서 못 찾음(미노출)"""
+    keyword = (keyword or "").strip()
+    try:
+        bid = int(bid)
+    except:
+        return
+    if not keyword or bid <= 0:
+        return
+    ts = int(ts or time.time())
+    with _bid_model_lock:
+        _bid_model_load()
+        _bid_model_add(keyword, bid, pos, ts)
+        try:
+            with open(_BID_OBS_FILE, "a", encoding="utf-8", newline="") as f:
+                csv.writer(f).writerow([ts, keyword, bid, pos if pos else ""])
+            _bid_model_state["rows"] += 1
+        except Exception as e:
+            print("[NAVER] 입찰 관측 저장 실패:", e)
+            return
+        if _bid_model_state["rows"] > NAVER_BID_OBS_MAX * 3 // 2:
+            _bid_obs_compact()
+
+def bid_model_predict(keyword, rank=1, at=None):
+    """
+    rank 위 노출에 필요한 입찰가 예측.
+    반환: {"ok", "bid", "reason", "n", "sd", "age_h", "bucket"}
+    - 해당 시간대 관측이 부족하면 전체 시간대 모델로 대신한다 (bucket=None).
+    - ok=False 면 reason 에 이유 (관측 부족/오래됨/오차 큼/관측 범위 밖 등), bid 는 참고값.
+    """
+    keyword = (keyword or "").strip()
+    at = at or datetime.now(KST)
+    bucket = at.hour // NAVER_BID_MODEL_BUCKET
+    with _bid_model_lock:
+        _bid_model_load()
+        s = _bid_model.get((keyword, bucket))
+        if s is None or s[0] < NAVER_BID_MODEL_MIN_OBS:
+            s, bucket = _bid_model.get((keyword, None)), None
+        s = list(s) if s else None
+
+    out = {"ok": False, "bid": None, "reason": "", "n": 0.0, "sd": None, "age_h": None, "bucket": bucket}
+    if s is None:
+        out["reason"] = "관측 없음"
+        return out
+    w, sx, sy, sxx, sxy, syy, last_ts, min_bid, max_bid = s
+    out["n"] = w
+    out["age_h"] = (time.time() - last_ts) / 3600
+    mx, my = sx / w, sy / w
+    var_x = sxx / w - mx * mx
+    cov = sxy / w - mx * my
+    if var_x < 1e-6:
+        out["reason"] = "입찰가가 한 가지뿐이라 기울기를 알 수 없음"
+        return out
+    b = cov / var_x
+    a = my - b * mx
+    out["sd"] = math.sqrt(max(0.0, syy / w - my * my - b * cov))
+    if b >= 0:
+        out["reason"] = "입찰가를 올려도 순위가 오르지 않는 관측뿐"
+        return out
+
+    # 순위는 정수 → rank + 0.5 경계를 넘는 입찰가
+    try:
+        bid = math.exp((rank + 0.5 - a) / b)
+    except OverflowError:
+        bid = float("inf")
+    if bid > 10_000_000:
+        out["reason"] = "예측 입찰가가 비정상적으로 큼"
+        return out
+    out["bid"] = max(NAVER_MIN_BID, int(math.ceil(bid / 10.0)) * 10)
+
+    if w < NAVER_BID_MODEL_MIN_OBS:
+        out["reason"] = f"관측 부족 ({w:.1f}/{NAVER_BID_MODEL_MIN_OBS})"
+    elif out["age_h"] > NAVER_BID_MODEL_STALE * 24:
+        out["reason"] = f"마지막 관측이 {out['age_h'] / 24:.0f}일 전"
+    elif out["sd"] > NAVER_BID_MODEL_MAX_SD:
+        out["reason"] = f"순위 오차 ±{out['sd']:.1f}위로 큼"
+    elif not (min_bid / 1.5 <= out["bid"] <= max_bid * 1.5):
+        out["reason"] = f"관측한 입찰가 범위({min_bid}~{max_bid}원) 밖"
+    else:
+        out["ok"] = True
+    return out
+
+def bid_model_summary():
+    """광고상태용 한 줄"""
+    with _bid_model_lock:
+        _bid_model_load()
+        keywords = {k for k, b in _bid_model if b is None}
+        rows = _bid_model_state["rows"]
+    if not rows:
+        return None
+    return f"관측 {rows}건, 검색어 {len(keywords)}개"
+
+def record_rank_obs(keyword, res):
+    """노출 조회 결과의 광고 순위를 그 검색어에 실제로 걸린 입찰가(naver_effective_bid)와 함께 기록"""
+    if not res or not res.get("scanned") or not naver_enabled():
+        return
+    if not is_leader():
+        return  # bid_obs.csv 와 학습 모델은 리더 것만 쓴다
+    ab = state.setdefault("naver", {}).get("abtest") or {}
+    if ab.get("status") == "running":
+        return  # 입찰추정이 입찰가를 바꾸는 중이면 그쪽 관측만 쓴다
+    try:
+        bid = naver_effective_bid(keyword)
+    except:
+        bid = None
+    if bid:
+        record_bid_obs(keyword, bid, res.get("ad"))
+
 # ========= NAVER 노출감시 (광고/기본 동시 확인) =========
 def naver_rank_watch_loop(context):
     nav = state.setdefault("naver", {})
@@ -1177,28 +4279,30 @@ def naver_rank_watch_loop(context):
         return
     if now - last_check < interval:
         return
+    if not watch_owned("rank:" + keyword):
+        return
 
-    html = ""
     try:
-        url = _naver_search_url(keyword)
-        r = requests.get(url, headers=NAVER_HEADERS, timeout=10)
-        html = r.text
+        res = detect_place_ranks_deep(keyword, marker)
     except Exception as e:
         print("[NAVER] 노출감시 조회 실패:", e)
         return
 
     cfg["last_check"] = now
 
-    res = detect_place_ranks(html, marker) if html else None
     if not res:
-        print("[NAVER] 노출감시: 지정 문구 결과 없음")
+        print("[NAVER] 노출감시: 검색 결과 파싱 실패")
         save_state()
         return
 
+    record_rank_obs(keyword, res)
     ad_rank = res.get("ad")
     org_rank = res.get("organic")
     prev_org = cfg.get("last_rank")
 
+    if org_rank is None:
+        print(f"[NAVER] 노출감시: {res.get('pages')}페이지({res.get('scanned')}개) 내 지정 문구 없음")
+
     if org_rank is not None:
         if prev_org is None:
             try:
@@ -1225,6 +4329,7 @@ def naver_rank_watch_loop(context):
         cfg["last_rank"] = org_rank
 
     save_state()
+    cluster_push({"rank:" + keyword: {"last_rank": cfg.get("last_rank"), "last_check": now}})
 
 # ========= NAVER 리뷰감시 =========
 def _parse_review_count_from_html(html: str):
@@ -1274,125 +4379,310 @@ def _parse_review_count_from_html(html: str):
             return max(candidates)
 
     # 2) 예전/예비 패턴 (하위 호환용)
-    mv = re.search(r'"visitorReviewCount"\s*:\s*(\d+)', html)
-    mb = re.search(r'"blogReviewCount"\s*:\s*(\d+)', html)
-    if mv or mb:
-        v = int(mv.group(1)) if mv else 0
-        b = int(mb.group(1)) if mb else 0
-        if v or b:
-            return v + b
-
-    mv = re.search(r"방문자\s*리뷰\s*([0-9,]+)", html)
-    mb = re.search(r"블로그\s*리뷰\s*([0-9,]+)", html)
-    if mv or mb:
-        v = int(mv.group(1).replace(",", "")) if mv else 0
-        b = int(mb.group(1).replace(",", "")) if mb else 0
-        if v or b:
-            return v + b
-
-    mt = re.search(r'"totalReviewCount"\s*:\s*(\d+)', html)
-    if mt:
-        return int(mt.group(1))
+    return _review_count_from_patterns(html)
+
+# 예전/예비 패턴을 import 시 하나의 정규식으로 묶고, 문서는 한 번만 앞에서부터 훑는다.
+# 모든 분기는 'ReviewCount"' 또는 '리뷰' 중 하나를 반드시 포함하므로, 두 앵커를 문서
+# 순서대로 따라가며 앵커 근처에서만 묶음 정규식을 match 한다. 분기마다 re.search를
+# 따로 돌리면 CPython re가 분기별로 문서 전체를 다시 훑기 때문.
+_REVIEW_FALLBACK_RE = re.compile(
+    r'"visitorReviewCount"\s*:\s*(?P<v_json>\d+)'
+    r'|"blogReviewCount"\s*:\s*(?P<b_json>\d+)'
+    r'|"totalReviewCount"\s*:\s*(?P<total>\d+)'
+    r'|방문자\s*리뷰\s*(?P<v_text>[0-9,]+)'
+    r'|블로그\s*리뷰\s*(?P<b_text>[0-9,]+)'
+    r'|리뷰\s*(?P<any>[0-9,]+)\s*건'
+)
+_REVIEW_FALLBACK_GROUPS = ("v_json", "b_json", "total", "v_text", "b_text", "any")
+_REVIEW_ANCHORS = ('ReviewCount"', "리뷰")
+
+def _review_match_starts(html: str, anchor: str, idx: int):
+    if anchor == 'ReviewCount"':
+        # "visitor / "blog / "total 앞의 따옴표
+        q = html.rfind('"', max(0, idx - 8), idx)
+        return (q,) if q >= 0 else ()
+    # '방문자 리뷰' / '블로그 리뷰' 와 그 안의 '리뷰 N건' 둘 다 확인
+    j = idx
+    while j > 0 and html[j - 1].isspace():
+        j -= 1
+    if j >= 3 and html[j - 3:j] in ("방문자", "블로그"):
+        return (j - 3, idx)
+    return (idx,)
+
+def _scan_review_patterns(html: str):
+    """분기별 첫 매치 값(문자열)을 문서 한 번 순회로 수집"""
+    found = {}
+    cursors = {a: html.find(a) for a in _REVIEW_ANCHORS}
+    while len(found) < len(_REVIEW_FALLBACK_GROUPS):
+        live = [(pos, a) for a, pos in cursors.items() if pos >= 0]
+        if not live:
+            break
+        pos, anchor = min(live)
+        for start in _review_match_starts(html, anchor, pos):
+            m = _REVIEW_FALLBACK_RE.match(html, start)
+            if m and m.lastgroup not in found:
+                found[m.lastgroup] = m.group(m.lastgroup)
+        cursors[anchor] = html.find(anchor, pos + len(anchor))
+    return found
+
+def _review_count_from_patterns(html: str):
+    found = _scan_review_patterns(html)
+
+    def num(g):
+        v = found.get(g)
+        return int(v.replace(",", "")) if v else 0
+
+    # 우선순위: JSON 방문자/블로그 → 텍스트 방문자/블로그 → totalReviewCount → "리뷰 N건"
+    if "v_json" in found or "b_json" in found:
+        total = num("v_json") + num("b_json")
+        if total:
+            return total
+
+    if "v_text" in found or "b_text" in found:
+        total = num("v_text") + num("b_text")
+        if total:
+            return total
+
+    if "total" in found:
+        return num("total")
 
     # "리뷰 123건" 같은 일반 패턴 (최후 보정)
-    ml = re.search(r"리뷰\s*([0-9,]+)\s*건", html)
-    if ml:
-        return int(ml.group(1).replace(",", ""))
+    if "any" in found:
+        return num("any")
 
     return None
 
-def get_place_review_count():
-    if not NAVER_PLACE_ID:
-        return None
-
-    urls = [
-        f"https://m.place.naver.com/place/{NAVER_PLACE_ID}",
-        f"https://map.naver.com/p/entry/place/{NAVER_PLACE_ID}",
-        f"https://pcmap.place.naver.com/restaurant/{NAVER_PLACE_ID}/home",
+# 소스별 통계: 성공률/지연은 지수이동평균이라 고장 난 소스는 빠르게 뒤로 밀리고 복구되면 다시 올라온다
+_review_stats_lock = threading.Lock()
+
+def _review_sources(place_id):
+    m_place = NAVER_PLACE_BASE or "https://m.place.naver.com"
+    nmap = NAVER_PLACE_BASE or "https://map.naver.com"
+    pcmap = NAVER_PLACE_BASE or "https://pcmap.place.naver.com"
+    return [
+        ("m.place", f"{m_place}/place/{place_id}"),
+        ("map", f"{nmap}/p/entry/place/{place_id}"),
+        ("pcmap", f"{pcmap}/restaurant/{place_id}/home"),
     ]
 
-    for url in urls:
+def _record_review_source(name, ok, elapsed):
+    nav = state.setdefault("naver", {})
+    with _review_stats_lock:
+        stats = {k: dict(v) for k, v in (nav.get("review_sources") or {}).items()}
+        st = stats.setdefault(name, {"ok": 0, "fail": 0, "rate": 1.0, "latency": None})
+        st["ok" if ok else "fail"] += 1
+        st["rate"] = round(st["rate"] * 0.8 + (0.2 if ok else 0.0), 4)
+        lat = st.get("latency")
+        st["latency"] = round(elapsed if lat is None else lat * 0.8 + elapsed * 0.2, 3)
+        # 저장 중인 dict를 건드리지 않도록 통째로 교체
+        nav["review_sources"] = stats
+
+def _ordered_review_sources(place_id):
+    stats = state.get("naver", {}).get("review_sources") or {}
+    def key(src):
+        st = stats.get(src[0]) or {}
+        return (-float(st.get("rate", 1.0)), float(st.get("latency") or 0.0))
+    return sorted(_review_sources(place_id), key=key)
+
+def get_place_review_count(place_id=None):
+    """같은 플레이스를 동시에 묻는 호출(리뷰현황 + 리뷰감시)은 한 번의 조회를 나눠 쓴다"""
+    place_id = str(place_id or NAVER_PLACE_ID).strip()
+    if not place_id:
+        return None
+    return single_flight(("place_review", place_id), lambda: _fetch_place_review_count(place_id))
+
+def _fetch_place_review_count(place_id):
+    sources = _ordered_review_sources(place_id)
+    won = threading.Event()
+    kick = [threading.Event() for _ in sources]
+    kick[0].set()
+
+    def _try(i, name, url):
+        # 앞 소스가 실패하면 즉시, 아니면 HEDGE 간격만큼 기다렸다 출발
+        kick[i].wait(i * NAVER_REVIEW_HEDGE_SEC)
+        if won.is_set():
+            return None
+        started = time.time()     # 소스 지연 통계용 (파싱 시간은 scrape 가 따로 잰다)
+        cnt = None
+        blocked = False
         try:
-            r = requests.get(url, headers=NAVER_HEADERS, timeout=10)
+            cnt = scrape("place", url)
+        except BreakerOpen as e:
+            blocked = True
+            print(f"[NAVER] 리뷰 URL 생략: {url} :: {e}")
         except Exception as e:
-            print(f"[NAVER] 리뷰 URL 요청 실패: {url} :: {e}")
-            continue
-
-        try:
-            cnt = _parse_review_count_from_html(r.text)
+            print(f"[NAVER] 리뷰 URL 조회 실패: {url} :: {e}")
+        if not blocked:
+            # 차단기로 생략한 건 소스 탓이 아니라 성공률에 넣지 않는다
+            _record_review_source(name, cnt is not None, time.time() - started)
+        if cnt is not None:
+            won.set()
+            for k in kick:
+                k.set()
+        elif i + 1 < len(kick):
+            kick[i + 1].set()
+        return cnt
+
+    ex = ThreadPoolExecutor(max_workers=len(sources))
+    try:
+        futures = [ex.submit(_try, i, name, url) for i, (name, url) in enumerate(sources)]
+        for fut in as_completed(futures):
+            cnt = fut.result()
             if cnt is not None:
                 return cnt
-        except Exception as e:
-            print(f"[NAVER] 리뷰 파싱 실패: {url} :: {e}")
+    finally:
+        # 늦게 도착하는 나머지 응답은 기다리지 않는다 (통계만 기록)
+        won.set()
+        for k in kick:
+            k.set()
+        ex.shutdown(wait=False)
 
     return None
 
+def review_source_lines():
+    stats = state.get("naver", {}).get("review_sources") or {}
+    lines = []
+    for name, _ in _ordered_review_sources("-"):
+        st = stats.get(name)
+        if not st:
+            lines.append(f"  · {name}: 기록 없음")
+            continue
+        total = st.get("ok", 0) + st.get("fail", 0)
+        lat = st.get("latency")
+        lat_txt = f"{lat:.1f}초" if lat is not None else "-"
+        lines.append(
+            f"  · {name}: 최근 성공률 {st.get('rate', 0) * 100:.0f}% "
+            f"(누적 {st.get('ok', 0)}/{total}), 평균 {lat_txt}"
+        )
+    return lines
+
+
+# 플레이스별 다음 확인 시각을 힙으로 관리: (due, place_id)
+# 설정이 바뀌면 새 항목을 넣고, 꺼낸 항목이 현재 설정과 다르면 버린다 (지연 삭제).
+_review_heap = []
+_review_heap_lock = threading.Lock()
+_review_heap_built = False
+
+def _review_due(p):
+    return float(p.get("last_check", 0.0)) + int(p.get("interval", 180))
+
+def review_watch_places():
+    return state.setdefault("naver", {}).setdefault("review_watch", {}).setdefault("places", {})
+
+def review_reschedule(place_id=None):
+    global _review_heap_built
+    places = review_watch_places()
+    with _review_heap_lock:
+        if place_id is None:
+            _review_heap.clear()
+            for pid, p in places.items():
+                _review_heap.append((_review_due(p), pid))
+            heapq.heapify(_review_heap)
+            _review_heap_built = True
+        elif place_id in places:
+            heapq.heappush(_review_heap, (_review_due(places[place_id]), place_id))
+
+def _pop_due_places(now, limit):
+    if not _review_heap_built:
+        review_reschedule()
+    places = review_watch_places()
+    due = []
+    with _review_heap_lock:
+        while _review_heap and _review_heap[0][0] <= now and len(due) < limit:
+            t, pid = heapq.heappop(_review_heap)
+            p = places.get(pid)
+            if p is None or abs(t - _review_due(p)) > 1e-6 or pid in due:
+                continue
+            if not watch_owned("review:" + pid):
+                continue    # 다른 노드 몫 (링이 바뀌면 review_reschedule 로 다시 들어온다)
+            due.append(pid)
+    return due
+
+def fetch_review_counts(place_ids):
+    # 플레이스 단위 병렬 조회 (실제 동시 요청 수는 _naver_budget 이 제한)
+    if not place_ids:
+        return {}
+    workers = min(len(place_ids), NAVER_MAX_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return dict(zip(place_ids, ex.map(get_place_review_count, place_ids)))
 
 def naver_review_watch_loop(context):
     nav = state.setdefault("naver", {})
     cfg = nav.setdefault("review_watch", {})
     if not cfg.get("enabled"):
         return
-    if not NAVER_PLACE_ID:
-        return
 
     now = time.time()
-    interval = int(cfg.get("interval", 180))
-    last_check = float(cfg.get("last_check", 0.0))
-
-    if now - last_check < interval:
+    due = _pop_due_places(now, NAVER_REVIEW_BATCH)
+    if not due:
         return
 
-    cnt = get_place_review_count()
-    cfg["last_check"] = now
-
-    if cnt is None:
-        print("[NAVER] 리뷰감시: 리뷰 수 파싱 실패")
-        save_state()
-        return
+    counts = fetch_review_counts(due)
+    places = review_watch_places()
 
-    last = cfg.get("last_count")
-    if last is None:
-        cfg["last_count"] = cnt
-        save_state()
-        try:
-            send_ctx(
-                context,
-                f"⭐️ [리뷰감시 시작]\n현재 리뷰 {cnt}건 기준으로 감시합니다."
-            )
-        except:
-            pass
-        return
+    started = []
+    added = []
+    for pid in due:
+        p = places.get(pid)
+        if p is None:
+            continue
+        p["last_check"] = now
+        cnt = counts.get(pid)
+        if cnt is None:
+            print(f"[NAVER] 리뷰감시: 리뷰 수 파싱 실패 ({pid})")
+        else:
+            last = p.get("last_count")
+            if last is None:
+                started.append((pid, cnt))
+            elif cnt > last:
+                added.append((pid, cnt - last, cnt))
+            p["last_count"] = cnt
+        review_reschedule(pid)
 
-    if cnt > last:
-        diff = cnt - last
-        cfg["last_count"] = cnt
-        save_state()
+    save_state()
+    cluster_push({
+        "review:" + pid: {"last_count": places[pid].get("last_count"), "last_check": now}
+        for pid in due if pid in places
+    })
+
+    # 같은 주기에 나온 알림은 한 메시지로
+    lines = []
+    if started:
+        lines.append("⭐️ [리뷰감시 시작]")
+        for pid, cnt in started:
+            lines.append(f"· {pid}: 현재 리뷰 {cnt}건 기준으로 감시합니다.")
+    if added:
+        lines.append("⭐️ [리뷰감시]")
+        for pid, diff, cnt in added:
+            lines.append(f"· {pid}: 신규 리뷰 {diff}건 추가 (총 {cnt}건)")
+    if lines:
         try:
-            send_ctx(
-                context,
-                f"⭐️ [리뷰감시]\n신규 리뷰 {diff}건 추가 (총 {cnt}건)"
-            )
+            send_ctx(context, "\n".join(lines))
         except:
             pass
-    else:
-        save_state()
 
 def naver_review_check_once(update):
-    if not NAVER_PLACE_ID:
-        reply(update, "NAVER_PLACE_ID가 설정되어 있지 않습니다. .env에 플레이스 ID를 입력하세요.")
+    places = review_watch_places()
+    if not places:
+        reply(update, "리뷰감시 대상 플레이스가 없습니다. '리뷰감시 추가 <플레이스ID>'로 등록하거나 .env에 NAVER_PLACE_ID를 입력하세요.")
         return
 
-    cnt = get_place_review_count()
-    if cnt is None:
-        reply(update, "리뷰현황 조회 중 오류가 발생했습니다.")
+    counts = fetch_review_counts(list(places.keys()))
+    src = "- 조회 소스 (우선순위 순):\n" + "\n".join(review_source_lines())
+
+    if all(c is None for c in counts.values()):
+        reply(update, "리뷰현황 조회 중 오류가 발생했습니다.\n" + src)
         return
 
-    nav = state.setdefault("naver", {})
-    cfg = nav.setdefault("review_watch", {})
-    cfg["last_count"] = cnt
+    lines = ["리뷰현황: 현재 네이버 플레이스 리뷰"]
+    for pid, cnt in counts.items():
+        if cnt is None:
+            lines.append(f"· {pid}: 조회 실패")
+            continue
+        places[pid]["last_count"] = cnt
+        lines.append(f"· {pid}: 총 {cnt}건")
     save_state()
-    reply(update, f"리뷰현황: 현재 네이버 플레이스 리뷰는 총 {cnt}건입니다.")
+    reply(update, "\n".join(lines) + "\n" + src)
 
 # ========= 즉시 노출 조회 =========
 def naver_rank_check_once(update):
@@ -1411,16 +4701,13 @@ def naver_rank_check_once(update):
         return
 
     try:
-        url = _naver_search_url(keyword)
-        r = requests.get(url, headers=NAVER_HEADERS, timeout=10)
-        html = r.text
-        res = detect_place_ranks(html, marker)
+        res = detect_place_ranks_deep(keyword, marker)
     except Exception as e:
         print("[NAVER] 노출현황 조회 실패:", e)
         reply(update, "노출현황 조회 중 오류가 발생했습니다.")
         return
 
-    if not res:
+    if not res or (res.get("ad") is None and res.get("organic") is None and not res.get("scanned")):
         reply(
             update,
             "📡 노출현황 알림\n"
@@ -1429,6 +4716,7 @@ def naver_rank_check_once(update):
             "설정하신 키워드/문구를 다시 한 번 확인해 주세요."
         )
     else:
+        record_rank_obs(keyword, res)
         ad_rank = res.get("ad")
         org_rank = res.get("organic")
         if org_rank is not None:
@@ -1439,8 +4727,54 @@ def naver_rank_check_once(update):
            "📡 노출현황 알림\n"
         f"🔍 키워드: '{keyword}'\n"
         f"💚 광고 노출: {_fmt_rank(ad_rank)}\n"
-        f"📍 기본 노출: {_fmt_rank(org_rank)} (광고 제외)"
+        f"📍 기본 노출: {_fmt_rank(org_rank, res.get('scanned'))} (광고 제외, {res.get('pages')}페이지 확인)"
+        )
+
+# ========= 입찰예측 (학습 모델) =========
+def naver_bid_predict(update, cid, text):
+    """입찰예측 [검색어] [N위] [HH:MM] : 모델로 바로 답하고, 불확실하면 입찰추정으로 넘긴다"""
+    nav = state.setdefault("naver", {})
+    parts = text.split()[1:]
+    now = datetime.now(KST)
+    at, rank = now, 1
+    if parts and re.fullmatch(r"\d{1,2}:\d{2}", parts[-1]):
+        hh, mm = map(int, parts.pop().split(":"))
+        if hh > 23 or mm > 59:
+            reply(update, "시간은 HH:MM 형식으로 입력하세요. 예: 입찰예측 강남 애견카페 1위 20:00")
+            return
+        at = now.replace(hour=hh, minute=mm)
+    if parts and re.fullmatch(r"\d{1,2}위?", parts[-1]):
+        rank = max(1, int(parts.pop().rstrip("위")))
+    keyword = " ".join(parts).strip()
+    if not keyword:
+        keyword = ((nav.get("abtest") or {}).get("keyword")
+                   or (nav.get("rank_watch") or {}).get("keyword") or "").strip()
+    if not keyword:
+        reply(update, "형식: 입찰예측 검색어 [N위] [HH:MM]\n예: 입찰예측 강남 애견카페 1위 20:00")
+        return
+
+    p = bid_model_predict(keyword, rank, at)
+    when = _bid_bucket_text(p["bucket"]) if p["bucket"] is not None else "전체 시간대"
+    if p["ok"]:
+        reply(
+            update,
+            f"📈 입찰예측 ({at.strftime('%H:%M')} 기준)\n"
+            f"🔍 검색어: '{keyword}'\n"
+            f"🎯 {rank}위 예상 입찰가: {p['bid']:,}원\n"
+            f"- 모델: {when}, 가중 관측 {p['n']:.1f}건, 순위 오차 ±{p['sd']:.1f}위, "
+            f"마지막 관측 {p['age_h']:.0f}시간 전"
         )
+        return
+
+    # 모델이 불확실 → 입찰추정(실측) 플로우로 넘어가되 검색어는 미리 채워 둔다
+    hint = f" (모델 참고값 {p['bid']:,}원)" if p["bid"] else ""
+    set_pending(cid, "naver_abtest", "start_bid", {"keyword": keyword, "target": None})
+    reply(
+        update,
+        f"📈 입찰예측: '{keyword}' {rank}위 — 모델 불확실 ({p['reason']}){hint}\n"
+        f"입찰추정으로 실측합니다. 시작 입찰가(원)를 입력하세요.",
+        kb=CANCEL_KB(),
+    )
 
 # ========= INLINE MODE HANDLER =========
 def on_mode_select(update, context):
@@ -1464,6 +4798,9 @@ def on_mode_select(update, context):
         q.answer()
 
 # ========= TEXT HANDLER =========
+def on_text_profiled(update, context):
+    return profile_call("on_text", on_text, update, context)
+
 def on_text(update, context):
     if not only_owner(update):
         return
@@ -1490,7 +4827,7 @@ def on_text(update, context):
         # --- 코인 플로우 ---
         if action == "coin" and step == "mode":
             if text not in ["추가","삭제"]:
-                reply(update,"‘추가/삭제’ 중 선택하세요.", kb=COIN_MODE_KB)
+                reply(update,"‘추가/삭제’ 중 선택하세요.", kb=COIN_MODE_KB())
             else:
                 next_action = "coin_add" if text == "추가" else "coin_del"
                 set_pending(cid, next_action, "symbol", {})
@@ -1519,7 +4856,7 @@ def on_text(update, context):
                     "setqty":"수량",
                     "setrate_coin":"임계값(%)"
                 }[action]
-            reply(update, f"{symbol} {label} 값을 숫자로 입력하세요.", kb=CANCEL_KB)
+            reply(update, f"{symbol} {label} 값을 숫자로 입력하세요.", kb=CANCEL_KB())
             return
 
         if step == "value" and action in ["setavg","setqty","setrate_coin"]:
@@ -1527,7 +4864,7 @@ def on_text(update, context):
             try:
                 float(v)
             except:
-                reply(update,"숫자만 입력하세요. 취소는 ‘취소’", kb=CANCEL_KB)
+                reply(update,"숫자만 입력하세요. 취소는 ‘취소’", kb=CANCEL_KB())
                 return
             symbol = data.get("symbol","")
             if action == "setavg":
@@ -1586,7 +4923,7 @@ def on_text(update, context):
                     set_pending(cid, "trigger", "delete_select", data)
                     reply(update,
                           _trigger_list_text(c)+"\n삭제할 번호를 입력(예: 1 또는 1,3)",
-                          kb=CANCEL_KB)
+                          kb=CANCEL_KB())
                     return
 
                 if text == "추가":
@@ -1603,7 +4940,7 @@ def on_text(update, context):
                     if part.isdigit():
                         nums.append(int(part))
                 if not nums:
-                    reply(update, "번호를 올바르게 입력하세요. 예: 1 또는 1,3", kb=CANCEL_KB)
+                    reply(update, "번호를 올바르게 입력하세요. 예: 1 또는 1,3", kb=CANCEL_KB())
                     return
                 cnt = trigger_delete(data["symbol"], set(nums))
                 clear_pending(cid)
@@ -1624,7 +4961,7 @@ def on_text(update, context):
                 )
                 set_pending(cid, "trigger", "add_value", data)
                 msg = "가격(원)을 입력하세요." if data["mode"]=="direct" else "변화율(%)을 입력하세요. 예: 5 또는 -5"
-                reply(update, msg, kb=CANCEL_KB)
+                reply(update, msg, kb=CANCEL_KB())
                 return
 
             if step == "add_value":
@@ -1632,12 +4969,12 @@ def on_text(update, context):
                 try:
                     float(v)
                 except:
-                    reply(update,"숫자만 입력하세요.", kb=CANCEL_KB)
+                    reply(update,"숫자만 입력하세요.", kb=CANCEL_KB())
                     return
                 try:
                     trg = trigger_add(data["symbol"], data["mode"], float(v))
                 except ValueError as e:
-                    reply(update, f"오류: {e}", kb=CANCEL_KB)
+                    reply(update, f"오류: {e}", kb=CANCEL_KB())
                     return
                 clear_pending(cid)
                 reply(update, f"트리거 등록: {data['symbol'].upper()} {fmt(trg)}원")
@@ -1649,7 +4986,7 @@ def on_text(update, context):
             try:
                 bid = int(v)
             except:
-                reply(update, "숫자만 입력하세요. 취소는 ‘취소’", kb=CANCEL_KB)
+                reply(update, "숫자만 입력하세요. 취소는 ‘취소’", kb=CANCEL_KB())
                 return
             success, msg = naver_set_bid(bid)
             clear_pending(cid)
@@ -1658,28 +4995,32 @@ def on_text(update, context):
 
         # --- 네이버 시간표 ---
         if action == "naver_schedule" and step == "input":
-            raw = text.replace("\n", " ").strip()
-            parts = [p for p in raw.split() if p]
-            schedules = []
-            ok = True
-            for part in parts:
-                try:
-                    t_str, bid_str = part.split("/", 1)
-                    t_str = t_str.strip()
-                    bid = int(bid_str.replace(",", "").strip())
-                    datetime.strptime(t_str, "%H:%M")
-                    schedules.append({"time": t_str, "bid": bid})
-                except:
-                    ok = False
-                    break
-            if not ok or not schedules:
-                reply(update, "형식이 올바르지 않습니다. 예: 08:00/300 18:00/500", kb=CANCEL_KB)
+            try:
+                schedules = parse_schedule_rules(text)
+            except:
+                reply(
+                    update,
+                    "형식이 올바르지 않습니다. 예: 08:00/300 18:00/500\n"
+                    "평일 08:00/300 주말 10:00/200@k:강남애견카페 2026-12-01~2026-12-31 매일 20:00/700",
+                    kb=CANCEL_KB(),
+                )
+                return
+            try:
+                for item in schedules:
+                    if item.get("target"):
+                        item["target"] = resolve_target(item["target"])
+                        if not item["target"]:
+                            item.pop("target")
+            except Exception as e:
+                reply(update, f"입찰 대상을 찾지 못했습니다: {e}", kb=CANCEL_KB())
                 return
             nav = state.setdefault("naver", {})
             nav["schedules"] = schedules
             nav.setdefault("auto_enabled", False)
             nav["last_applied"] = ""
+            nav["last_applied_keys"] = {}
             save_state()
+            schedule_rebuild()
             clear_pending(cid)
             status = "켜짐" if nav["auto_enabled"] else "꺼짐"
             reply(update, f"자동 변경 시간표 저장 완료. (자동 변경 현재: {status})")
@@ -1688,9 +5029,15 @@ def on_text(update, context):
         # --- 네이버 입찰추정 플로우 ---
         if action == "naver_abtest":
             if step == "keyword":
-                data["keyword"] = text.strip()
+                kw, _, ref = text.strip().partition("@")
+                try:
+                    data["target"] = resolve_target(ref)
+                except Exception as e:
+                    reply(update, f"입찰 대상을 찾지 못했습니다: {e}", kb=CANCEL_KB())
+                    return
+                data["keyword"] = kw.strip()
                 set_pending(cid, "naver_abtest", "start_bid", data)
-                reply(update, "입찰 추정을 시작할 '시작 입찰가(원)'를 입력하세요.", kb=CANCEL_KB)
+                reply(update, "입찰 추정을 시작할 '시작 입찰가(원)'를 입력하세요.", kb=CANCEL_KB())
                 return
 
             if step == "start_bid":
@@ -1698,17 +5045,17 @@ def on_text(update, context):
                 try:
                     start_bid = int(v)
                 except:
-                    reply(update, "숫자만 입력하세요. 취소는 ‘취소’", kb=CANCEL_KB)
+                    reply(update, "숫자만 입력하세요. 취소는 ‘취소’", kb=CANCEL_KB())
                     return
                 data["start_bid"] = start_bid
                 set_pending(cid, "naver_abtest", "marker", data)
-                reply(update, "검색 결과에서 내 매장을 식별할 문구를 입력하세요.\n예: '두젠틀 애견카페 강남'", kb=CANCEL_KB)
+                reply(update, "검색 결과에서 내 매장을 식별할 문구를 입력하세요.\n예: '두젠틀 애견카페 강남'", kb=CANCEL_KB())
                 return
 
             if step == "marker":
                 data["marker"] = text.strip()
                 set_pending(cid, "naver_abtest", "interval", data)
-                reply(update, "노출위치 확인 간격(초)을 입력하세요. (권장 60)", kb=CANCEL_KB)
+                reply(update, "노출위치 확인 간격(초)을 입력하세요. (권장 60)", kb=CANCEL_KB())
                 return
 
             if step == "interval":
@@ -1722,7 +5069,7 @@ def on_text(update, context):
                     interval = 60
                 data["interval"] = interval
                 set_pending(cid, "naver_abtest", "max_bid", data)
-                reply(update, "최대 입찰가(원)를 입력하세요. (이 금액을 넘기면 추정을 중단합니다.)", kb=CANCEL_KB)
+                reply(update, "최대 입찰가(원)를 입력하세요. (이 금액을 넘기면 추정을 중단합니다.)", kb=CANCEL_KB())
                 return
 
             if step == "max_bid":
@@ -1732,21 +5079,46 @@ def on_text(update, context):
                 except:
                     start_bid = int(data.get("start_bid", 0))
                     max_bid = start_bid + 200
+                data["max_bid"] = max_bid
+                set_pending(cid, "naver_abtest", "mode", data)
+                reply(
+                    update,
+                    "탐색 방식을 선택하세요.\n"
+                    "- 이진탐색: 범위를 절반씩 좁혀 입찰 변경 횟수를 최소화 (권장)\n"
+                    "- 단계상승: 10원씩 올리며 확인 (기존 방식)",
+                    kb=ReplyKeyboardMarkup(
+                        [["이진탐색", "단계상승"], ["취소"]],
+                        resize_keyboard=True, one_time_keyboard=True),
+                )
+                return
+
+            if step == "mode":
+                if text not in ["이진탐색", "단계상승"]:
+                    reply(update, "‘이진탐색/단계상승’ 중 선택하세요.",
+                          kb=ReplyKeyboardMarkup(
+                              [["이진탐색", "단계상승"], ["취소"]],
+                              resize_keyboard=True, one_time_keyboard=True))
+                    return
+                mode = "bsearch" if text == "이진탐색" else "linear"
                 keyword = data.get("keyword", "")
                 marker = data.get("marker", "")
                 start_bid = int(data.get("start_bid", 0))
+                max_bid = int(data.get("max_bid", start_bid + 200))
                 interval = int(data.get("interval", 60))
                 step_bid = 10
                 clear_pending(cid)
-                start_naver_abtest(cid, keyword, marker, start_bid, max_bid, step_bid, interval)
+                start_naver_abtest(cid, keyword, marker, start_bid, max_bid, step_bid, interval,
+                                   target=data.get("target"), mode=mode)
                 reply(
                     update,
                     f"입찰추정을 시작합니다.\n"
                     f"- 키워드: {keyword}\n"
+                    f"- 입찰 대상: {target_label(data.get('target'))}\n"
+                    f"- 방식: {text}\n"
                     f"- 시작 입찰가: {start_bid}원\n"
                     f"- 최대 입찰가: {max_bid}원\n"
                     f"- 확인 간격: {interval}초\n"
-                    f"- 상승 단위: {step_bid}원",
+                    f"- {'정밀도' if mode == 'bsearch' else '상승 단위'}: {step_bid}원",
                 )
                 return
 
@@ -1758,13 +5130,13 @@ def on_text(update, context):
                 cfg["keyword"] = text.strip()
                 set_pending(cid, "naver_rank_watch", "marker", {})
                 save_state()
-                reply(update, "플레이스 리스트에서 내 매장을 식별할 문구를 입력하세요.\n예: '두젠틀 애견카페 강남'", kb=CANCEL_KB)
+                reply(update, "플레이스 리스트에서 내 매장을 식별할 문구를 입력하세요.\n예: '두젠틀 애견카페 강남'", kb=CANCEL_KB())
                 return
             if step == "marker":
                 cfg["marker"] = text.strip()
                 set_pending(cid, "naver_rank_watch", "interval", {})
                 save_state()
-                reply(update, "확인 간격(초)을 입력하세요. (권장 300)", kb=CANCEL_KB)
+                reply(update, "확인 간격(초)을 입력하세요. (권장 300)", kb=CANCEL_KB())
                 return
             if step == "interval":
                 try:
@@ -1791,6 +5163,49 @@ def on_text(update, context):
         update.message.reply_text("모드를 선택하세요.", reply_markup=mode_inline_kb())
         return
 
+    # 프로파일 [대상] [횟수] / 프로파일 중지 [대상] : 주인(CHAT_ID)만
+    if head == "프로파일":
+        if not CHAT_ID or str(cid) != CHAT_ID:
+            reply(update, "프로파일은 CHAT_ID 로 지정된 주인만 사용할 수 있습니다.")
+            return
+        parts = text.split()[1:]
+        with _jobs_lock:
+            names = sorted(_jobs) + ["on_text"]
+        if parts and parts[0] in ["중지", "stop"]:
+            paths = profile_stop(parts[1] if len(parts) > 1 else None)
+            reply(update, "프로파일 중지." + ("\n" + "\n".join(paths) if paths else " (진행 중인 대상 없음)"))
+            return
+        if not parts:
+            lines = profile_status_lines()
+            reply(
+                update,
+                "🧪 프로파일\n" + ("\n".join(lines) if lines else "- 진행 중인 대상 없음") +
+                f"\n대상: {', '.join(names)}\n사용법: 프로파일 <대상|전체> [횟수], 프로파일 중지 [대상]"
+            )
+            return
+        targets = names if parts[0] in ["전체", "all"] else [parts[0]]
+        if any(t not in names for t in targets):
+            reply(update, f"알 수 없는 대상입니다. 대상: {', '.join(names)}")
+            return
+        try:
+            runs = int(parts[1]) if len(parts) > 1 else PROFILE_RUNS
+        except:
+            runs = PROFILE_RUNS
+        for t in targets:
+            profile_start(t, runs, chat_id=cid)
+        reply(update, f"🧪 프로파일 시작: {', '.join(targets)} 각 {runs}회 → 끝나면 {PROFILE_DIR} 에 저장")
+        return
+
+    if head == "작업상태":
+        lines = job_status_lines()
+        recv = "웹훅" if _webhook["mode"] == "webhook" else "폴링"
+        head_line = f"⏱ 작업상태 (최근 200회 기준) · 텔레그램 수신: {recv}"
+        lines = [head_line] + (lines or ["- 등록된 작업 없음"]) + ["", lease_status_line(), snapshot_status_line(), scraper_status_line(), single_flight_line(), ""] + breaker_status_lines()
+        if CLUSTER_DB:
+            lines += [""] + cluster_status_lines()
+        reply(update, "\n".join(lines)[:4000])
+        return
+
     if head in ["보기","show"]:
         if not state["coins"]:
             reply(update, "등록된 코인이 없습니다. ‘코인 → 추가’로 등록하세요.")
@@ -1807,6 +5222,7 @@ def on_text(update, context):
             f"⚙️ 상태(전체 설정)\n"
             f"- 기본 임계값: {g}%\n"
             f"- 등록 코인 수: {len(state['coins'])}\n"
+            f"- 구간 알림 규칙: {len(alert_rule_items())}개 ('알림규칙'으로 확인)\n"
         )
         if not state["coins"]:
             reply(update, header + "- 코인 없음")
@@ -1834,12 +5250,75 @@ def on_text(update, context):
             except:
                 pass
         set_pending(cid, "naver_manual", "value", {})
-        reply(update, "변경할 입찰가(원)를 숫자로 입력하세요.", kb=CANCEL_KB)
+        reply(update, "변경할 입찰가(원)를 숫자로 입력하세요.", kb=CANCEL_KB())
+        return
+
+    if head == "광고통계":
+        lines = searchad_stats_lines(full=True)
+        if not lines:
+            reply(update, "아직 수집된 광고 통계가 없습니다. (Searchad API 설정 후 주기적으로 수집)")
+            return
+        reply(update, "\n".join(["📊 광고 성과 통계"] + lines))
+        return
+
+    if head == "광고목록":
+        try:
+            lines = ["📋 Searchad 캠페인/광고그룹/키워드"] + searchad_tree_lines()
+        except Exception as e:
+            reply(update, f"광고 목록 조회 실패: {e}")
+            return
+        reply(update, "\n".join(lines)[:4000])
+        return
+
+    # 키워드입찰 <키워드|ID|g:광고그룹>/<입찰가> ... (g: 는 그룹 내 모든 키워드)
+    if head == "키워드입찰":
+        parts = text.split()[1:]
+        if not parts:
+            reply(update, "형식: 키워드입찰 강남애견카페/500 애견호텔/300 g:광고그룹명/200")
+            return
+        pairs = []
+        for part in parts:
+            ref, _, bid_str = part.rpartition("/")
+            try:
+                pairs.append((ref, int(bid_str.replace(",", ""))))
+            except:
+                ref = ""
+            if not ref:
+                reply(update, "형식: 키워드입찰 강남애견카페/500 애견호텔/300 g:광고그룹명/200")
+                return
+        changes = {}
+        try:
+            for ref, bid in pairs:
+                if ref.startswith(("g:", "그룹:")):
+                    gid = resolve_target(ref).partition(":")[2]
+                    ids = [kid for kid, k in searchad_tree()["keywords"].items() if k["adgroup"] == gid]
+                else:
+                    ids = resolve_target("k:" + ref if ":" not in ref else ref).partition(":")[2].split(",")
+                for kid in ids:
+                    changes[kid] = bid
+        except Exception as e:
+            reply(update, f"⚠️ 입찰 대상을 찾지 못했습니다: {e}")
+            return
+        done, failed = naver_set_keyword_bids(changes)
+        msg = f"키워드 입찰 변경: 성공 {len(done)}개"
+        if failed:
+            msg = "⚠️ " + msg + f", 실패 {len(failed)}개\n" + "\n".join(
+                f"- {_searchad_tree['keywords'].get(k, {}).get('keyword', k)}: {v}" for k, v in failed.items()
+            )
+        else:
+            msg = "✅ " + msg
+        reply(update, msg[:4000])
         return
 
     if head == "광고시간":
         set_pending(cid, "naver_schedule", "input", {})
-        reply(update, "자동 변경 시간을 설정합니다. 예: 08:00/300 18:00/500", kb=CANCEL_KB)
+        reply(
+            update,
+            "자동 변경 시간을 설정합니다. 예: 08:00/300 18:00/500\n"
+            "요일/기간: '평일', '주말', '월수금', '2026-12-01~2026-12-31', '매일', '상시' 뒤의 규칙에 적용\n"
+            "대상 지정: 'HH:MM/입찰가@g:광고그룹명' 또는 '@k:키워드' (생략 시 기본 광고그룹)",
+            kb=CANCEL_KB(),
+        )
         return
 
     if head == "광고자동":
@@ -1852,7 +5331,16 @@ def on_text(update, context):
 
     if head in ["입찰추정","자동입찰"]:
         set_pending(cid, "naver_abtest", "keyword", {})
-        reply(update, "입찰 추정을 위한 검색어를 입력하세요.", kb=CANCEL_KB)
+        reply(
+            update,
+            "입찰 추정을 위한 검색어를 입력하세요.\n"
+            "입찰을 바꿀 대상을 지정하려면 '검색어@k:키워드' 또는 '검색어@g:광고그룹명'",
+            kb=CANCEL_KB(),
+        )
+        return
+
+    if head == "입찰예측":
+        naver_bid_predict(update, cid, text)
         return
 
     if head == "노출감시":
@@ -1864,7 +5352,7 @@ def on_text(update, context):
             reply(update, "노출감시를 중지했습니다.")
         else:
             set_pending(cid, "naver_rank_watch", "keyword", {})
-            reply(update, "노출감시용 키워드를 입력하세요. (예: 강남 애견카페)", kb=CANCEL_KB)
+            reply(update, "노출감시용 키워드를 입력하세요. (예: 강남 애견카페)", kb=CANCEL_KB())
         return
 
     if head in ["노출현황","노출조회","노출상태"]:
@@ -1880,23 +5368,64 @@ def on_text(update, context):
         reply(update, "리뷰감시를 중지했습니다.")
         return
 
-    # 리뷰감시: 리뷰감시 [분]
+    # 리뷰감시: 리뷰감시 [분] / 리뷰감시 추가 <ID> [분] / 리뷰감시 삭제 <ID> / 리뷰감시 목록
     if head.startswith("리뷰감시"):
         nav = state.setdefault("naver", {})
         cfg = nav.setdefault("review_watch", {})
+        places = review_watch_places()
         parts = text.split()
-        if len(parts) >= 2 and parts[1].isdigit():
-            minutes = int(parts[1])
-            sec = max(60, minutes * 60)
+        sub = parts[1] if len(parts) >= 2 else ""
+
+        if sub == "추가":
+            if len(parts) < 3:
+                reply(update, "형식: 리뷰감시 추가 <플레이스ID> [분]")
+                return
+            pid = parts[2].strip()
+            sec = int(cfg.get("interval", 180))
+            if len(parts) >= 4 and parts[3].isdigit():
+                sec = max(60, int(parts[3]) * 60)
+            p = places.setdefault(pid, {"last_count": None})
+            p["interval"] = sec
+            p["last_check"] = 0.0
+            save_state()
+            review_reschedule(pid)
+            reply(update, f"리뷰감시 대상 추가: {pid} ({sec//60}분 간격, 총 {len(places)}곳)")
+            return
+
+        if sub == "삭제":
+            if len(parts) < 3 or parts[2].strip() not in places:
+                reply(update, "형식: 리뷰감시 삭제 <플레이스ID> (등록된 ID만 가능)")
+                return
+            places.pop(parts[2].strip(), None)
+            save_state()
+            reply(update, f"리뷰감시 대상 삭제: {parts[2].strip()} (남은 {len(places)}곳)")
+            return
+
+        if sub == "목록":
+            if not places:
+                reply(update, "리뷰감시 대상이 없습니다.")
+                return
+            lines = ["리뷰감시 대상"]
+            for pid, p in places.items():
+                lines.append(f"· {pid}: {int(p.get('interval', 180))//60}분 간격, 마지막 {p.get('last_count')}건")
+            reply(update, "\n".join(lines))
+            return
+
+        if sub.isdigit():
+            sec = max(60, int(sub) * 60)
             cfg["interval"] = sec
-        if not NAVER_PLACE_ID:
-            reply(update, "NAVER_PLACE_ID가 설정되어 있지 않습니다. .env에 플레이스 ID를 입력하세요.")
+            for p in places.values():
+                p["interval"] = sec
+        if not places:
+            reply(update, "리뷰감시 대상 플레이스가 없습니다. '리뷰감시 추가 <플레이스ID>'로 등록하거나 .env에 NAVER_PLACE_ID를 입력하세요.")
             return
         cfg["enabled"] = True
-        cfg["last_check"] = 0.0
+        for p in places.values():
+            p["last_check"] = 0.0
         save_state()
+        review_reschedule()
         iv = int(cfg.get("interval", 180))
-        reply(update, f"리뷰감시를 시작합니다. {iv//60}분 간격으로 확인합니다.")
+        reply(update, f"리뷰감시를 시작합니다. {len(places)}곳, 기본 {iv//60}분 간격으로 확인합니다.")
         return
 
     if head in ["리뷰현황","리뷰조회","리뷰상태"]:
@@ -1906,7 +5435,7 @@ def on_text(update, context):
     # 코인 기본 명령
     if head == "코인":
         set_pending(cid, "coin", "mode", {})
-        reply(update, "코인 관리 방식을 선택하세요.", kb=COIN_MODE_KB)
+        reply(update, "코인 관리 방식을 선택하세요.", kb=COIN_MODE_KB())
         return
 
     if head == "가격":
@@ -1942,16 +5471,68 @@ def on_text(update, context):
         reply(update, "코인을 선택하거나 직접 입력하세요.", kb=coin_kb())
         return
 
+    # 알림규칙 [목록] / 알림규칙 <코인|전체> <규칙> / 알림규칙 삭제 <번호,...|전체>
+    if head == "알림규칙":
+        parts = text.split()
+        sub = parts[1] if len(parts) >= 2 else "목록"
+        if sub == "목록":
+            reply(update, "\n".join(alert_rule_lines()) + "\n\n" + ALERT_RULE_HELP)
+            return
+        if sub == "삭제":
+            arg = "".join(parts[2:])
+            if arg == "전체":
+                nums = set(range(1, len(alert_rule_items()) + 1))
+            else:
+                try:
+                    nums = {int(x) for x in arg.split(",") if x.strip()}
+                except:
+                    nums = set()
+            if not nums:
+                reply(update, "형식: 알림규칙 삭제 <번호> (예: 1 또는 1,3 또는 전체)")
+                return
+            n = alert_rule_delete(nums)
+            reply(update, f"구간 알림 규칙 {n}개 삭제됨.\n" + "\n".join(alert_rule_lines()))
+            return
+        if len(parts) < 3:
+            reply(update, ALERT_RULE_HELP)
+            return
+        try:
+            added = alert_rule_add(sub.upper(), " ".join(parts[2:]))
+        except ValueError as e:
+            reply(update, f"{e}\n\n{ALERT_RULE_HELP}")
+            return
+        reply(update, f"구간 알림 규칙 등록: {added}")
+        return
+
     reply(update, HELP)
 
 # ========= COIN ALERT LOOP =========
 def check_loop(context):
+    check_coins(context)
+
+def check_takeover(context):
+    # 리더를 넘겨받은 직후 1회: 대기 중 받아 둔 가격으로 바로 확인 (인수 사이 변동/트리거 알림)
+    check_coins(context, max_age=LEASE_TTL)
+
+def check_coins(context, max_age=None):
     if not state["coins"]:
         return
-    for m, info in list(state["coins"].items()):
+    # 등록 코인 시세는 요청 한 번으로 받는다
+    try:
+        prices = get_prices(list(state["coins"]), max_age=max_age)
+    except:
+        return
+
+    alerts = window_rules_tick(prices)
+    if alerts:
         try:
-            cur = get_price(m)
+            send_ctx(context, "⏱ 구간 알림\n" + "\n".join(alerts))
         except:
+            pass
+
+    for m, info in list(state["coins"].items()):
+        cur = prices.get(m)
+        if cur is None:
             continue
 
         if info.get("last_notified_price") is None:
@@ -2018,38 +5599,88 @@ def check_loop(context):
     save_state()
 
 # ========= MAIN =========
+def _pkg_resources_shim():
+    # telegram.ext 가 쓰는 APScheduler 는 pkg_resources 를 임포트한다. setuptools 가 없으면 최소 대체
+    try:
+        import pkg_resources
+    except ImportError:
+        import types as _types, sys as _sys
+        _pkg = _types.ModuleType('pkg_resources')
+        _pkg.get_distribution = lambda name: _types.SimpleNamespace(version='unknown')
+        _pkg.DistributionNotFound = Exception
+        _sys.modules['pkg_resources'] = _pkg
+
 def main():
+    # 헬스 포트부터 열고 나머지(잠금, 상태, telegram 임포트)를 진행
     _start_keepalive()
+    _mark_startup("keepalive")
 
     if not BOT_TOKEN:
         print("BOT_TOKEN 누락")
         return
 
-    up = Updater(BOT_TOKEN, use_context=True)
+    _setup_signals()
+    leader = lease_try_acquire()
+    init_state()
+    _mark_startup("state")
+    atexit.register(flush_state)
+    if CLUSTER_DB:
+        atexit.register(cluster_leave)
+        cluster_tick()
+        if not leader:
+            return cluster_follower_main()
 
-    try:
-        up.bot.delete_webhook(drop_pending_updates=True)
-    except:
-        pass
+    _pkg_resources_shim()
+    from telegram.ext import Updater, MessageHandler, Filters, CallbackQueryHandler
+    _mark_startup("telegram")
+
+    up = Updater(BOT_TOKEN, use_context=True, **({"base_url": TELEGRAM_BASE_URL} if TELEGRAM_BASE_URL else {}))
 
     dp = up.dispatcher
     dp.add_handler(CallbackQueryHandler(on_mode_select))
-    dp.add_handler(MessageHandler(Filters.text & (~Filters.command), on_text))
-    dp.add_handler(MessageHandler(Filters.command, on_text))
+    dp.add_handler(MessageHandler(Filters.text & (~Filters.command), on_text_profiled))
+    dp.add_handler(MessageHandler(Filters.command, on_text_profiled))
+
+    _metrics_refs["updater"] = up
+    prev_leader = None
+    if not leader:
+        # 텔레그램 준비까지 끝낸 상태로 대기하다가 리스가 비면 바로 이어받는다
+        prev_leader = lease_peek().get("holder")
+        lease_standby()
+        _mark_startup("takeover")
+    lease_start_keeper()
+    for name in PROFILE_TARGETS:
+        profile_start(name)
+    # 이전 리더가 종료 직전에 남긴 캐시를 되살리고, 밀린 감시는 한꺼번에 돌지 않게 흩뜨린다
+    snapshot_restore()
+    stagger_overdue_watches()
 
     # Job queues
-    up.job_queue.run_repeating(check_loop, interval=3, first=3)
-    up.job_queue.run_repeating(naver_schedule_loop, interval=30, first=10)
-    up.job_queue.run_repeating(naver_abtest_loop, interval=15, first=15)
-    up.job_queue.run_repeating(naver_rank_watch_loop, interval=60, first=20)
-    up.job_queue.run_repeating(naver_review_watch_loop, interval=60, first=40)
+    jq = up.job_queue
+    run_every(jq, flush_state, 5, first=5)
+    run_every(jq, check_loop, 3, first=3)
+    run_every(jq, snapshot_save, SNAPSHOT_INTERVAL, first=startup_first(SNAPSHOT_INTERVAL))
+    run_every(jq, breaker_watch, 5, first=5)
+    if prev_leader is not None:
+        jq.run_once(timed_job(check_takeover), when=0)
+    schedule_rebuild(jq)
+    jq.run_once(timed_job(naver_schedule_catchup), when=startup_first(10))
+    run_every(jq, naver_abtest_loop, 15, first=startup_first(15))
+    # 노출감시는 여러 페이지를 받을 수 있지만 다음 실행(60초)과 겹치기 전에 알 수 있게 주기보다 짧은 예산,
+    # 리뷰감시는 한 주기에 여러 곳을 조회해 주기(15초)보다 넉넉한 예산
+    run_every(jq, naver_rank_watch_loop, 60, first=startup_first(20), budget=45)
+    run_every(jq, naver_review_watch_loop, 15, first=startup_first(40), budget=30)
+    run_every(jq, searchad_stats_job, NAVER_STATS_INTERVAL, first=startup_first(60), budget=120)
+    if CLUSTER_DB:
+        run_every(jq, cluster_tick, CLUSTER_HEARTBEAT, first=CLUSTER_HEARTBEAT)
 
     def hi(ctx):
         try:
             if CHAT_ID:
                 send_ctx(
                     ctx,
-                    "김비서 출근했어요 💖"
+                    "김비서 출근했어요 💖" if prev_leader is None
+                    else f"김비서 교대 출근했어요 💖 (이전: {prev_leader})"
                 )
         except:
             pass
@@ -2060,12 +5691,43 @@ def main():
     print(">>> Upbit + Naver Ads + Place Watch Bot is running")
     print("////////////////////////////////////////")
 
-    up.start_polling(clean=True)
+    if webhook_start(up):
+        run_every(jq, webhook_watch, TELEGRAM_WEBHOOK_CHECK, first=TELEGRAM_WEBHOOK_CHECK)
+        _mark_startup("webhook")
+    else:
+        if TELEGRAM_WEBHOOK_URL:
+            print("[WEBHOOK] 사용 불가 (PORT 미설정 또는 등록 실패) → 폴링")
+        up.start_polling(clean=True)   # 남아 있는 웹훅도 여기서 해제된다
+        _mark_startup("polling")
+    # 폴링/웹훅이 먼저 뜨도록 워커 기동은 뒤에서
+    threading.Thread(target=scraper_start, name="scraper-start", daemon=True).start()
+    atexit.register(scraper_stop)
     up.idle()
 
-if __name__ == "__main__":
+def cluster_follower_main():
+    """팔로워 노드: 텔레그램 수신 없이 맡은 노출/리뷰 감시와 생존 신호만 돌린다"""
+    _pkg_resources_shim()
+    from telegram.ext import Updater
+    _mark_startup("telegram")
+    # job_queue 에 dispatcher 가 필요해 Updater 는 만들되 폴링/웹훅은 시작하지 않는다
+    up = Updater(BOT_TOKEN, use_context=True, **({"base_url": TELEGRAM_BASE_URL} if TELEGRAM_BASE_URL else {}))
+    _metrics_refs["updater"] = up
+    jq = up.job_queue
+    run_every(jq, cluster_tick, CLUSTER_HEARTBEAT, first=CLUSTER_HEARTBEAT)
+    run_every(jq, naver_rank_watch_loop, 60, first=startup_first(20), budget=45)
+    run_every(jq, naver_review_watch_loop, 15, first=startup_first(15), budget=30)
+    run_every(jq, breaker_watch, 5, first=5)
+    jq.start()
+    print(f"[CLUSTER] 팔로워 {NODE_ID} 실행 중 (리더 {_cluster['leader']})")
+    _mark_startup("follower")
+    scraper_start()
+    atexit.register(scraper_stop)
     try:
-        main()
+        while True:
+            time.sleep(3600)
     finally:
-        _release_lock()
+        jq.stop()
+
+if __name__ == "__main__":
+    main()
 
@@ -0,0 +1,122 @@
+import os, socket, subprocess, sys, tempfile, time, urllib.request
+
+# 차단기 점검: Upbit 주소를 아무도 안 듣는 포트로 두고 연속 실패 → 열림(요청 없이 바로 실패),
+# 시험 요청 실패 → 더 긴 대기로 다시 열림, 같은 포트에 naver_standin.py 를 띄운 뒤 → 복구(닫힘)와
+# 주인 알림, 4xx 응답은 실패로 세지 않는지까지 확인한다. 실제 DATA_DIR 는 건드리지 않는다.
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+PORT = free_port()
+os.environ.update({
+    "DATA_DIR": tempfile.mkdtemp(prefix="breaker_check_"),
+    "UPBIT_BASE_URL": f"http://127.0.0.1:{PORT}",
+    "BREAKER_FAILS": "3", "BREAKER_BASE": "1", "BREAKER_MAX": "4",
+    "CHAT_ID": "1",
+})
+
+import app
+
+class _Bot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, **kw):
+        self.sent.append(text)
+
+class _Ctx:
+    def __init__(self):
+        self.bot = _Bot()
+
+def http_count():
+    return sum(v for (n, _), v in app._metrics.items() if n == "bot_http_requests_total")
+
+def prices(n):
+    ok = blocked = failed = 0
+    for _ in range(n):
+        try:
+            app.get_price("KRW-BTC")
+            ok += 1
+        except app.BreakerOpen:
+            blocked += 1
+        except Exception:
+            failed += 1
+    return ok, blocked, failed
+
+def wait_open_expired():
+    time.sleep(max(0.0, app._breakers["upbit"]["until"] - time.time()) + 0.05)
+
+def main():
+    failures = []
+    app.init_state()
+    app.lease_try_acquire()
+    ctx = _Ctx()
+    standin = None
+    try:
+        # 1) 연속 실패 → 열림, 이후는 요청 없이 거절
+        t0 = time.perf_counter()
+        ok, blocked, failed = prices(10)
+        dt = time.perf_counter() - t0
+        print(f"1) 다운: 실패 {failed}, 거절 {blocked}, HTTP {http_count()}회, {dt * 1000:.0f}ms")
+        if (failed, blocked, http_count()) != (3, 7, 3) or app._breakers["upbit"]["state"] != "open":
+            failures.append("연속 실패 후 열리지 않음")
+
+        # 2) 대기 후 시험 요청 1건 실패 → 더 길게 다시 열림
+        wait_open_expired()
+        ok, blocked, failed = prices(3)
+        b = app._breakers["upbit"]
+        wait = b["until"] - time.time()
+        print(f"2) 시험 실패: 실패 {failed}, 거절 {blocked}, 다시 열림 {wait:.1f}초")
+        if (failed, blocked) != (1, 2) or b["state"] != "open" or b["opens"] != 2 or not 1.4 < wait <= 2.4:
+            failures.append("시험 요청 실패 후 백오프 이상")
+
+        # 3) 서비스 복구 → 시험 요청 성공 → 닫힘
+        env = dict(os.environ, STANDIN_PORT=str(PORT), STANDIN_LATENCY="0", STANDIN_JITTER="0",
+                   NAVER_API_KEY="k", NAVER_API_SECRET="s", NAVER_CUSTOMER_ID="1")
+        standin = subprocess.Popen([sys.executable, "naver_standin.py"], env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        end = time.time() + 20
+        while time.time() < end:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{PORT}/standin", timeout=1)
+                break
+            except Exception:
+                time.sleep(0.05)
+        wait_open_expired()
+        ok, blocked, failed = prices(3)
+        print(f"3) 복구: 성공 {ok}, 상태 {app._breakers['upbit']['state']}")
+        if ok != 3 or app._breakers["upbit"]["state"] != "closed":
+            failures.append("복구 후 닫히지 않음")
+
+        # 4) 4xx(없는 마켓 등)는 요청 문제라 몇 번이 와도 열리지 않는다
+        upbit = app.UPBIT
+        app.UPBIT = f"http://127.0.0.1:{PORT}/missing/v1"
+        ok, blocked, failed = prices(10)
+        app.UPBIT = upbit
+        print(f"4) 404: 실패 {failed}, 거절 {blocked}, 상태 {app._breakers['upbit']['state']}")
+        if failed != 10 or blocked or app._breakers["upbit"]["state"] != "closed":
+            failures.append("4xx 응답으로 차단기가 열림")
+
+        app.breaker_watch(ctx)
+        print("알림:", ctx.bot.sent)
+        text = "\n".join(ctx.bot.sent)
+        if len(ctx.bot.sent) != 1 or "upbit: 차단" not in text or "upbit: 복구" not in text:
+            failures.append("주인 알림 이상")
+        print("\n".join(app.breaker_status_lines()))
+    finally:
+        app.lease_release()
+        if standin is not None:
+            standin.terminate()
+            standin.wait(5)
+
+    if failures:
+        print("FAIL")
+        for f in failures:
+            print(" -", f)
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import json, os, signal, socket, sqlite3, subprocess, sys, tempfile, time, urllib.request
+
+# 감시 분산 확인: naver_standin.py 를 검색/플레이스/Bot API 대역으로 띄우고 같은 CLUSTER_DB·DATA_DIR 로
+# 노드 3개를 실행한다. (1) 모든 리뷰/노출 감시가 일관 해시 링의 주인 노드에서 확인되는지,
+# (2) 노드 하나를 끄면 그 몫이 남은 노드로 옮겨 가는지, (3) 팔로워 알림이 리더를 거쳐 전송되는지,
+# (4) 리더가 하나뿐인지 본다. 실패하면 종료 코드 1.
+PLACES = int(os.getenv("CHECK_PLACES", "12"))
+TIMEOUT = float(os.getenv("CHECK_TIMEOUT", "120"))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+DATA = tempfile.mkdtemp(prefix="cluster_check_")
+DB = os.path.join(DATA, "cluster.db")
+STANDIN = free_port()
+os.environ["DATA_DIR"] = DATA
+
+import app
+
+def seed():
+    # 리뷰감시 PLACES 곳(5초 간격) + 노출감시 1건
+    app.init_state()
+    nav = app.state.setdefault("naver", {})
+    nav["review_watch"] = {"enabled": True, "places": {
+        str(1000 + i): {"interval": 5, "last_count": None, "last_check": 0.0} for i in range(PLACES)}}
+    nav["rank_watch"] = {"enabled": True, "keyword": "강남 애견카페", "marker": "두젠틀",
+                         "interval": 10, "last_rank": None, "last_check": 0.0}
+    app.lease_try_acquire()     # 상태 파일은 리스를 쥔 쪽만 쓸 수 있다
+    app.save_state()
+    app.lease_release()
+
+def node(name, port):
+    env = dict(os.environ, DATA_DIR=DATA, CLUSTER_DB=DB, NODE_ID=name, PORT=str(port),
+               CLUSTER_HEARTBEAT="1", CLUSTER_NODE_TTL="5", SCRAPER_WORKERS="0", CHAT_ID="42",
+               BOT_TOKEN="123456:check", TELEGRAM_BASE_URL=f"http://127.0.0.1:{STANDIN}/bot",
+               NAVER_SEARCH_BASE=f"http://127.0.0.1:{STANDIN}", NAVER_PLACE_BASE=f"http://127.0.0.1:{STANDIN}")
+    for k in ("NAVER_API_KEY", "NAVER_API_SECRET", "NAVER_CUSTOMER_ID", "NAVER_PLACE_ID", "TELEGRAM_WEBHOOK_URL"):
+        env.pop(k, None)
+    log = open(os.path.join(DATA, f"{name}.log"), "w")
+    return subprocess.Popen([sys.executable, "app.py"], env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def watches():
+    with sqlite3.connect(DB, timeout=10) as db:
+        return {w: json.loads(p or "{}") for w, p in db.execute("SELECT watch_id, progress FROM watches")}
+
+def wait_owned(live, since):
+    """모든 감시가 since 이후 live 링의 주인에게 확인될 때까지 대기. 반환 (성공, 감시별 확인 노드)"""
+    ring, keys = app.cluster_ring(live)
+    end = time.time() + TIMEOUT
+    while time.time() < end:
+        w = watches()
+        by = {wid: p.get("node") for wid, p in w.items() if float(p.get("last_check") or 0) >= since}
+        if len(w) == PLACES + 1 and len(by) == len(w):
+            return all(by[wid] == app.ring_owner(wid, ring, keys) for wid in by), by
+        time.sleep(1)
+    return False, {}
+
+def metric(port, name):
+    text = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2).read().decode()
+    return next((float(l.split()[-1]) for l in text.splitlines() if l.startswith(name + " ")), None)
+
+def main():
+    seed()
+    env = dict(os.environ, STANDIN_PORT=str(STANDIN), STANDIN_LATENCY="0", STANDIN_JITTER="0",
+               NAVER_API_KEY="check", NAVER_API_SECRET="check", NAVER_CUSTOMER_ID="1")
+    standin = subprocess.Popen([sys.executable, "naver_standin.py"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    procs = {}
+    ok = True
+    try:
+        time.sleep(1.5)
+        ports = {n: free_port() for n in ("n1", "n2", "n3")}
+        procs["n1"] = node("n1", ports["n1"])
+        time.sleep(2)    # n1 이 가장 먼저 떠 리더가 된다
+        procs["n2"] = node("n2", ports["n2"])
+        procs["n3"] = node("n3", ports["n3"])
+        t0 = time.time()
+        time.sleep(3)
+
+        good, by = wait_owned(["n1", "n2", "n3"], t0)
+        share = {n: sum(1 for v in by.values() if v == n) for n in ports}
+        print(f"1) 노드 3개 분배: {share} {'OK' if good else 'FAIL'}")
+        ok &= good
+
+        leaders = {n: metric(p, "bot_leader") for n, p in ports.items()}
+        outbox = {n: metric(p, "bot_outbox_depth") for n, p in ports.items()}
+        good = leaders == {"n1": 1.0, "n2": 0.0, "n3": 0.0} and None not in outbox.values()
+        print(f"2) 리더: {leaders}, outbox 대기: {outbox} {'OK' if good else 'FAIL'}")
+        ok &= good
+
+        procs.pop("n2").send_signal(signal.SIGTERM)
+        t1 = time.time()
+        good, by = wait_owned(["n1", "n3"], t1)
+        share = {n: sum(1 for v in by.values() if v == n) for n in ("n1", "n3")}
+        print(f"3) n2 종료 후 재분배: {share} {'OK' if good else 'FAIL'}")
+        ok &= good
+
+        time.sleep(3)
+        with sqlite3.connect(DB, timeout=10) as db:
+            queued, pending = db.execute(
+                "SELECT COUNT(*), SUM(sent IS NULL) FROM outbox").fetchone()
+        tg = json.load(urllib.request.urlopen(f"http://127.0.0.1:{STANDIN}/standin", timeout=2))["telegram"]
+        good = queued > 0 and not pending
+        print(f"4) 팔로워 알림: 대기열 {queued}건, 미전송 {pending or 0}건, "
+              f"sendMessage {tg['calls'].get('sendMessage', 0)}회 {'OK' if good else 'FAIL'}")
+        ok &= good
+    finally:
+        for p in procs.values():
+            p.send_signal(signal.SIGTERM)
+        for p in procs.values():
+            try:
+                p.wait(10)
+            except Exception:
+                p.kill()
+        standin.terminate()
+    print("OK" if ok else f"FAIL (노드 로그: {DATA})")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
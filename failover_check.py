@@ -0,0 +1,121 @@
+import json, os, signal, socket, subprocess, sys, tempfile, time, urllib.request
+
+# 리더/대기 인스턴스 교대 시간 측정: naver_standin.py 를 Upbit/Bot API 대역으로 띄우고 같은 DATA_DIR 로 두 개 실행.
+# (1) 리더 정상 종료(SIGTERM, 배포 교체) → 대기가 리더가 될 때까지
+# (2) 리더 강제 종료(SIGKILL, 장애) → 리스 만료 후 대기가 리더가 될 때까지
+# 각각 허용 시간을 넘기거나 리스 token 이 늘지 않으면 종료 코드 1.
+TTL = float(os.getenv("CHECK_LEASE_TTL", "6"))
+BUDGET_CLEAN = float(os.getenv("FAILOVER_BUDGET_CLEAN", "3"))
+BUDGET_CRASH = float(os.getenv("FAILOVER_BUDGET_CRASH", str(TTL + 3)))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+DATA = tempfile.mkdtemp(prefix="failover_check_")
+STANDIN = free_port()
+
+def seed():
+    # 코인 2개를 감시 중인 상태 파일
+    with open(os.path.join(DATA, "portfolio.json"), "w", encoding="utf-8") as f:
+        json.dump({"coins": {m: {"avg_price": 0, "qty": 0, "threshold_pct": None, "triggers": []}
+                             for m in ("KRW-BTC", "KRW-ETH")}, "default_threshold_pct": 1.0}, f)
+
+def instance(name, port):
+    env = dict(os.environ, DATA_DIR=DATA, NODE_ID=name, PORT=str(port), LEASE_TTL=str(TTL),
+               LEASE_RENEW=str(TTL / 4), LEASE_POLL="0.5", SCRAPER_WORKERS="0", CHAT_ID="42",
+               BOT_TOKEN="123456:check", TELEGRAM_BASE_URL=f"http://127.0.0.1:{STANDIN}/bot",
+               UPBIT_BASE_URL=f"http://127.0.0.1:{STANDIN}")
+    for k in ("NAVER_API_KEY", "NAVER_API_SECRET", "NAVER_CUSTOMER_ID", "NAVER_PLACE_ID",
+              "TELEGRAM_WEBHOOK_URL", "CLUSTER_DB"):
+        env.pop(k, None)
+    log = open(os.path.join(DATA, f"{name}.log"), "a")
+    return subprocess.Popen([sys.executable, "app.py"], env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def metrics(port):
+    try:
+        return urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1).read().decode()
+    except Exception:
+        return ""
+
+def leader_of(port):
+    return next((l.split()[-1] == "1" for l in metrics(port).splitlines() if l.startswith("bot_leader ")), None)
+
+def ready(port, stage):
+    # 기동 단계 표시가 나올 때까지 (리스만 잡고 아직 폴링 전인 상태에서 신호를 보내지 않도록)
+    return f'bot_startup_seconds{{stage="{stage}"}}' in metrics(port)
+
+def wait(pred, timeout=30):
+    end = time.time() + timeout
+    while time.time() < end:
+        if pred():
+            return True
+        time.sleep(0.05)
+    return False
+
+def lease():
+    with open(os.path.join(DATA, "leader.lease"), encoding="utf-8") as f:
+        return json.load(f)
+
+def handover(old, old_port, new_port, sig):
+    token = lease()["token"]
+    t0 = time.time()
+    old.send_signal(sig)
+    ok = wait(lambda: leader_of(new_port), timeout=BUDGET_CRASH * 3)
+    return (time.time() - t0) if ok else None, lease()["token"] > token
+
+def main():
+    seed()
+    env = dict(os.environ, STANDIN_PORT=str(STANDIN), STANDIN_LATENCY="0", STANDIN_JITTER="0",
+               NAVER_API_KEY="check", NAVER_API_SECRET="check", NAVER_CUSTOMER_ID="1")
+    standin = subprocess.Popen([sys.executable, "naver_standin.py"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    procs = []
+    rows = []
+    try:
+        time.sleep(1.5)
+        pa, pb = free_port(), free_port()
+        a = instance("a", pa)
+        procs.append(a)
+        if not wait(lambda: ready(pa, "polling"), timeout=30):
+            raise RuntimeError("첫 리더 기동 실패")
+        b = instance("b", pb)
+        procs.append(b)
+        if not wait(lambda: ready(pb, "standby"), timeout=30):
+            raise RuntimeError("대기 인스턴스 기동 실패")
+
+        sec, fenced = handover(a, pa, pb, signal.SIGTERM)
+        rows.append(("정상 종료 교대", sec, fenced, BUDGET_CLEAN))
+
+        # a 를 대기로 다시 띄운 뒤 현재 리더(b)를 강제 종료
+        a = instance("a", pa)
+        procs.append(a)
+        if not wait(lambda: ready(pa, "standby") and ready(pb, "polling"), timeout=30):
+            raise RuntimeError("대기 인스턴스 재기동 실패")
+        sec, fenced = handover(b, pb, pa, signal.SIGKILL)
+        rows.append(("강제 종료 인수", sec, fenced, BUDGET_CRASH))
+        time.sleep(3)    # 인수한 리더의 "교대 출근" 알림
+        tg = json.load(urllib.request.urlopen(f"http://127.0.0.1:{STANDIN}/standin", timeout=2))["telegram"]
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+                try:
+                    p.wait(10)
+                except Exception:
+                    p.kill()
+        standin.terminate()
+
+    ok = True
+    for name, sec, fenced, budget in rows:
+        good = sec is not None and sec <= budget and fenced
+        ok &= good
+        shown = f"{sec:6.2f}s" if sec is not None else "  시간 초과"
+        print(f"{name:<10} {shown}  (허용 {budget:.1f}s, token 증가 {'예' if fenced else '아니오'}){'' if good else '  ✗'}")
+    print(f"Bot API 호출: {tg['calls']}")
+    print("OK" if ok else f"FAIL (로그: {DATA})")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import glob, os, sys, tempfile, time, tracemalloc
+
+# app 임포트 시 잠금/상태 파일이 실제 DATA_DIR를 건드리지 않도록 임시 폴더 사용
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="fixture_check_")
+
+import app
+
+# 노출감시에 실제 사용하는 식별 문구
+MARKER = os.getenv("FIXTURE_MARKER", "두젠틀")
+ROUNDS = int(os.getenv("FIXTURE_ROUNDS", "5"))
+# 파서별 허용 시간 (문서 1MB당 ms). 저장된 페이지 실측의 약 20배 여유
+BUDGET_MS_PER_MB = {
+    "apollo": float(os.getenv("FIXTURE_BUDGET_APOLLO", "200")),
+    "ranks": float(os.getenv("FIXTURE_BUDGET_RANKS", "200")),
+    "ad_position": float(os.getenv("FIXTURE_BUDGET_AD", "100")),
+    "page_ad": float(os.getenv("FIXTURE_BUDGET_PAGE_AD", "200")),
+    "review": float(os.getenv("FIXTURE_BUDGET_REVIEW", "200")),
+}
+# 시간 초과를 실패로 볼지: enforce(기본, 로컬 측정) | report (빌드처럼 CPU 를 나눠 쓰는 곳: 경고만 출력)
+TIMING = os.getenv("FIXTURE_TIMING", "enforce").strip().lower()
+
+# 저장된 페이지별 기대값 (페이지를 직접 보고 확인한 값). naver_rank_debug.py / naver_review_debug.py 로 새로 받은
+# 페이지는 여기 추가하기 전까지 측정만 하고 검사하지 않는다.
+# 파서는 해당하는 페이지 종류에서만 검사한다: 검색 결과 페이지는 순위/광고 위치, 플레이스 상세 페이지는 리뷰 수.
+# (광고 목록이 없는 상세 페이지의 광고 위치, 검색 페이지의 리뷰 수는 의미 없는 값이라 고정하지 않는다)
+EXPECTED = {
+    # 광고: 두젠틀 1번째, 기본: 놀로스퀘어/피터펫카페 다음 3번째
+    "debug/naver_search_place.html": {
+        "apollo": 17, "ranks": {"ad": 1, "organic": 3}, "ad_position": 1, "page_ad": 1,
+    },
+    "naver_rank_debug.html": {
+        "apollo": 17, "ranks": {"ad": 1, "organic": 3}, "ad_position": 1, "page_ad": 1,
+    },
+    # 본문이 비어 있는 플레이스 껍데기 페이지 (리뷰 수 표시 없음)
+    "debug/naver_place.html": {"apollo": 0, "review": None},
+    # 리뷰 수: 페이지의 "방문자 리뷰 N" 링크에 보이는 값
+    "debug/naver_place_normal.html": {"apollo": 45, "review": 524},
+    "naver_review_debug.html": {"apollo": 45, "review": 523},
+    "naver_place_home.html": {"apollo": 45, "review": 528},
+}
+
+PARSERS = [
+    # __APOLLO_STATE__ 최상위 노드 수
+    ("apollo", lambda html: len(app._extract_apollo_state(html) or {})),
+    ("ranks", lambda html: app.detect_place_ranks(html, MARKER)),
+    ("ad_position", lambda html: app.detect_ad_position(html, MARKER)),
+    # 입찰추정/노출감시 공용 분석 (Apollo 광고 순서, 없으면 data-cr-rank)
+    ("page_ad", lambda html: app.page_ad_position(app.analyze_search_page(html, (MARKER,)), MARKER)),
+    ("review", lambda html: app._parse_review_count_from_html(html)),
+]
+
+def fixtures():
+    paths = set(EXPECTED)
+    paths.update(p.replace(os.sep, "/") for p in glob.glob("debug/*.html"))
+    paths.update(glob.glob("naver_*.html"))
+    return sorted(p for p in paths if os.path.exists(p))
+
+def measure(fn, html):
+    best = None
+    result = None
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        result = fn(html)
+        dt = time.perf_counter() - t0
+        best = dt if best is None or dt < best else best
+
+    tracemalloc.start()
+    try:
+        fn(html)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+def main():
+    failures = []
+    slow = []
+    missing = [p for p in EXPECTED if not os.path.exists(p)]
+    for p in missing:
+        failures.append(f"{p}: 페이지 파일 없음")
+
+    for path in fixtures():
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        mb = max(len(html.encode("utf-8")) / 1e6, 0.01)
+        expected = EXPECTED.get(path)
+        print(f"{path} ({mb:.2f} MB){'' if expected else ' [기대값 없음: 측정만]'}")
+
+        for name, fn in PARSERS:
+            try:
+                result, secs, peak = measure(fn, html)
+            except Exception as e:
+                failures.append(f"{path} {name}: 예외 {e!r}")
+                print(f"  {name:<12} 예외 {e!r}")
+                continue
+
+            status = "  (해당 없음: 검사 안 함)" if expected is not None and name not in expected else ""
+            if expected is not None and name in expected and result != expected[name]:
+                status = f"  ✗ 기대 {expected[name]}"
+                failures.append(f"{path} {name}: {result} (기대 {expected[name]})")
+            budget = BUDGET_MS_PER_MB[name] * mb
+            if secs * 1000 > budget:
+                status += f"  ✗ 시간 초과 (허용 {budget:.1f}ms)"
+                slow.append(f"{path} {name}: {secs * 1000:.1f}ms > {budget:.1f}ms")
+
+            print(
+                f"  {name:<12} {str(result):<28} "
+                f"{secs * 1000:8.2f}ms  peak {peak / 1024:9.1f} KiB{status}"
+            )
+
+    if slow:
+        print(f"\n시간 초과 ({'경고만' if TIMING == 'report' else '실패'})")
+        for f in slow:
+            print(" -", f)
+        if TIMING != "report":
+            failures += slow
+
+    if failures:
+        print("\nFAIL")
+        for f in failures:
+            print(" -", f)
+        return 1
+    print("\nOK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
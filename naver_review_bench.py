@@ -0,0 +1,80 @@
+import os, re, sys, tempfile, time
+
+# app 임포트 시 잠금/상태 파일이 실제 DATA_DIR를 건드리지 않도록 임시 폴더 사용
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="review_bench_")
+
+import app
+
+FIXTURES = ["naver_review_debug.html", "naver_place_home.html"]
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "20"))
+
+# 변경 전 _parse_review_count_from_html 2) 단계 그대로 (패턴마다 re.search 한 번씩)
+def legacy_fallback(html, passes):
+    def search(p):
+        passes[0] += 1
+        return re.search(p, html)
+
+    mv = search(r'"visitorReviewCount"\s*:\s*(\d+)')
+    mb = search(r'"blogReviewCount"\s*:\s*(\d+)')
+    if mv or mb:
+        v = int(mv.group(1)) if mv else 0
+        b = int(mb.group(1)) if mb else 0
+        if v or b:
+            return v + b
+
+    mv = search(r"방문자\s*리뷰\s*([0-9,]+)")
+    mb = search(r"블로그\s*리뷰\s*([0-9,]+)")
+    if mv or mb:
+        v = int(mv.group(1).replace(",", "")) if mv else 0
+        b = int(mb.group(1).replace(",", "")) if mb else 0
+        if v or b:
+            return v + b
+
+    mt = search(r'"totalReviewCount"\s*:\s*(\d+)')
+    if mt:
+        return int(mt.group(1))
+
+    ml = search(r"리뷰\s*([0-9,]+)\s*건")
+    if ml:
+        return int(ml.group(1).replace(",", ""))
+
+    return None
+
+def best_of(fn, rounds):
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None or dt < best else best
+    return best
+
+def main():
+    ok = True
+    for path in FIXTURES:
+        if not os.path.exists(path):
+            print(f"{path}: 없음 (건너뜀)")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+
+        passes = [0]
+        old = legacy_fallback(html, passes)
+        new = app._review_count_from_patterns(html)
+        same = old == new
+        ok = ok and same
+
+        t_old = best_of(lambda: legacy_fallback(html, [0]), ROUNDS)
+        t_new = best_of(lambda: app._review_count_from_patterns(html), ROUNDS)
+
+        print(f"{path} ({len(html):,} chars)")
+        print(f"  결과      : 기존 {old} / 단일 순회 {new} -> {'일치' if same else '불일치'}")
+        print(f"  문서 스캔 : 기존 {passes[0]}회 / 단일 순회 1회")
+        print(f"  시간(best): 기존 {t_old * 1000:.2f}ms / 단일 순회 {t_new * 1000:.2f}ms")
+        print(f"  전체 파서 : {app._parse_review_count_from_html(html)}")
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
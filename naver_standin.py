@@ -0,0 +1,321 @@
+import json, math, os, random, re, sys, tempfile, threading, time, urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 오프라인 부하 테스트용 Searchad / 네이버 검색·플레이스 / Upbit 대역 서버.
+# 봇은 아래처럼 주소만 바꿔 실행하면 실제 서비스 대신 이 서버를 호출한다.
+#   NAVER_BASE_URL=http://127.0.0.1:8700 NAVER_SEARCH_BASE=http://127.0.0.1:8700 \
+#   NAVER_PLACE_BASE=http://127.0.0.1:8700 UPBIT_BASE_URL=http://127.0.0.1:8700 python app.py
+# TELEGRAM_BASE_URL=http://127.0.0.1:8700/bot 을 더하면 Bot API 도 최소 응답으로 대신한다.
+# (setWebhook 주소는 기억만 하고 실제 전달은 하지 않는다. 웹훅 수신은 webhook_replay.py 로 확인)
+# Searchad 요청은 봇과 같은 NAVER_API_KEY / NAVER_API_SECRET / NAVER_CUSTOMER_ID 로 서명을 검사한다.
+
+# app 임포트 시 잠금/상태 파일이 실제 DATA_DIR를 건드리지 않도록 임시 폴더 사용
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="standin_")
+
+import app
+
+PORT = int(os.getenv("STANDIN_PORT", "8700"))
+# 응답 지연: 평균(초) + 0~JITTER 균등 난수
+LATENCY = float(os.getenv("STANDIN_LATENCY", "0.05"))
+JITTER = float(os.getenv("STANDIN_JITTER", "0.1"))
+# 비율(0~1)만큼 500/429 응답, Searchad PUT 은 CONFLICT_RATE 만큼 409
+ERROR_RATE = float(os.getenv("STANDIN_ERROR_RATE", "0"))
+CONFLICT_RATE = float(os.getenv("STANDIN_CONFLICT_RATE", "0"))
+# 기본 순위 목록을 요청마다 섞을 확률, 광고 순위를 정할 경쟁 입찰가(원, 높은 순)
+SHUFFLE_RATE = float(os.getenv("STANDIN_SHUFFLE_RATE", "0.2"))
+RIVAL_BIDS = [int(v) for v in os.getenv("STANDIN_RIVAL_BIDS", "1200,900,600,400").split(",") if v.strip()]
+# 리뷰 수: 이 초마다 1건씩 증가 (0 이면 고정)
+REVIEW_EVERY = float(os.getenv("STANDIN_REVIEW_EVERY", "0"))
+MARKER = os.getenv("STANDIN_MARKER", "두젠틀")
+KEYWORDS = [k.strip() for k in os.getenv("STANDIN_KEYWORDS", "강남 애견카페,애견호텔,강아지 유치원").split(",") if k.strip()]
+SEARCH_FIXTURE = os.getenv("STANDIN_SEARCH_FIXTURE", "naver_rank_debug.html")
+PLACE_FIXTURE = os.getenv("STANDIN_PLACE_FIXTURE", "naver_place_home.html")
+# 서명 시각 허용 오차(초)
+SKEW = float(os.getenv("STANDIN_SKEW", "300"))
+
+STARTED = time.time()
+lock = threading.Lock()
+counts = {}
+TG = {"first_poll": None, "calls": {}, "webhook": ""}
+
+# ========= Searchad 상태 =========
+CAMPAIGN_ID = app.NAVER_CAMPAIGN_ID or "cmp-a001-01-000000000000001"
+ADGROUP_ID = app.NAVER_ADGROUP_ID or "grp-a001-01-000000000000001"
+ADGROUPS = {
+    ADGROUP_ID: {
+        "nccAdgroupId": ADGROUP_ID,
+        "nccCampaignId": CAMPAIGN_ID,
+        "name": app.NAVER_ADGROUP_NAME or "기본 광고그룹",
+        "bidAmt": 300,
+        "useDailyBudget": False,
+    },
+}
+KEYWORD_ROWS = {}
+for i, kw in enumerate(KEYWORDS, start=1):
+    kid = f"nkw-a001-01-{i:015d}"
+    KEYWORD_ROWS[kid] = {
+        "nccKeywordId": kid,
+        "nccAdgroupId": ADGROUP_ID,
+        "keyword": kw,
+        "bidAmt": 70,
+        "useGroupBidAmt": True,
+    }
+
+def our_bid():
+    """검색 페이지 광고 순위를 정할 입찰가: 키워드 개별 입찰 중 최댓값, 없으면 광고그룹 입찰"""
+    with lock:
+        own = [k["bidAmt"] for k in KEYWORD_ROWS.values() if not k["useGroupBidAmt"]]
+        return max(own) if own else ADGROUPS[ADGROUP_ID]["bidAmt"]
+
+def hourly_stats(sid, day, hour):
+    rnd = random.Random(f"{sid}/{day}/{hour}")
+    imp = int(rnd.randint(20, 200) * (1.5 if 18 <= hour <= 22 else 1.0))
+    clk = rnd.randint(0, max(1, imp // 25))
+    return {"hh24": f"{hour:02d}", "impCnt": imp, "clkCnt": clk, "salesAmt": clk * rnd.randint(200, 900)}
+
+# ========= 페이지 =========
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+SEARCH_HTML = load(SEARCH_FIXTURE)
+PLACE_HTML = load(PLACE_FIXTURE)
+
+def _apollo_span(html):
+    idx = html.find("__APOLLO_STATE__")
+    brace = html.find("{", idx) if idx >= 0 else -1
+    obj = app._extract_js_object(html, brace) if brace >= 0 else None
+    return (brace, brace + len(obj)) if obj else None
+
+def search_page():
+    """광고 목록은 입찰가 순으로, 기본 목록은 SHUFFLE_RATE 확률로 섞어 다시 직렬화"""
+    span = _apollo_span(SEARCH_HTML)
+    apollo = app._extract_apollo_state(SEARCH_HTML) if span else None
+    if not apollo:
+        return SEARCH_HTML
+    root = apollo.get("ROOT_QUERY", {})
+
+    ad_key = next((k for k in root if k.startswith("adBusinesses(")), None)
+    if ad_key:
+        items = root[ad_key].get("items") or []
+        mine = [it for it in items if app._match_name(app._get_name_id(apollo, it.get("__ref"))[0], MARKER)]
+        others = [it for it in items if it not in mine]
+        if mine:
+            pos = sum(1 for b in RIVAL_BIDS if b > our_bid())
+            if pos > len(others):
+                items = others   # 경쟁 입찰에 밀려 광고 영역 밖
+            else:
+                items = others[:pos] + mine[:1] + others[pos:]
+            root[ad_key]["items"] = items
+
+    att_key = next((k for k in root if k.startswith("attractions(")), None)
+    if att_key and random.random() < SHUFFLE_RATE:
+        att = root[att_key]
+        biz_key = next((k for k in att if k.startswith("businesses(")), None)
+        if biz_key:
+            items = list(att[biz_key].get("items") or [])
+            if len(items) > 1:
+                i = random.randrange(len(items) - 1)
+                items[i], items[i + 1] = items[i + 1], items[i]
+                att[biz_key]["items"] = items
+
+    return SEARCH_HTML[:span[0]] + json.dumps(apollo, ensure_ascii=False) + SEARCH_HTML[span[1]:]
+
+def place_page():
+    if REVIEW_EVERY <= 0:
+        return PLACE_HTML
+    extra = int((time.time() - STARTED) / REVIEW_EVERY)
+    return re.sub(
+        r'"(visitorReviewsTotal|totalCount)":(\d+)',
+        lambda m: f'"{m.group(1)}":{int(m.group(2)) + extra}',
+        PLACE_HTML,
+    )
+
+# ========= 요청 처리 =========
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *a):
+        pass
+
+    def send(self, code, body, ctype="application/json; charset=UTF-8"):
+        if not isinstance(body, (str, bytes)):
+            body = json.dumps(body, ensure_ascii=False)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b""
+        return json.loads(raw.decode("utf-8")) if raw else None
+
+    def signed(self, method, path):
+        h = self.headers
+        ts = h.get("X-Timestamp") or ""
+        if h.get("X-API-KEY") != app.NAVER_API_KEY or h.get("X-Customer") != app.NAVER_CUSTOMER_ID:
+            return False
+        try:
+            if abs(time.time() - int(ts) / 1000) > SKEW:
+                return False
+        except:
+            return False
+        return h.get("X-Signature") == app._naver_signature(ts, method, path)
+
+    def handle_any(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        path, q = url.path, urllib.parse.parse_qs(url.query)
+        if path.startswith("/bot"):
+            return self.telegram(path)
+        time.sleep(LATENCY + random.random() * JITTER)
+        key = path.split("/")[1] or "/"
+        with lock:
+            counts[key] = counts.get(key, 0) + 1
+
+        if path == "/standin":
+            return self.send(200, {"uptime": round(time.time() - STARTED, 1), "counts": counts,
+                                   "bid": our_bid(), "rivals": RIVAL_BIDS, "telegram": TG})
+        if random.random() < ERROR_RATE:
+            return self.send(random.choice([429, 500]), {"code": 1018, "title": "stand-in error"})
+
+        if path.startswith(("/ncc/", "/stats")):
+            if not self.signed(method, path):
+                return self.send(403, {"code": 1018, "title": "invalid signature"})
+            return self.searchad(method, path, q)
+
+        if method != "GET":
+            return self.send(405, {})
+        if path == "/search.naver":
+            return self.send(200, search_page(), "text/html; charset=UTF-8")
+        if re.fullmatch(r"/(place/\d+|p/entry/place/\d+|restaurant/\d+/home)", path):
+            return self.send(200, place_page(), "text/html; charset=UTF-8")
+        if path == "/v1/ticker":
+            return self.send(200, [ticker(m) for m in (q.get("markets") or [""])[0].split(",") if m])
+        return self.send(404, {})
+
+    def telegram(self, path):
+        # TELEGRAM_BASE_URL=http://127.0.0.1:<포트>/bot 으로 기동하면 Bot API 대신 응답 (업데이트는 항상 없음)
+        name = path.rsplit("/", 1)[-1]
+        try:
+            body = self.read_json() or {}
+        except:
+            body = {}
+        with lock:
+            TG["calls"][name] = TG["calls"].get(name, 0) + 1
+            if name == "getUpdates" and TG["first_poll"] is None:
+                TG["first_poll"] = time.time()
+        if name == "getUpdates":
+            time.sleep(min(float(body.get("timeout") or 0), 1.0))
+            return self.send(200, {"ok": True, "result": []})
+        if name == "getMe":
+            return self.send(200, {"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "standin", "username": "standin_bot"}})
+        if name == "setWebhook":
+            with lock:
+                TG["webhook"] = body.get("url") or ""
+            return self.send(200, {"ok": True, "result": True})
+        if name == "deleteWebhook":
+            with lock:
+                TG["webhook"] = ""
+            return self.send(200, {"ok": True, "result": True})
+        if name == "getWebhookInfo":
+            return self.send(200, {"ok": True, "result": {
+                "url": TG["webhook"], "has_custom_certificate": False, "pending_update_count": 0}})
+        if name == "sendMessage":
+            return self.send(200, {"ok": True, "result": {
+                "message_id": TG["calls"][name], "date": int(time.time()),
+                "chat": {"id": int(body.get("chat_id") or 0), "type": "private"},
+                "text": body.get("text", "")}})
+        return self.send(200, {"ok": True, "result": True})
+
+    def searchad(self, method, path, q):
+        one = lambda name: (q.get(name) or [None])[0]
+        if method == "PUT" and random.random() < CONFLICT_RATE:
+            return self.send(409, {"code": 3506, "title": "conflict"})
+        with lock:
+            if path == "/ncc/campaigns":
+                return self.send(200, [{"nccCampaignId": CAMPAIGN_ID, "name": "대역 캠페인"}])
+            if path == "/ncc/adgroups":
+                cid = one("nccCampaignId")
+                return self.send(200, [g for g in ADGROUPS.values() if not cid or g["nccCampaignId"] == cid])
+            m = re.fullmatch(r"/ncc/adgroups/([\w-]+)", path)
+            if m:
+                g = ADGROUPS.get(m.group(1))
+                if not g:
+                    return self.send(404, {"code": 1002, "title": "not found"})
+                if method == "PUT":
+                    body = self.read_json() or {}
+                    g["bidAmt"] = int(body.get("bidAmt", g["bidAmt"]))
+                return self.send(200, g)
+            if path == "/ncc/keywords":
+                if method == "PUT":
+                    out = []
+                    for it in self.read_json() or []:
+                        k = KEYWORD_ROWS.get(it.get("nccKeywordId"))
+                        if k:
+                            k["bidAmt"] = int(it.get("bidAmt", k["bidAmt"]))
+                            k["useGroupBidAmt"] = bool(it.get("useGroupBidAmt", k["useGroupBidAmt"]))
+                            out.append(k)
+                    return self.send(200, out)
+                gid = one("nccAdgroupId")
+                return self.send(200, [k for k in KEYWORD_ROWS.values() if not gid or k["nccAdgroupId"] == gid])
+            m = re.fullmatch(r"/ncc/keywords/([\w-]+)", path)
+            if m:
+                k = KEYWORD_ROWS.get(m.group(1))
+                if not k:
+                    return self.send(404, {"code": 1002, "title": "not found"})
+                if method == "PUT":
+                    it = self.read_json() or {}
+                    k["bidAmt"] = int(it.get("bidAmt", k["bidAmt"]))
+                    k["useGroupBidAmt"] = bool(it.get("useGroupBidAmt", k["useGroupBidAmt"]))
+                return self.send(200, k)
+        if path == "/stats":
+            tr = json.loads(one("timeRange") or "{}")
+            day = tr.get("since") or time.strftime("%Y-%m-%d")
+            last = 24
+            if day == time.strftime("%Y-%m-%d"):
+                last = int(time.strftime("%H")) + 1   # 오늘은 지난 시간까지만
+            data = [
+                {"id": sid, "breakdowns": [hourly_stats(sid, day, h) for h in range(last)]}
+                for sid in (one("ids") or "").split(",") if sid
+            ]
+            return self.send(200, {"data": data})
+        return self.send(404, {"code": 1002, "title": "not found"})
+
+    def do_GET(self):
+        self.handle_any("GET")
+
+    def do_PUT(self):
+        self.handle_any("PUT")
+
+    def do_POST(self):
+        self.handle_any("POST")
+
+# ========= Upbit =========
+def ticker(market):
+    # 시장별 고정 기준가에서 시간에 따라 천천히 흔들리는 가격
+    base = 1000 + sum(map(ord, market)) * 997 % 90000000
+    t = time.time() - STARTED
+    price = base * (1 + 0.02 * math.sin(t / 60 + len(market)) + random.uniform(-0.002, 0.002))
+    return {"market": market, "trade_price": round(price, 2), "acc_trade_price_24h": base * 1e4}
+
+def main():
+    if not (app.NAVER_API_KEY and app.NAVER_API_SECRET and app.NAVER_CUSTOMER_ID):
+        print("NAVER_API_KEY / NAVER_API_SECRET / NAVER_CUSTOMER_ID 를 봇과 같게 설정하세요 (임의 값 가능).")
+        return 1
+    srv = ThreadingHTTPServer(("127.0.0.1", PORT), Handler)
+    srv.daemon_threads = True
+    print(f"stand-in: http://127.0.0.1:{PORT}  (광고그룹 {ADGROUP_ID}, 키워드 {len(KEYWORD_ROWS)}개, 경쟁 입찰 {RIVAL_BIDS})")
+    print(f"상태 확인: http://127.0.0.1:{PORT}/standin")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os, random, statistics, sys, tempfile, time
+
+# 구간 알림 규칙 점검/측정: 합성 시세로 window_rules_tick 을 돌려
+# (1) 매 틱 기록 전체를 다시 훑는 단순 판정과 같은 알림을 내는지, (2) 규칙 수백 개의 틱당 시간을 잰다.
+# 틱당 p99 가 허용치(3초 주기 중 일부)를 넘거나 결과가 다르면 종료 코드 1.
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="rules_bench_")
+
+import app
+
+TICK = 3.0
+MARKETS = int(os.getenv("BENCH_MARKETS", "30"))
+TICKS = int(os.getenv("BENCH_TICKS", "2400"))
+BUDGET_P99 = float(os.getenv("RULES_BUDGET_P99", "0.05"))
+RULE_TEXTS = [
+    "-3% 10분", "+5% 30분", "2% 5분", "신고가 1시간", "신저가 1시간",
+    "평균 +2% 30분", "평균 -2% 30분", "-1.5% 3분", "+1% 1분", "신고가 20분",
+]
+
+def setup(markets, rule_texts, common=()):
+    app.init_state()
+    app.state["coins"].clear()
+    app.state["all_rules"] = [app.parse_alert_rule(t) for t in common]
+    app._price_windows.clear()
+    app._rule_quiet.clear()
+    for m in markets:
+        app.ensure_coin(m)["rules"] = [app.parse_alert_rule(t) for t in rule_texts]
+
+def walks(markets, ticks, seed):
+    rnd = random.Random(seed)
+    cur = {m: rnd.uniform(100, 100000) for m in markets}
+    for _ in range(ticks):
+        for m in markets:
+            cur[m] *= 1 + rnd.gauss(0, 0.004)
+        yield dict(cur)
+
+def brute_force(markets, ticks, seed):
+    """기록 전체를 보관하고 매 틱 창 안을 처음부터 다시 계산하는 기준 구현"""
+    hist = {m: [] for m in markets}
+    quiet = {}
+    out = []
+    for n, prices in enumerate(walks(markets, ticks, seed)):
+        now = n * TICK
+        fired = []
+        for m, cur in prices.items():
+            info = app.state["coins"][m]
+            rules = {}
+            for r in app.state["all_rules"] + info["rules"]:
+                rules.setdefault(app._alert_rule_key(r), r)
+            for key, r in rules.items():
+                if quiet.get((m, key), -1) > now:
+                    continue
+                span = r["window"]
+                win = [(t, p) for t, p in hist[m] if t >= now - span]
+                if not win:
+                    continue
+                hi, lo = max(p for _, p in win), min(p for _, p in win)
+                full = now - win[0][0] >= span * 0.9
+                d, pct = r["dir"], r["pct"]
+                if r["kind"] == "high":
+                    hit = full and cur > hi
+                elif r["kind"] == "low":
+                    hit = full and cur < lo
+                elif r["kind"] == "avg":
+                    chg = (cur / (sum(p for _, p in win) / len(win)) - 1) * 100
+                    hit = full and ((d != "down" and chg >= pct) or (d != "up" and chg <= -pct))
+                else:
+                    hit = (d != "down" and (cur / lo - 1) * 100 >= pct) or \
+                          (d != "up" and (cur / hi - 1) * 100 <= -pct)
+                if hit:
+                    quiet[(m, key)] = now + span
+                    e = app.status_emoji(info, cur)
+                    fired.append(f"{e} {m.split('-')[1]} {e}: {app.alert_rule_text(r)}")
+            hist[m].append((now, cur))
+        out.append(sorted(fired))
+    return out
+
+def incremental(markets, ticks, seed):
+    out, times = [], []
+    for n, prices in enumerate(walks(markets, ticks, seed)):
+        t0 = time.perf_counter()
+        alerts = app.window_rules_tick(prices, now=n * TICK)
+        times.append(time.perf_counter() - t0)
+        out.append(sorted(a.split(" → ")[0] for a in alerts))
+    return out, times
+
+def main():
+    ok = True
+
+    # 1) 정확성: 작은 규모에서 단순 판정과 틱마다 같은 알림
+    markets = [f"KRW-C{i}" for i in range(4)]
+    setup(markets, RULE_TEXTS, common=["+5% 30분", "-4% 15분"])
+    expected = brute_force(markets, 1500, seed=7)
+    setup(markets, RULE_TEXTS, common=["+5% 30분", "-4% 15분"])
+    got, _ = incremental(markets, 1500, seed=7)
+    diff = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+    fired = sum(len(x) for x in got)
+    print(f"정확성  : {len(markets)}개 코인 x {len(RULE_TEXTS) + 2}규칙, 1500틱, 알림 {fired}건, "
+          f"불일치 {len(diff)}틱{'' if not diff else f' (첫 틱 {diff[0]})'}")
+    ok = ok and not diff and fired > 0
+
+    # 2) 성능: 코인 MARKETS 개 x 규칙 10개 (+ 전체 규칙 2개)
+    markets = [f"KRW-C{i}" for i in range(MARKETS)]
+    setup(markets, RULE_TEXTS, common=["+5% 30분", "-4% 15분"])
+    _, times = incremental(markets, TICKS, seed=11)
+    times.sort()
+    p50 = statistics.median(times)
+    p99 = times[int(len(times) * 0.99)]
+    over = p99 > BUDGET_P99
+    ok = ok and not over
+    print(f"성능    : 규칙 {MARKETS * (len(RULE_TEXTS) + 2)}개, {TICKS}틱 ({TICKS * TICK / 3600:.1f}시간 분량), "
+          f"틱당 p50 {p50 * 1000:.2f}ms / p99 {p99 * 1000:.2f}ms / 최대 {times[-1] * 1000:.2f}ms "
+          f"(허용 {BUDGET_P99 * 1000:.0f}ms){'  ✗' if over else ''}")
+    print(f"창      : {len(app._price_windows)}개, 보관 시세 {sum(len(w['q']) for w in app._price_windows.values())}건")
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
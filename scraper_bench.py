@@ -0,0 +1,78 @@
+import os, socket, statistics, subprocess, sys, tempfile, threading, time, urllib.request
+
+# 노출/리뷰 감시 부하 중 봇 프로세스의 반응 지연 비교: 페이지 파싱을 (a) 봇 프로세스 안에서,
+# (b) 스크래퍼 워커 프로세스에서. naver_standin.py 를 검색/플레이스 대역으로 띄워 실제 Naver 없이 잰다.
+# 50ms 마다 깨어나는 스레드의 지연(가격 확인/명령 처리 대신)을 재고, 워커 쪽 p99 가 허용치를 넘으면 종료 코드 1.
+JOBS = int(os.getenv("BENCH_JOBS", "40"))
+WORKERS = int(os.getenv("BENCH_WORKERS", "2"))
+TICK = 0.05
+BUDGET_P99 = float(os.getenv("SCRAPER_BUDGET_P99", "0.05"))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+PORT = free_port()
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="scraper_bench_")
+os.environ["NAVER_SEARCH_BASE"] = f"http://127.0.0.1:{PORT}"
+os.environ["NAVER_PLACE_BASE"] = f"http://127.0.0.1:{PORT}"
+os.environ["SCRAPER_WORKERS"] = str(WORKERS)
+
+import app
+
+def ticker(stop, lags):
+    nxt = time.perf_counter() + TICK
+    while not stop.is_set():
+        time.sleep(max(0.0, nxt - time.perf_counter()))
+        lags.append(max(0.0, time.perf_counter() - nxt))
+        nxt += TICK
+
+def run(workers):
+    app.SCRAPER_WORKERS = workers
+    if workers:
+        app.scraper_start()
+    stop, lags = threading.Event(), []
+    t = threading.Thread(target=ticker, args=(stop, lags), daemon=True)
+    t.start()
+    t0 = time.perf_counter()
+    threads = []
+    for i in range(JOBS):
+        kind = "search" if i % 2 else "place"
+        url = app._naver_search_url(f"bench {i}") if kind == "search" else app._review_sources("1234")[0][1]
+        th = threading.Thread(target=app.scrape, args=(kind, url))
+        th.start()
+        threads.append(th)
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - t0
+    stop.set()
+    t.join()
+    lags.sort()
+    return wall, statistics.median(lags), lags[int(len(lags) * 0.99) - 1], lags[-1]
+
+def main():
+    env = dict(os.environ, STANDIN_PORT=str(PORT), STANDIN_LATENCY="0", STANDIN_JITTER="0",
+               NAVER_API_KEY="bench", NAVER_API_SECRET="bench", NAVER_CUSTOMER_ID="1")
+    standin = subprocess.Popen([sys.executable, "naver_standin.py"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{PORT}/standin", timeout=1)
+                break
+            except Exception:
+                time.sleep(0.05)
+        rows = [("봇 프로세스 내", run(0)), (f"워커 {WORKERS}개", run(WORKERS))]
+    finally:
+        app.scraper_stop()
+        standin.terminate()
+    for name, (wall, p50, p99, worst) in rows:
+        print(f"{name:<10} 작업 {JOBS}건 {wall:6.2f}s  틱 지연 p50 {p50 * 1000:6.1f}ms  "
+              f"p99 {p99 * 1000:6.1f}ms  최대 {worst * 1000:6.1f}ms")
+    ok = rows[1][1][2] <= BUDGET_P99
+    print("OK" if ok else f"FAIL (워커 p99 허용 {BUDGET_P99 * 1000:.0f}ms)")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
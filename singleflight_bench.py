@@ -0,0 +1,98 @@
+import os, socket, subprocess, sys, tempfile, threading, time, urllib.request
+
+# 중복 요청 합치기 측정: 같은 자원을 CALLERS 개 스레드가 동시에 요청할 때 실제로 나간 HTTP 요청 수.
+# Upbit 시세, 검색 페이지(노출현황/노출감시), 플레이스 리뷰(리뷰현황/리뷰감시)를 naver_standin.py 로 잰다.
+# 묶음 시세(check_loop)가 나가 있는 동안의 한 마켓 조회(가격/보기)도 함께 잰다.
+# 자원마다 1번만 나가야 OK (다르면 종료 코드 1).
+CALLERS = int(os.getenv("BENCH_CALLERS", "8"))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+PORT = free_port()
+BASE = f"http://127.0.0.1:{PORT}"
+os.environ.update({
+    "DATA_DIR": tempfile.mkdtemp(prefix="singleflight_bench_"),
+    "NAVER_SEARCH_BASE": BASE, "NAVER_PLACE_BASE": BASE, "UPBIT_BASE_URL": BASE,
+    "SCRAPER_WORKERS": "0",
+})
+
+import app
+
+def http_count():
+    return sum(v for (n, _), v in app._metrics.items() if n == "bot_http_requests_total")
+
+def burst(fn):
+    results, threads = [], []
+    gate = threading.Event()
+
+    def call():
+        gate.wait()
+        results.append(fn())
+
+    for _ in range(CALLERS):
+        th = threading.Thread(target=call)
+        th.start()
+        threads.append(th)
+    before = http_count()
+    t0 = time.perf_counter()
+    gate.set()
+    for th in threads:
+        th.join()
+    return http_count() - before, time.perf_counter() - t0, results
+
+def main():
+    env = dict(os.environ, STANDIN_PORT=str(PORT), STANDIN_LATENCY="0.3", STANDIN_JITTER="0",
+               NAVER_API_KEY="k", NAVER_API_SECRET="s", NAVER_CUSTOMER_ID="1")
+    standin = subprocess.Popen([sys.executable, "naver_standin.py"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ok = True
+    try:
+        end = time.time() + 20
+        while time.time() < end:
+            try:
+                urllib.request.urlopen(f"{BASE}/standin", timeout=1)
+                break
+            except Exception:
+                time.sleep(0.05)
+        app.init_state()
+        cases = [
+            ("Upbit 시세", lambda: app.get_price("KRW-BTC")),
+            ("검색 페이지", lambda: app.fetch_search_page("강남  애견카페", 1)),
+            ("플레이스 리뷰", lambda: app.get_place_review_count("1234")),
+        ]
+        for name, fn in cases:
+            n, dt, results = burst(fn)
+            same = all(r is results[0] or r == results[0] for r in results)
+            good = n == 1 and same and results[0] is not None
+            ok = ok and good
+            print(f"{name:<10} 호출 {CALLERS}개 → HTTP {n}회, {dt * 1000:6.0f}ms, 결과 {'같음' if same else '다름'}"
+                  f"{'' if good else '  ✗'}")
+
+        # check_loop 의 묶음 시세가 나가 있는 동안 들어온 가격/보기 조회는 그 요청에 합류해야 한다
+        batch = ["KRW-BTC", "KRW-ETH", "KRW-XRP", "KRW-SOL"]
+        got = {}
+        loop = threading.Thread(target=lambda: got.update(app.get_tickers(batch)))
+        before = http_count()
+        t0 = time.perf_counter()
+        loop.start()
+        time.sleep(0.1)
+        n, _, results = burst(lambda: app.get_price("KRW-ETH"))
+        loop.join()
+        n, dt = http_count() - before, time.perf_counter() - t0
+        same = bool(got) and all(r == float(got["KRW-ETH"]["trade_price"]) for r in results)
+        good = n == 1 and same
+        ok = ok and good
+        print(f"{'묶음+단건':<10} 묶음 1개 + 단건 {CALLERS}개 → HTTP {n}회, {dt * 1000:6.0f}ms, "
+              f"결과 {'같음' if same else '다름'}{'' if good else '  ✗'}")
+        print(app.single_flight_line())
+    finally:
+        standin.terminate()
+        standin.wait(5)
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
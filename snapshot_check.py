@@ -0,0 +1,101 @@
+import json, os, sys, tempfile, time
+
+# 재시작 스냅샷 점검: 캐시를 채워 저장 → 비운 뒤 복원해 같은지, 오래된 스냅샷은 버리는지,
+# 밀린 리뷰감시가 한 주기 안에 흩어지는지 확인한다. 실제 DATA_DIR 는 건드리지 않는다.
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="snapshot_check_")
+os.environ.setdefault("STARTUP_JITTER", "10")
+
+import app
+
+def fill():
+    now = time.time()
+    app._price_cache.clear()
+    app._price_cache.update({"KRW-BTC": (now - 5, 90000000.0), "KRW-ETH": (now - 5, 4000000.0)})
+    app._adgroup_cache["grp-1"] = {"body": {"nccAdgroupId": "grp-1", "bidAmt": 700}, "at": now - 30}
+    app._searchad_tree.update(at=now - 60, campaigns={"cmp-1": {"name": "c"}}, adgroups={}, keywords={})
+    app._rank_pages[("강남 맛집", 1)] = (now - 10, {"list": {"ads": [], "organic": [["a", "1"]]},
+                                                   "ad_fallback": {"a": 3}})
+    app._rank_pages[("강남 맛집", 2)] = (now - 10, {"list": {"ads": [], "organic": []}, "ad_fallback": {}})
+    st = app._job_entry("check_loop", 3, None)
+    st["durations"].extend([0.01, 0.02])
+    st["runs"] += 2
+    app._webhook["recent"].extend([101, 102])
+
+def clear():
+    app._price_cache.clear()
+    app._adgroup_cache.clear()
+    app._searchad_tree.update(at=0.0, campaigns={}, adgroups={}, keywords={})
+    app._rank_pages.clear()
+    app._jobs.clear()
+    app._webhook["recent"].clear()
+
+def main():
+    failures = []
+    app.init_state()
+    if not app.lease_try_acquire():
+        print("리스 획득 실패")
+        return 1
+    try:
+        fill()
+        before = (dict(app._price_cache), dict(app._adgroup_cache), app._searchad_tree["at"])
+        app.snapshot_save()
+        size = os.path.getsize(app.SNAPSHOT_FILE)
+        clear()
+        n = app.snapshot_restore()
+        print(f"저장 {size}B, 복원 {n}개")
+        prices = {k: tuple(v) for k, v in app._price_cache.items()}
+        if prices != before[0]:
+            failures.append(f"가격표 불일치: {prices}")
+        if app._adgroup_cache != before[1]:
+            failures.append("광고그룹 캐시 불일치")
+        if app._searchad_tree["at"] != before[2]:
+            failures.append("Searchad 목록 시각 불일치")
+        pages = {k: v[1] for k, v in app._rank_pages.items()}
+        if sorted(pages) != [("강남 맛집", 1), ("강남 맛집", 2)] or \
+                app.page_ad_position(pages[("강남 맛집", 1)], "a") != 3:
+            failures.append(f"검색 페이지 캐시 불일치: {pages}")
+        if list(app._jobs.get("check_loop", {}).get("durations", [])) != [0.01, 0.02]:
+            failures.append("job 실행 기록 불일치")
+        if list(app._webhook["recent"]) != [101, 102]:
+            failures.append("웹훅 update_id 불일치")
+
+        # 오래된 스냅샷은 버린다
+        with open(app.SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+        snap["at"] = time.time() - app.SNAPSHOT_MAX_AGE - 1
+        with open(app.SNAPSHOT_FILE, "w", encoding="utf-8") as f:
+            json.dump(snap, f)
+        clear()
+        if app.snapshot_restore() != 0 or app._price_cache:
+            failures.append("오래된 스냅샷을 복원함")
+
+        # 밀린 리뷰감시 분산
+        places = app.review_watch_places()
+        places.clear()
+        for i in range(20):
+            places[f"p{i}"] = {"interval": 180, "last_check": 0.0, "last_count": 10}
+        now = time.time()
+        app.stagger_overdue_watches()
+        dues = sorted(app._review_due(p) - now for p in places.values())
+        print(f"밀린 20곳 다음 확인: {dues[0]:.0f}~{dues[-1]:.0f}초 뒤")
+        if dues[0] < -1 or dues[-1] > 180 or dues[-1] - dues[0] < 5:
+            failures.append(f"분산 범위 이상: {dues[0]:.1f}~{dues[-1]:.1f}")
+        if any(p["last_count"] != 10 for p in places.values()):
+            failures.append("분산 중 기준 리뷰 수가 바뀜")
+
+        firsts = [app.startup_first(20) for _ in range(50)]
+        if not (min(firsts) >= 20 and max(firsts) <= 20 + app.STARTUP_JITTER and max(firsts) > min(firsts)):
+            failures.append("첫 실행 지터 범위 이상")
+    finally:
+        app.lease_release()
+
+    if failures:
+        print("FAIL")
+        for f in failures:
+            print(" -", f)
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import json, os, socket, statistics, subprocess, sys, tempfile, time, urllib.request
+
+# 기동 시간 측정: (1) import app 시간 (2) 실행 후 헬스 포트 응답까지 (3) 첫 getUpdates 까지.
+# (2)(3)은 naver_standin.py 를 Bot API 대역으로 띄워 실제 텔레그램 없이 잰다.
+# 허용 시간(초)을 넘기면 종료 코드 1.
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "5"))
+BUDGET_IMPORT = float(os.getenv("STARTUP_BUDGET_IMPORT", "0.5"))
+BUDGET_HEALTH = float(os.getenv("STARTUP_BUDGET_HEALTH", "1.0"))
+BUDGET_POLL = float(os.getenv("STARTUP_BUDGET_POLL", "5.0"))
+TIMEOUT = 30
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def base_env():
+    env = dict(os.environ)
+    env["DATA_DIR"] = tempfile.mkdtemp(prefix="startup_bench_")
+    # 봇이 실제 서비스로 나가지 않도록 Naver/Upbit 설정은 비운다
+    for k in ("NAVER_API_KEY", "NAVER_API_SECRET", "NAVER_CUSTOMER_ID", "NAVER_ADGROUP_ID",
+              "NAVER_ADGROUP_NAME", "NAVER_PLACE_ID", "CHAT_ID"):
+        env.pop(k, None)
+    return env
+
+def import_time():
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=base_env(), capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def wait_for(fn, timeout=TIMEOUT):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            v = fn()
+            if v:
+                return v
+        except Exception:
+            pass
+        time.sleep(0.01)
+    return None
+
+def boot_once():
+    standin_port, health_port = free_port(), free_port()
+    s_env = base_env()
+    s_env.update({
+        "STANDIN_PORT": str(standin_port), "STANDIN_LATENCY": "0", "STANDIN_JITTER": "0",
+        "NAVER_API_KEY": "bench", "NAVER_API_SECRET": "bench", "NAVER_CUSTOMER_ID": "1",
+    })
+    standin = subprocess.Popen([sys.executable, "naver_standin.py"], env=s_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    bot = None
+    try:
+        url = f"http://127.0.0.1:{standin_port}/standin"
+        if not wait_for(lambda: urllib.request.urlopen(url, timeout=1).status == 200):
+            raise RuntimeError("stand-in 기동 실패")
+
+        b_env = base_env()
+        b_env.update({
+            "BOT_TOKEN": "123456:bench", "PORT": str(health_port),
+            "TELEGRAM_BASE_URL": f"http://127.0.0.1:{standin_port}/bot",
+        })
+        t0 = time.time()
+        bot = subprocess.Popen([sys.executable, "app.py"], env=b_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        health = wait_for(lambda: urllib.request.urlopen(
+            f"http://127.0.0.1:{health_port}/", timeout=1).status == 200 and time.time())
+        first = wait_for(lambda: json.load(urllib.request.urlopen(url, timeout=1))["telegram"]["first_poll"])
+        if not (health and first):
+            raise RuntimeError("봇 기동 시간 초과")
+        return health - t0, first - t0
+    finally:
+        for p in (bot, standin):
+            if p is not None:
+                p.terminate()
+                try:
+                    p.wait(5)
+                except Exception:
+                    p.kill()
+
+def main():
+    imports = [import_time() for _ in range(ROUNDS)]
+    boots = [boot_once() for _ in range(max(1, ROUNDS // 2))]
+    rows = [
+        ("import app", statistics.median(imports), BUDGET_IMPORT),
+        ("헬스 포트 응답", statistics.median(b[0] for b in boots), BUDGET_HEALTH),
+        ("첫 getUpdates", statistics.median(b[1] for b in boots), BUDGET_POLL),
+    ]
+    ok = True
+    for name, sec, budget in rows:
+        over = sec > budget
+        ok = ok and not over
+        print(f"{name:<14} {sec * 1000:8.1f}ms  (허용 {budget * 1000:.0f}ms){'  ✗' if over else ''}")
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
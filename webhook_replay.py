@@ -0,0 +1,69 @@
+import json, os, sys, time, urllib.request
+
+# 기록된 텔레그램 업데이트를 웹훅 모드로 떠 있는 봇의 PORT 서버에 그대로 POST 한다.
+#   python webhook_replay.py [파일]   (기본: $DATA_DIR/webhook_updates.jsonl)
+# 파일은 JSON 배열 또는 한 줄에 업데이트 하나(JSONL). 봇은 TELEGRAM_WEBHOOK_RECORD=1 이면 받은 것을 기록한다.
+# 봇과 같은 TELEGRAM_WEBHOOK_SECRET 를 주어야 403 이 아니다.
+# REPLAY_CHAT_ID 를 주면 chat/from id 를 바꿔 보낸다 (다른 채팅방 기록을 내 방에서 재생).
+# update_id 는 REPLAY_ID_BASE 부터 새로 매긴다 (봇이 같은 id 를 중복으로 버리지 않도록).
+PORT = int(os.getenv("PORT", "8080"))
+PATH = "/" + os.getenv("TELEGRAM_WEBHOOK_PATH", "telegram").strip().strip("/")
+SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "").strip()
+CHAT_ID = os.getenv("REPLAY_CHAT_ID", "").strip()
+ID_BASE = int(os.getenv("REPLAY_ID_BASE", str(int(time.time()))))
+DELAY = float(os.getenv("REPLAY_DELAY", "0"))
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def rewrite(update, n):
+    update = dict(update, update_id=ID_BASE + n)
+    if CHAT_ID:
+        for key in ("message", "edited_message", "callback_query"):
+            msg = update.get(key)
+            if not msg:
+                continue
+            if "from" in msg:
+                msg["from"]["id"] = int(CHAT_ID)
+            chat = (msg.get("message") or msg).get("chat")
+            if chat:
+                chat["id"] = int(CHAT_ID)
+    return update
+
+def post(update):
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{PORT}{PATH}",
+        data=json.dumps(update, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET},
+        method="POST",
+    )
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=10) as r:
+            code = r.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    return code, time.perf_counter() - t0
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getenv("DATA_DIR", "."), "webhook_updates.jsonl")
+    updates = load(path)
+    codes = {}
+    worst = 0.0
+    for n, update in enumerate(updates):
+        code, secs = post(rewrite(update, n))
+        codes[code] = codes.get(code, 0) + 1
+        worst = max(worst, secs)
+        text = ((update.get("message") or {}).get("text") or "")[:30]
+        print(f"{n + 1:>4} {code} {secs * 1000:7.1f}ms  {text}")
+        if DELAY:
+            time.sleep(DELAY)
+    print(f"{len(updates)}건 → " + ", ".join(f"{c}: {k}건" for c, k in sorted(codes.items())) + f"  (최대 {worst * 1000:.1f}ms)")
+    return 0 if set(codes) <= {200} else 1
+
+if __name__ == "__main__":
+    sys.exit(main())